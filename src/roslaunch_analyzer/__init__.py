@@ -1,8 +1,35 @@
-from .arguments import get_arguments_of_launch_file
-from .command import LaunchCommand, command_to_tree, parse_command_line
-from .patches import apply_patches
+# The public API is imported on first use, so that light modules such as
+# roslaunch_analyzer.cache can be imported without importing launch and
+# launch_ros and applying the patches.
+_lazy_attributes = {
+    "get_arguments_of_launch_file": ".arguments",
+    "command_to_tree": ".command",
+    "parse_command_line": ".command",
+    "LaunchCommand": ".command",
+}
+
+_patched = False
+
+
+def __getattr__(name):
+    global _patched
+
+    module_name = _lazy_attributes.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+
+    if not _patched:
+        from .patches import apply_patches
+
+        apply_patches()
+        _patched = True
+
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
 
-apply_patches()
 
 __all__ = [
     "get_arguments_of_launch_file",
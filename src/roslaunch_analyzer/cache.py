@@ -0,0 +1,443 @@
+import os
+import re
+import sys
+import threading
+import types
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+
+class CacheStats:
+    """
+    Hit and miss counters of a cache.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def hit(self):
+        self.hits += 1
+
+    def miss(self):
+        self.misses += 1
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        The fraction of lookups that were hits, or 0.0 if there were none.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "evictions": self.evictions,
+        }
+
+
+_cache_stats: Dict[str, CacheStats] = {}
+_cache_stats_lock = threading.Lock()
+
+
+def register_cache_stats(name: str) -> CacheStats:
+    """
+    Return the statistics of the named cache, registering them on first use.
+
+    Args:
+        name (str): The name of the cache.
+
+    Returns:
+        CacheStats: The statistics to update on every lookup of the cache.
+    """
+    with _cache_stats_lock:
+        return _cache_stats.setdefault(name, CacheStats())
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Return the statistics of all registered caches.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: The statistics keyed by cache name.
+    """
+    with _cache_stats_lock:
+        caches = {name: stats.as_dict() for name, stats in _cache_stats.items()}
+    for name, usage in cache_manager.usage().items():
+        caches.setdefault(name, {}).update(usage)
+    return caches
+
+
+_not_followed = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.MethodType,
+    types.BuiltinFunctionType,
+)
+
+
+def approximate_size(value: Any, max_objects: int = 100_000) -> int:
+    """
+    Approximate the memory used by an object and the objects it references.
+
+    Follows containers, instance dictionaries and slots, counting every
+    object once. Classes, modules and functions are not followed. The
+    traversal stops after max_objects objects, so the size of very large
+    graphs is underestimated.
+
+    Args:
+        value (Any): The object.
+        max_objects (int): The maximum number of objects visited.
+
+    Returns:
+        int: The approximate size in bytes.
+    """
+    seen = set()
+    stack = [value]
+    size = 0
+    while stack and len(seen) < max_objects:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _not_followed):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj, 64)
+        if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        else:
+            attributes = getattr(obj, "__dict__", None)
+            if attributes is not None:
+                stack.append(attributes)
+            for slot in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+    return size
+
+
+LRU = "lru"
+LFU = "lfu"
+
+
+class CacheRegion:
+    """
+    A named cache whose entries count against the budget of a CacheManager.
+
+    Entries are evicted by least recent use (LRU) or least frequent use
+    (LFU, ties broken by least recent use), either when the region exceeds
+    its own max_entries or when the manager needs memory. Both policies are
+    O(1) per operation. The hit and miss counters are the ones returned by
+    register_cache_stats for the name of the region.
+
+    Create regions with CacheManager.region, not directly.
+
+    Args:
+        manager (CacheManager): The manager accounting the memory.
+        name (str): The name of the region.
+        policy (str): LRU or LFU.
+        max_entries (Optional[int]): The maximum number of entries, if any.
+        sizer (Callable[[Any], int]): Approximates the size of a value.
+    """
+
+    def __init__(
+        self,
+        manager: "CacheManager",
+        name: str,
+        policy: str,
+        max_entries: Optional[int],
+        sizer: Callable[[Any], int],
+    ):
+        if policy not in (LRU, LFU):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        self.manager = manager
+        self.name = name
+        self.policy = policy
+        self.max_entries = max_entries
+        self.sizer = sizer
+        self.stats = register_cache_stats(name)
+        self.bytes = 0
+        # key -> (value, size, frequency)
+        self._entries: Dict[Hashable, Tuple[Any, int, int]] = {}
+        # LRU: one bucket in use order. LFU: one bucket per frequency, each
+        # in use order, and the lowest frequency in use.
+        self._buckets: Dict[int, "OrderedDict[Hashable, None]"] = {}
+        self._min_frequency = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def _touch(self, key: Hashable, frequency: int) -> int:
+        if self.policy == LRU:
+            self._buckets.setdefault(0, OrderedDict())[key] = None
+            self._buckets[0].move_to_end(key)
+            return 0
+        if frequency:
+            bucket = self._buckets[frequency]
+            del bucket[key]
+            if not bucket:
+                del self._buckets[frequency]
+                if self._min_frequency == frequency:
+                    self._min_frequency = frequency + 1
+        else:
+            self._min_frequency = 1
+        frequency += 1
+        self._buckets.setdefault(frequency, OrderedDict())[key] = None
+        return frequency
+
+    def _unlink(self, key: Hashable, frequency: int):
+        bucket = self._buckets[frequency]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[frequency]
+            if self.policy == LFU and self._min_frequency == frequency:
+                self._min_frequency = min(self._buckets, default=0)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Return a cached value and record its use.
+
+        Args:
+            key (Hashable): The key.
+            default (Any): Returned if the key is not cached.
+
+        Returns:
+            Any: The value, or default.
+        """
+        with self.manager.lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, size, frequency = entry
+            self._entries[key] = (value, size, self._touch(key, frequency))
+            return value
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None):
+        """
+        Cache a value, replacing the value of the key if any, and evict
+        entries if the region or the manager is over its limit.
+
+        Args:
+            key (Hashable): The key.
+            value (Any): The value.
+            size (Optional[int]): The size of the value in bytes, approximated
+                with the sizer of the region if not given.
+        """
+        if size is None:
+            size = self.sizer(value)
+        with self.manager.lock:
+            entry = self._entries.get(key)
+            frequency = 0
+            if entry is not None:
+                frequency = entry[2]
+                self.bytes -= entry[1]
+                self.manager.bytes -= entry[1]
+            elif self.max_entries is not None:
+                # Make room first: a new LFU entry has the lowest frequency
+                # and would be the one evicted.
+                while self._entries and len(self._entries) >= self.max_entries:
+                    self.evict_one()
+            self._entries[key] = (value, size, self._touch(key, frequency))
+            self.bytes += size
+            self.manager.bytes += size
+            self.manager.enforce_budget()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Remove a cached value.
+
+        Args:
+            key (Hashable): The key.
+            default (Any): Returned if the key is not cached.
+
+        Returns:
+            Any: The removed value, or default.
+        """
+        with self.manager.lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            self._unlink(key, entry[2])
+            self.bytes -= entry[1]
+            self.manager.bytes -= entry[1]
+            return entry[0]
+
+    def evict_one(self) -> bool:
+        """
+        Evict the least recently or least frequently used entry.
+
+        Returns:
+            bool: False if the region is empty.
+        """
+        with self.manager.lock:
+            if not self._entries:
+                return False
+            bucket = self._buckets[0 if self.policy == LRU else self._min_frequency]
+            key = next(iter(bucket))
+            self.pop(key)
+            self.stats.evictions += 1
+            return True
+
+    def remove_if(self, predicate: Callable[[Hashable], bool]):
+        """
+        Remove the entries whose key matches a predicate.
+
+        Args:
+            predicate (Callable[[Hashable], bool]): Called with each key.
+        """
+        with self.manager.lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self.pop(key)
+
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        self.remove_if(lambda key: True)
+
+    def keys(self) -> Iterator[Hashable]:
+        """
+        Return the cached keys, without recording a use.
+        """
+        with self.manager.lock:
+            return iter(list(self._entries))
+
+    def usage(self) -> Dict[str, Any]:
+        return {
+            "policy": self.policy,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+        }
+
+
+_size_suffixes = {"": 1, "k": 2**10, "m": 2**20, "g": 2**30}
+
+
+def parse_size(text: str) -> int:
+    """
+    Parse a size such as "512M", "2g" or "1048576".
+
+    Args:
+        text (str): The size with an optional K, M or G suffix (powers of 1024).
+
+    Returns:
+        int: The size in bytes.
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*([kmg]?)i?b?\s*", text.lower())
+    if match is None:
+        raise ValueError(f"Invalid size: {text!r}")
+    return int(match.group(1)) * _size_suffixes[match.group(2)]
+
+
+class CacheManager:
+    """
+    Memory budget shared by all cache regions of the process.
+
+    Every region accounts the approximate size of its entries. When the
+    total exceeds the budget, the region using the most memory evicts its
+    least valuable entry, until the total fits again, so a long-running
+    server stays within a fixed ceiling whichever caches grow.
+
+    The budget defaults to the ROSLAUNCH_CACHE_BUDGET environment variable
+    (e.g. "256M"), or 256 MiB.
+
+    Args:
+        budget (Optional[int]): The budget in bytes.
+    """
+
+    def __init__(self, budget: Optional[int] = None):
+        if budget is None:
+            budget = parse_size(os.environ.get("ROSLAUNCH_CACHE_BUDGET", "256M"))
+        self.budget = budget
+        self.bytes = 0
+        self.lock = threading.RLock()
+        self._regions: Dict[str, CacheRegion] = {}
+
+    def region(
+        self,
+        name: str,
+        policy: str = LRU,
+        max_entries: Optional[int] = None,
+        sizer: Callable[[Any], int] = approximate_size,
+    ) -> CacheRegion:
+        """
+        Return the region of a name, creating it on first use.
+
+        Args:
+            name (str): The name of the region.
+            policy (str): LRU or LFU.
+            max_entries (Optional[int]): The maximum number of entries, if any.
+            sizer (Callable[[Any], int]): Approximates the size of a value
+                put without an explicit size.
+
+        Returns:
+            CacheRegion: The region.
+        """
+        with self.lock:
+            region = self._regions.get(name)
+            if region is None:
+                region = CacheRegion(self, name, policy, max_entries, sizer)
+                self._regions[name] = region
+            return region
+
+    def set_budget(self, budget: int):
+        """
+        Change the budget, evicting entries if the caches exceed it.
+
+        Args:
+            budget (int): The budget in bytes.
+        """
+        with self.lock:
+            self.budget = budget
+            self.enforce_budget()
+
+    def enforce_budget(self):
+        """
+        Evict entries until the caches fit in the budget.
+        """
+        with self.lock:
+            while self.bytes > self.budget:
+                largest = max(self._regions.values(), key=lambda region: region.bytes)
+                if not largest.evict_one():
+                    break
+
+    def usage(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return the entries and bytes of every region.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: The usage keyed by region name.
+        """
+        with self.lock:
+            return {name: region.usage() for name, region in self._regions.items()}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return the budget, the total size and the statistics of every region.
+
+        Returns:
+            Dict[str, Any]: The statistics.
+        """
+        with self.lock:
+            regions: List[CacheRegion] = list(self._regions.values())
+            return {
+                "budget": self.budget,
+                "bytes": self.bytes,
+                "regions": {
+                    region.name: {**region.stats.as_dict(), **region.usage()}
+                    for region in regions
+                },
+            }
+
+
+cache_manager = CacheManager()
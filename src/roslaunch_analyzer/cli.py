@@ -1,22 +1,223 @@
+import os
+from typing import List, Optional
+
 import typer
 
 cli = typer.Typer()
 
+_sandbox_option = typer.Option(
+    False, help="Evaluate Python launch files in a resource-limited subprocess."
+)
+_sandbox_timeout_option = typer.Option(
+    10.0, help="Wall-clock limit of a sandboxed launch file in seconds."
+)
+_sandbox_memory_option = typer.Option(
+    "1G", help="Memory limit of the sandbox worker, e.g. 512M."
+)
+
+
+def _enable_sandbox(sandbox: bool, timeout: float, memory: str):
+    if not sandbox:
+        return
+    from roslaunch_analyzer.cache import parse_size
+    from roslaunch_analyzer.sandbox import enable_sandbox
+
+    try:
+        enable_sandbox(timeout, parse_size(memory))
+    except ValueError:
+        raise typer.BadParameter(f"Invalid sandbox memory: {memory}")
+
 
 @cli.command()
-def run(cmds: str):
+def run(
+    cmds: str,
+    sandbox: bool = _sandbox_option,
+    sandbox_timeout: float = _sandbox_timeout_option,
+    sandbox_memory: str = _sandbox_memory_option,
+    output_format: str = typer.Option(
+        "json",
+        "--format",
+        help="Output format: json, or interned for compact JSON with a "
+        "string table.",
+    ),
+    share: bool = typer.Option(
+        False, help="Emit repeated subtrees and parameter lists once, by reference."
+    ),
+):
     import json
 
     from roslaunch_analyzer import command_to_tree, parse_command_line
 
+    if output_format not in ("json", "interned"):
+        raise typer.BadParameter(f"Unknown format: {output_format}")
+
+    _enable_sandbox(sandbox, sandbox_timeout, sandbox_memory)
+
     command = parse_command_line(cmds)
 
     tree = command_to_tree(command)
 
     tree.build()
 
-    print(json.dumps(tree.serialize(), indent=2))
+    data = tree.serialize()
+    if share:
+        from roslaunch_analyzer.sharing import share_definitions
+
+        data = share_definitions(data)
+
+    if output_format == "interned":
+        from roslaunch_analyzer.encoding import dumps_interned
+
+        print(dumps_interned(data))
+    else:
+        print(json.dumps(data, indent=2))
+
+
+@cli.command()
+def query(
+    cmds: str,
+    name: Optional[str] = typer.Option(None, help="Fully qualified node name."),
+    package: Optional[str] = None,
+    executable: Optional[str] = typer.Option(
+        None, help="Executable, or plugin of a composable node."
+    ),
+    namespace: Optional[str] = None,
+    recursive: bool = typer.Option(
+        False, help="Also match the nodes of nested namespaces."
+    ),
+    parameter_file: Optional[str] = None,
+    container: Optional[str] = typer.Option(
+        None, help="Container the composable nodes are loaded into."
+    ),
+    parameters: bool = typer.Option(
+        False, help="Also print the effective parameters of the nodes."
+    ),
+    sandbox: bool = _sandbox_option,
+    sandbox_timeout: float = _sandbox_timeout_option,
+    sandbox_memory: str = _sandbox_memory_option,
+):
+    """
+    Print the nodes launched by a launch command that match all given
+    criteria, as JSON.
+    """
+    import json
+
+    from roslaunch_analyzer import command_to_tree, parse_command_line
+    from roslaunch_analyzer.query import index_tree
+
+    _enable_sandbox(sandbox, sandbox_timeout, sandbox_memory)
+    tree = command_to_tree(parse_command_line(cmds))
+    tree.build()
+
+    nodes = index_tree(tree).query(
+        name=name,
+        package=package,
+        executable=executable,
+        namespace=namespace,
+        recursive=recursive,
+        parameter_file=parameter_file,
+        container=container,
+    )
+    results = [node.as_dict() for node in nodes]
+    if parameters:
+        for result, node in zip(results, nodes):
+            result.update(node.effective_parameters())
+    print(json.dumps(results, indent=2))
+
+
+@cli.command()
+def export(
+    cmds: List[str],
+    output: str = typer.Option(
+        ..., "--output", "-o", help="The .npz or .csv file to write."
+    ),
+    sandbox: bool = _sandbox_option,
+    sandbox_timeout: float = _sandbox_timeout_option,
+    sandbox_memory: str = _sandbox_memory_option,
+):
+    """
+    Flatten the trees of launch commands into one node table, one row per
+    node, and write it as NumPy arrays (.npz) or CSV.
+    """
+    from roslaunch_analyzer import command_to_tree, parse_command_line
+    from roslaunch_analyzer.columnar import NodeTable
+
+    if not output.endswith(".csv"):
+        # Fail before building the trees, not after.
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            raise typer.BadParameter("Writing .npz files requires numpy; use .csv")
+
+    _enable_sandbox(sandbox, sandbox_timeout, sandbox_memory)
+    table = NodeTable()
+    for cmd in cmds:
+        try:
+            tree = command_to_tree(parse_command_line(cmd))
+            tree.build()
+        except Exception as e:
+            typer.echo(f"{cmd}: {type(e).__name__}: {e}", err=True)
+            continue
+        table.append_tree(tree)
+    table.write(output)
+
+
+_search_path_option = typer.Option(
+    None,
+    help="Directory to search for launch files (default: the current "
+    "directory and the share directories of AMENT_PREFIX_PATH).",
+)
+
+
+def _scan(search_path: Optional[List[str]]):
+    from roslaunch_analyzer.include_graph import scan_directories
+
+    if not search_path:
+        search_path = [os.getcwd()] + [
+            os.path.join(prefix, "share")
+            for prefix in os.environ.get("AMENT_PREFIX_PATH", "").split(os.pathsep)
+            if prefix
+        ]
+    return scan_directories(search_path)
+
+
+@cli.command()
+def graph(
+    output: str = typer.Option(..., "--output", "-o", help="The JSON file to write."),
+    search_path: Optional[List[str]] = _search_path_option,
+):
+    """
+    Save the include graph of the launch files below the search path, for
+    rdeps --graph.
+    """
+    _scan(search_path).save(output)
+
+
+@cli.command()
+def rdeps(
+    path: str,
+    search_path: Optional[List[str]] = _search_path_option,
+    graph: Optional[str] = typer.Option(
+        None,
+        help="Include graph written by the graph command, used instead "
+        "of searching.",
+    ),
+    roots: bool = typer.Option(False, help="Only print top-level launch files."),
+):
+    """
+    Print the launch files that transitively include a launch file.
+    """
+    from roslaunch_analyzer.include_graph import IncludeGraph
+
+    if graph is not None:
+        include_graph = IncludeGraph.load(graph)
+    else:
+        include_graph = _scan(search_path)
+
+    dependents = include_graph.roots(path) if roots else include_graph.dependents(path)
+    for dependent in sorted(dependents):
+        print(dependent)
 
 
 if __name__ == "__main__":
-    run()
+    cli()
@@ -0,0 +1,288 @@
+import array
+import csv
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .query import fully_qualified_name, normalize_namespace, parameter_file_paths
+
+# Columns of integers, stored as int32 arrays.
+INTEGER_COLUMNS = ("tree", "parent", "depth")
+# Columns of dictionary-encoded strings: an int32 array of codes into a list
+# of distinct values, -1 for a missing value.
+STRING_COLUMNS = (
+    "type",
+    "package",
+    "executable",
+    "name",
+    "namespace",
+    "fully_qualified_name",
+    "include_path",
+)
+# The list column of the parameter files of every row: the codes of all rows
+# concatenated, and the offset of the codes of every row.
+PARAMETER_FILES = "parameter_files"
+
+COMPOSABLE_NODE = "ComposableNode"
+
+
+class StringDictionary:
+    """
+    The distinct values of a dictionary-encoded string column.
+    """
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def encode(self, value: Optional[str]) -> int:
+        """
+        Return the code of a value, adding it on first use.
+
+        Args:
+            value (Optional[str]): The value.
+
+        Returns:
+            int: The index of the value, or -1 for None.
+        """
+        if value is None:
+            return -1
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def decode(self, code: int) -> Optional[str]:
+        return self.values[code] if code >= 0 else None
+
+
+class NodeTable:
+    """
+    The nodes of many launch trees, flattened into columns.
+
+    Every serialized node of a tree is a row, and so is every composable
+    node of a LoadComposableNodes; the parent column holds the row index of
+    the parent (-1 for the root of a tree), and the include_path column the
+    launch file of the row, as in LaunchTreeIndex. The strings of a column
+    are dictionary-encoded across all trees, so the columns map directly to
+    NumPy arrays or Arrow dictionary arrays, and aggregations over thousands
+    of trees (nodes per package, namespace collisions, parameter file usage)
+    are operations on integer arrays.
+    """
+
+    def __init__(self):
+        self.tree_count = 0
+        self.integers: Dict[str, array.array] = {
+            name: array.array("i") for name in INTEGER_COLUMNS
+        }
+        self.codes: Dict[str, array.array] = {
+            name: array.array("i") for name in STRING_COLUMNS
+        }
+        self.dictionaries: Dict[str, StringDictionary] = {
+            name: StringDictionary() for name in STRING_COLUMNS
+        }
+        self.parameter_file_dictionary = StringDictionary()
+        self.parameter_file_codes = array.array("i")
+        self.parameter_file_offsets = array.array("i", [0])
+
+    def __len__(self) -> int:
+        return len(self.integers["tree"])
+
+    def _append(
+        self,
+        parent: int,
+        depth: int,
+        strings: Dict[str, Optional[str]],
+        parameter_files: List[str],
+    ) -> int:
+        row = len(self)
+        self.integers["tree"].append(self.tree_count)
+        self.integers["parent"].append(parent)
+        self.integers["depth"].append(depth)
+        for name in STRING_COLUMNS:
+            self.codes[name].append(self.dictionaries[name].encode(strings.get(name)))
+        self.parameter_file_codes.extend(
+            self.parameter_file_dictionary.encode(path) for path in parameter_files
+        )
+        self.parameter_file_offsets.append(len(self.parameter_file_codes))
+        return row
+
+    def append_tree(self, tree: Any) -> int:
+        """
+        Append the rows of a tree.
+
+        Args:
+            tree (Any): A built launch tree node or its serialization.
+
+        Returns:
+            int: The index of the tree in the tree column.
+        """
+        if not isinstance(tree, dict):
+            tree = tree.serialize()
+        stack = [(tree, -1, 0, tree.get("path"))]
+        while stack:
+            data, parent, depth, launch_file = stack.pop()
+            kind = data["type"]
+            if kind == "IncludeLaunchDescription":
+                launch_file = data["path"]
+            strings = {"type": kind, "include_path": launch_file}
+            if "namespace" in data:
+                strings.update(
+                    package=data["package"],
+                    executable=data["executable"],
+                    name=data["name"],
+                    namespace=normalize_namespace(data["namespace"]),
+                    fully_qualified_name=fully_qualified_name(
+                        data["namespace"], data["name"]
+                    ),
+                )
+            elif kind == "IncludeLaunchDescription":
+                strings["package"] = data["package"]
+            row = self._append(
+                parent,
+                depth,
+                strings,
+                parameter_file_paths(
+                    data.get("global_parameters", []) + data.get("parameters", [])
+                ),
+            )
+            for loaded in data.get("loaded_nodes", []):
+                self._append(
+                    row,
+                    depth + 1,
+                    {
+                        "type": COMPOSABLE_NODE,
+                        "package": loaded["package"],
+                        "executable": loaded["plugin"],
+                        "name": loaded["name"],
+                        "namespace": normalize_namespace(loaded["namespace"]),
+                        "fully_qualified_name": fully_qualified_name(
+                            loaded["namespace"], loaded["name"]
+                        ),
+                        "include_path": launch_file,
+                    },
+                    parameter_file_paths(
+                        loaded.get("global_parameters", []) + loaded["parameters"]
+                    ),
+                )
+            stack.extend(
+                (child, row, depth + 1, launch_file)
+                for child in reversed(data.get("children", []))
+            )
+        self.tree_count += 1
+        return self.tree_count - 1
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """
+        Decode the rows.
+
+        Returns:
+            Iterator[Dict[str, Any]]: The values of every row, with the
+                parameter files as a list.
+        """
+        offsets = self.parameter_file_offsets
+        for row in range(len(self)):
+            values: Dict[str, Any] = {
+                name: self.integers[name][row] for name in INTEGER_COLUMNS
+            }
+            for name in STRING_COLUMNS:
+                values[name] = self.dictionaries[name].decode(self.codes[name][row])
+            values[PARAMETER_FILES] = [
+                self.parameter_file_dictionary.decode(code)
+                for code in self.parameter_file_codes[offsets[row] : offsets[row + 1]]
+            ]
+            yield values
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """
+        Convert the columns to NumPy arrays.
+
+        A string column "name" becomes the int32 codes "name" and the
+        distinct values "name_dictionary", so that values of the column are
+        name_dictionary[name] where name >= 0.
+
+        Returns:
+            Dict[str, Any]: The arrays keyed by name.
+
+        Raises:
+            ImportError: If NumPy is not installed.
+        """
+        import numpy
+
+        def copy(buffer: array.array) -> Any:
+            # A view would keep the table from growing.
+            return numpy.frombuffer(buffer, dtype=numpy.int32).copy()
+
+        arrays = {name: copy(self.integers[name]) for name in INTEGER_COLUMNS}
+        for name in STRING_COLUMNS:
+            arrays[name] = copy(self.codes[name])
+            arrays[f"{name}_dictionary"] = numpy.array(
+                self.dictionaries[name].values, dtype=str
+            )
+        arrays[PARAMETER_FILES] = copy(self.parameter_file_codes)
+        arrays[f"{PARAMETER_FILES}_offsets"] = copy(self.parameter_file_offsets)
+        arrays[f"{PARAMETER_FILES}_dictionary"] = numpy.array(
+            self.parameter_file_dictionary.values, dtype=str
+        )
+        return arrays
+
+    def write_npz(self, path: str):
+        """
+        Write the arrays of to_numpy to a compressed .npz file.
+
+        Args:
+            path (str): The path of the file.
+
+        Raises:
+            ImportError: If NumPy is not installed.
+        """
+        import numpy
+
+        numpy.savez_compressed(path, **self.to_numpy())
+
+    def write_csv(self, path: str):
+        """
+        Write the decoded rows to a CSV file with a header, the parameter
+        files of a row separated by os.pathsep.
+
+        Args:
+            path (str): The path of the file.
+        """
+        names = INTEGER_COLUMNS + STRING_COLUMNS + (PARAMETER_FILES,)
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(names)
+            for values in self.rows():
+                values[PARAMETER_FILES] = os.pathsep.join(values[PARAMETER_FILES])
+                writer.writerow(values[name] for name in names)
+
+    def write(self, path: str):
+        """
+        Write the table, as CSV if the path ends with .csv and as .npz
+        otherwise.
+
+        Args:
+            path (str): The path of the file.
+        """
+        if path.endswith(".csv"):
+            self.write_csv(path)
+        else:
+            self.write_npz(path)
+
+
+def export_trees(trees: Iterable[Any], path: str) -> NodeTable:
+    """
+    Flatten launch trees into one NodeTable and write it.
+
+    Args:
+        trees (Iterable[Any]): Built launch tree nodes or their serializations.
+        path (str): The path of the .npz or .csv file.
+
+    Returns:
+        NodeTable: The table.
+    """
+    table = NodeTable()
+    for tree in trees:
+        table.append_tree(tree)
+    table.write(path)
+    return table
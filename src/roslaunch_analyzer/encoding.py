@@ -0,0 +1,138 @@
+import json
+from typing import Any, Dict, List, Tuple
+
+INTERNED_FORMAT = "roslaunch-interned-v2"
+
+
+def _encode(data: Any) -> Tuple[List[Any], Any]:
+    # Replace every string and number value by its index in the table, then
+    # dump with the C encoder. Object keys, booleans and nulls stay inline.
+    strings: Dict[str, int] = {}
+    # 1 and 1.0 are equal but must stay apart.
+    numbers: Dict[Tuple[type, Any], int] = {}
+    values: List[Any] = []
+
+    def encode(value: Any) -> Any:
+        value_type = type(value)
+        if value_type is str:
+            index = strings.get(value)
+            if index is None:
+                index = strings[value] = len(values)
+                values.append(value)
+            return index
+        # Strings seen before, the most common values, are looked up inline
+        # instead of with a call per value.
+        if value_type is dict:
+            return {
+                key: (
+                    strings[item]
+                    if type(item) is str and item in strings
+                    else encode(item)
+                )
+                for key, item in value.items()
+            }
+        if value_type is list or value_type is tuple:
+            return [
+                strings[item] if type(item) is str and item in strings else encode(item)
+                for item in value
+            ]
+        if value_type is bool or value is None:
+            return value
+        if value_type is not int and value_type is not float:
+            return encode(str(value))
+        index = numbers.get((value_type, value))
+        if index is None:
+            index = numbers[value_type, value] = len(values)
+            values.append(value)
+        return index
+
+    return values, encode(data)
+
+
+def _decode(values: list, text: str) -> Any:
+    # Every number in the data is an index into the table, resolved by the
+    # C decoder as it parses, with a dictionary lookup of the literal.
+    by_literal = {str(index): value for index, value in enumerate(values)}
+    return json.loads(text, parse_int=by_literal.__getitem__)
+
+
+def encode_interned(data: Any) -> Dict[str, Any]:
+    """
+    Encode serialized data with an interned value table.
+
+    Every string and number value (package names, namespaces, share paths,
+    parameter values) is stored once in a table, and the data references it
+    by index: every number in the encoded data is an index into the table.
+    Object keys, booleans and nulls stay inline. The result is plain JSON
+    data, several times smaller than the input once dumped.
+
+    Args:
+        data (Any): JSON-compatible data, e.g. the output of
+            LaunchTreeNode.serialize().
+
+    Returns:
+        Dict[str, Any]: The format, the value table and the encoded data.
+    """
+    values, encoded = _encode(data)
+    return {"format": INTERNED_FORMAT, "values": values, "data": encoded}
+
+
+def decode_interned(document: Dict[str, Any]) -> Any:
+    """
+    Decode data encoded with encode_interned.
+
+    Args:
+        document (Dict[str, Any]): The encoded document.
+
+    Returns:
+        Any: The original data; tuples are decoded as lists.
+
+    Raises:
+        ValueError: If the document is not in the interned format.
+    """
+    if document.get("format") != INTERNED_FORMAT:
+        raise ValueError(f"Unknown format: {document.get('format')!r}")
+    return _decode(
+        document["values"], json.dumps(document["data"], separators=(",", ":"))
+    )
+
+
+def dumps_interned(data: Any) -> str:
+    """
+    Encode data with encode_interned and dump it as compact JSON: a header
+    line with the format and the value table, then a line with the data.
+
+    Encoding is several times faster than json.dumps with indent; decoding
+    takes about as long as json.loads of the indented text.
+
+    Args:
+        data (Any): JSON-compatible data.
+
+    Returns:
+        str: The JSON text.
+    """
+    values, encoded = _encode(data)
+    header = json.dumps({"format": INTERNED_FORMAT, "values": values})
+    # The encoded data is a fresh tree, without cycles.
+    text = json.dumps(encoded, separators=(",", ":"), check_circular=False)
+    return f"{header}\n{text}"
+
+
+def loads_interned(text: str) -> Any:
+    """
+    Load data dumped with dumps_interned.
+
+    Args:
+        text (str): The JSON text.
+
+    Returns:
+        Any: The original data.
+
+    Raises:
+        ValueError: If the text is not in the interned format.
+    """
+    header_text, _, data_text = text.partition("\n")
+    header = json.loads(header_text)
+    if not isinstance(header, dict) or header.get("format") != INTERNED_FORMAT:
+        raise ValueError("Unknown format")
+    return _decode(header["values"], data_text)
@@ -0,0 +1,359 @@
+import json
+import os
+import re
+import threading
+import xml.etree.ElementTree as ElementTree
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from .utils import resolve_symlink
+
+# Origins of include edges.
+STATIC = "static"
+BUILD = "build"
+
+_find_pkg_share = re.compile(
+    r"^\$\(find-pkg-share\s+(?P<package>[\w-]+)\s*\)(?P<path>.*)$"
+)
+_dirname = re.compile(r"^\$\(dirname\s*\)(?P<path>.*)$")
+
+LAUNCH_FILE_SUFFIXES = (".launch.xml", ".launch")
+
+# Directories that are never searched for launch files.
+IGNORED_DIRECTORIES = {".git", "build", "log", "install", "node_modules", "__pycache__"}
+
+
+def is_launch_file(path: str) -> bool:
+    """
+    Return whether a path looks like an XML launch file.
+
+    Args:
+        path: The path of the file.
+
+    Returns:
+        True for *.launch.xml and *.launch files, and for *.xml files in a
+        launch directory.
+    """
+    if path.endswith(LAUNCH_FILE_SUFFIXES):
+        return True
+    return path.endswith(".xml") and "launch" in path.split(os.sep)[:-1]
+
+
+def canonical_path(path: str) -> str:
+    """
+    Return the path under which a launch file is stored in the graph.
+
+    Args:
+        path: The path of the launch file.
+
+    Returns:
+        The absolute path with symbolic links resolved.
+    """
+    return os.path.realpath(path)
+
+
+class IncludeGraph:
+    """
+    Include graph between launch files with a reverse index.
+
+    Edges are recorded per including file and per origin, either extracted
+    statically from XML launch files or seen as IncludeLaunchDescriptionNode
+    paths during builds, so that re-recording one origin does not drop the
+    edges of the other.
+    """
+
+    def __init__(self):
+        self._edges: Dict[str, Dict[str, Set[str]]] = {STATIC: {}, BUILD: {}}
+        self._reverse: Dict[str, Dict[str, Set[str]]] = {}
+        self._lock = threading.Lock()
+
+    def set_includes(self, path: str, targets: Iterable[str], origin: str = STATIC):
+        """
+        Replace the files included by a launch file.
+
+        Args:
+            path: The path of the including launch file.
+            targets: The paths of the included launch files.
+            origin: STATIC or BUILD.
+        """
+        path = canonical_path(path)
+        targets = {canonical_path(target) for target in targets}
+        with self._lock:
+            previous = self._edges[origin].get(path, set())
+            for target in previous - targets:
+                origins = self._reverse[target][path]
+                origins.discard(origin)
+                if not origins:
+                    del self._reverse[target][path]
+                    if not self._reverse[target]:
+                        del self._reverse[target]
+            for target in targets - previous:
+                self._reverse.setdefault(target, {}).setdefault(path, set()).add(origin)
+            if targets:
+                self._edges[origin][path] = targets
+            else:
+                self._edges[origin].pop(path, None)
+
+    def remove(self, path: str, origin: Optional[str] = None):
+        """
+        Remove the includes of a launch file.
+
+        Args:
+            path: The path of the launch file.
+            origin: The origin of the edges to remove, or None for all origins.
+        """
+        for edge_origin in (STATIC, BUILD) if origin is None else (origin,):
+            self.set_includes(path, [], edge_origin)
+
+    def add_tree(self, tree):
+        """
+        Record the include edges seen in a built launch tree.
+
+        Includes that failed to build are recorded as edges as well if their
+        file could be resolved, so that fixing the file rebuilds the tree.
+
+        Args:
+            tree: The built IncludeLaunchDescriptionNode.
+        """
+        from .tree import ErrorNode
+
+        includes: Dict[str, Set[str]] = {}
+        stack = [(tree, tree.path)]
+        while stack:
+            node, including_path = stack.pop()
+            path = node.included_file()
+            if path is not None:
+                includes.setdefault(path, set())
+                if node is not tree:
+                    includes.setdefault(including_path, set()).add(path)
+                including_path = path
+            elif isinstance(node, ErrorNode) and node.included_path is not None:
+                includes.setdefault(including_path, set()).add(node.included_path)
+            stack.extend((child, including_path) for child in node.children)
+        for path, targets in includes.items():
+            self.set_includes(path, targets, BUILD)
+
+    def includes(self, path: str) -> Set[str]:
+        """
+        Return the files directly included by a launch file.
+
+        Args:
+            path: The path of the launch file.
+
+        Returns:
+            The paths of the included files.
+        """
+        path = canonical_path(path)
+        with self._lock:
+            return set().union(
+                *(edges.get(path, set()) for edges in self._edges.values())
+            )
+
+    def includers(self, path: str) -> Set[str]:
+        """
+        Return the files directly including a launch file.
+
+        Args:
+            path: The path of the launch file.
+
+        Returns:
+            The paths of the including files.
+        """
+        with self._lock:
+            return set(self._reverse.get(canonical_path(path), {}))
+
+    def dependents(self, path: str) -> Set[str]:
+        """
+        Return the files transitively including a launch file.
+
+        Args:
+            path: The path of the launch file.
+
+        Returns:
+            The paths of the including files, without the file itself.
+        """
+        path = canonical_path(path)
+        found: Set[str] = set()
+        with self._lock:
+            stack = [path]
+            while stack:
+                for includer in self._reverse.get(stack.pop(), {}):
+                    if includer not in found and includer != path:
+                        found.add(includer)
+                        stack.append(includer)
+        return found
+
+    def roots(self, path: str) -> Set[str]:
+        """
+        Return the top-level launch files transitively including a launch file,
+        i.e. the dependents that are not included by any file.
+
+        Args:
+            path: The path of the launch file.
+
+        Returns:
+            The paths of the top-level files, or the file itself if nothing
+            includes it.
+        """
+        dependents = self.dependents(path)
+        if not dependents:
+            return {canonical_path(path)}
+        with self._lock:
+            return {
+                dependent for dependent in dependents if dependent not in self._reverse
+            }
+
+    def save(self, path: str):
+        """
+        Write the graph to a JSON file.
+
+        Args:
+            path: The path of the file.
+        """
+        with self._lock:
+            data = {
+                origin: {source: sorted(targets) for source, targets in edges.items()}
+                for origin, edges in self._edges.items()
+            }
+        with open(path, "w") as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path: str) -> "IncludeGraph":
+        """
+        Read a graph written by save.
+
+        Args:
+            path: The path of the file.
+
+        Returns:
+            The graph.
+        """
+        with open(path) as f:
+            data = json.load(f)
+        graph = cls()
+        for origin, edges in data.items():
+            for source, targets in edges.items():
+                graph.set_includes(source, targets, origin)
+        return graph
+
+
+def find_package_path(package_name: str, relative_path: str) -> Optional[str]:
+    """
+    Resolve a path relative to the share directory of a package.
+
+    Args:
+        package_name: The name of the package.
+        relative_path: The path relative to the share directory.
+
+    Returns:
+        The resolved path, or None if the package or path does not exist.
+    """
+    from ament_index_python.packages import (
+        PackageNotFoundError,
+        get_package_share_directory,
+    )
+
+    try:
+        share = get_package_share_directory(package_name)
+    except PackageNotFoundError:
+        return None
+    path = resolve_symlink(os.path.join(share, relative_path.lstrip("/")))
+    return path if os.path.exists(path) else None
+
+
+def resolve_include_file(
+    path: str,
+    value: str,
+    find_package: Callable[[str, str], Optional[str]] = find_package_path,
+) -> Optional[str]:
+    """
+    Resolve the file attribute of an XML <include> without evaluating it.
+
+    Supports plain paths, $(find-pkg-share pkg)/path and $(dirname)/path.
+
+    Args:
+        path: The path of the including launch file.
+        value: The value of the file attribute.
+        find_package: Resolves a package name and a path relative to its share
+            directory, like find_package_path. The language server passes a
+            cached resolver.
+
+    Returns:
+        The canonical path of the included file, or None if it cannot be
+        resolved statically.
+    """
+    if "$(" not in value:
+        return canonical_path(os.path.join(os.path.dirname(path), value))
+    match = _dirname.match(value)
+    if match:
+        if "$(" in match.group("path"):
+            return None
+        return canonical_path(os.path.dirname(path) + match.group("path"))
+    match = _find_pkg_share.match(value)
+    if match:
+        if "$(" in match.group("path"):
+            return None
+        resolved = find_package(match.group("package"), match.group("path"))
+        return canonical_path(resolved) if resolved is not None else None
+    return None
+
+
+def extract_xml_includes(path: str) -> List[str]:
+    """
+    Extract the statically resolvable includes of an XML launch file.
+
+    Args:
+        path: The path of the launch file.
+
+    Returns:
+        The paths of the included files.
+    """
+    try:
+        root = ElementTree.parse(path).getroot()
+    except (ElementTree.ParseError, OSError):
+        return []
+    includes = []
+    for element in root.iter("include"):
+        value = element.get("file")
+        if not value:
+            continue
+        target = resolve_include_file(path, value)
+        if target is not None:
+            includes.append(target)
+    return includes
+
+
+def iter_launch_files(directory: str) -> Iterator[str]:
+    """
+    Yield the XML launch files below a directory.
+
+    Args:
+        directory: The directory to search.
+    """
+    for root, directories, files in os.walk(directory):
+        directories[:] = [
+            name
+            for name in directories
+            if name not in IGNORED_DIRECTORIES and not name.startswith(".")
+        ]
+        for name in files:
+            path = os.path.join(root, name)
+            if is_launch_file(path):
+                yield path
+
+
+def scan_directories(directories: Iterable[str]) -> IncludeGraph:
+    """
+    Build the static include graph of the XML launch files below directories.
+
+    Args:
+        directories: The directories to search.
+
+    Returns:
+        The graph.
+    """
+    graph = IncludeGraph()
+    for directory in directories:
+        for path in iter_launch_files(directory):
+            graph.set_includes(path, extract_xml_includes(path), STATIC)
+    return graph
@@ -1,4 +1,4 @@
-from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional
 
 from launch.substitutions import LaunchConfiguration, TextSubstitution
 from launch_ros.parameter_descriptions import ParameterFile, ParameterValue
@@ -149,9 +149,7 @@ def serialize_parameter_dict(parameter_dict: Dict[Any, Any]) -> Dict[Any, Any]:
     }
 
 
-def serialize_parameters(
-    parameters: Optional[Iterable[Any]],
-) -> Dict[Any, Union[Any, List[Any]]]:
+def serialize_parameters(parameters: Optional[Iterable[Any]]) -> List[Any]:
     """
     Serialize a list of parameters.
 
@@ -159,9 +157,33 @@ def serialize_parameters(
         parameters (Optional[Iterable[Any]]): A list of parameters to serialize.
 
     Returns:
-        Dict[Any, Union[Any, List[Any]]]: A dictionary containing the serialized parameters.
+        List[Any]: The serialized parameters, empty if there are none.
     """
     if parameters is None:
-        return {}
+        return []
     serialized = [serialize_object(parameter) for parameter in parameters]
     return serialized
+
+
+def serialize_global_parameters(
+    global_parameters: Optional[Iterable[Any]],
+) -> List[Dict[str, Any]]:
+    """
+    Serialize the global parameters set with SetParameter and
+    SetParametersFromFile, in the format of serialize_parameters.
+
+    Args:
+        global_parameters (Optional[Iterable[Any]]): The "global_params" launch
+            configuration: (name, value) tuples and parameter file paths.
+
+    Returns:
+        List[Dict[str, Any]]: A dictionary per parameter or parameter file.
+    """
+    serialized = []
+    for parameter in global_parameters or []:
+        if isinstance(parameter, tuple):
+            name, value = parameter
+            serialized.append({str(name): value})
+        else:
+            serialized.append({"__parameter_file__": resolve_symlink(str(parameter))})
+    return serialized
@@ -0,0 +1,428 @@
+import dataclasses
+import weakref
+from typing import Any, Callable, Dict, List, Optional
+
+from .cache import cache_manager
+from .parameter_engine import effective_parameters
+
+NODE = "Node"
+COMPOSABLE_NODE_CONTAINER = "ComposableNodeContainer"
+COMPOSABLE_NODE = "ComposableNode"
+
+
+def normalize_namespace(namespace: Optional[str]) -> str:
+    """
+    Normalize a namespace to a leading slash and no trailing slash.
+
+    Args:
+        namespace (Optional[str]): The namespace, e.g. "sensing/" or "".
+
+    Returns:
+        str: The normalized namespace, e.g. "/sensing" or "/".
+    """
+    return "/" + (namespace or "").strip("/")
+
+
+def fully_qualified_name(namespace: Optional[str], name: Optional[str]) -> str:
+    """
+    Join a namespace and a node name.
+
+    Args:
+        namespace (Optional[str]): The namespace of the node.
+        name (Optional[str]): The name of the node; a name starting with a
+            slash is already fully qualified.
+
+    Returns:
+        str: The fully qualified name, e.g. "/sensing/lidar".
+    """
+    name = name or ""
+    if name.startswith("/"):
+        return normalize_namespace(name)
+    namespace = normalize_namespace(namespace)
+    return f"{namespace}/{name}" if namespace != "/" else f"/{name}"
+
+
+def parameter_file_paths(parameters: Any) -> List[str]:
+    """
+    Return the parameter files in serialized parameters.
+
+    Args:
+        parameters (Any): The serialized parameters of a node.
+
+    Returns:
+        List[str]: The paths of the parameter files, in order.
+    """
+    if not isinstance(parameters, list):
+        return []
+    return [
+        parameter["__parameter_file__"]
+        for parameter in parameters
+        if isinstance(parameter, dict) and "__parameter_file__" in parameter
+    ]
+
+
+@dataclasses.dataclass
+class LaunchedNode:
+    """
+    A node launched by a launch tree.
+
+    Attributes:
+        kind (str): NODE, COMPOSABLE_NODE_CONTAINER or COMPOSABLE_NODE.
+        package (str): The package of the node.
+        executable (str): The executable, or the plugin of a composable node.
+        name (str): The name of the node.
+        namespace (str): The normalized namespace of the node.
+        fully_qualified_name (str): The namespace joined with the name.
+        launch_file (Optional[str]): The launch file launching the node.
+        parameter_files (List[str]): The parameter files loaded by the node,
+            including the global ones.
+        parameters (List[Any]): The serialized parameters of the node.
+        global_parameters (List[Any]): The serialized global parameters set
+            before the node.
+        target_container (Optional[str]): The fully qualified name of the
+            container a composable node is loaded into.
+        container (Optional[LaunchedNode]): The container a composable node
+            is loaded into, if it is launched by the same tree.
+    """
+
+    kind: str
+    package: str
+    executable: str
+    name: str
+    namespace: str
+    fully_qualified_name: str
+    launch_file: Optional[str]
+    parameter_files: List[str]
+    parameters: List[Any] = dataclasses.field(default_factory=list, repr=False)
+    global_parameters: List[Any] = dataclasses.field(default_factory=list, repr=False)
+    target_container: Optional[str] = None
+    container: Optional["LaunchedNode"] = dataclasses.field(default=None, repr=False)
+
+    def effective_parameters(self) -> Dict[str, Any]:
+        """
+        Resolve the effective parameters of the node.
+
+        Returns:
+            Dict[str, Any]: The parameter values with their source file and
+                line, and the parameter files that could not be loaded.
+        """
+        parameters, errors = effective_parameters(
+            self.fully_qualified_name, self.parameters, self.global_parameters
+        )
+        return {
+            "parameters": {name: value.as_dict() for name, value in parameters.items()},
+            "errors": errors,
+        }
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Get the node as a JSON-serializable dictionary.
+
+        Returns:
+            Dict[str, Any]: The attributes, with the resolved container as its
+                fully qualified name (None if it was not found).
+        """
+        return {
+            "kind": self.kind,
+            "package": self.package,
+            "executable": self.executable,
+            "name": self.name,
+            "namespace": self.namespace,
+            "fully_qualified_name": self.fully_qualified_name,
+            "launch_file": self.launch_file,
+            "parameter_files": self.parameter_files,
+            "target_container": self.target_container,
+            "container": (
+                self.container.fully_qualified_name
+                if self.container is not None
+                else None
+            ),
+        }
+
+
+class LaunchTreeIndex:
+    """
+    Hash indexes over the nodes launched by a built launch tree.
+
+    The tree is walked once; afterwards every lookup by fully qualified name,
+    package, executable, namespace (exact or including nested namespaces) or
+    parameter file is a dictionary lookup. Composable nodes are joined to
+    the container they are loaded into.
+
+    Args:
+        tree (Any): A built launch tree node or its serialization.
+    """
+
+    def __init__(self, tree: Any):
+        if not isinstance(tree, dict):
+            tree = tree.serialize()
+        self.nodes: List[LaunchedNode] = []
+        self._by_name: Dict[str, List[LaunchedNode]] = {}
+        self._by_package: Dict[str, List[LaunchedNode]] = {}
+        self._by_executable: Dict[str, List[LaunchedNode]] = {}
+        self._by_namespace: Dict[str, List[LaunchedNode]] = {}
+        self._by_namespace_prefix: Dict[str, List[LaunchedNode]] = {}
+        self._by_parameter_file: Dict[str, List[LaunchedNode]] = {}
+        self._loaded_into: Dict[str, List[LaunchedNode]] = {}
+        self._collect(tree)
+        for node in self.nodes:
+            self._add(node)
+        self._join_containers()
+
+    def _collect(self, tree: Dict[str, Any]):
+        stack = [(tree, tree.get("path"))]
+        while stack:
+            data, launch_file = stack.pop()
+            kind = data["type"]
+            if kind == "IncludeLaunchDescription":
+                launch_file = data["path"]
+            elif kind in (NODE, COMPOSABLE_NODE_CONTAINER):
+                self.nodes.append(
+                    LaunchedNode(
+                        kind=kind,
+                        package=data["package"],
+                        executable=data["executable"],
+                        name=data["name"],
+                        namespace=normalize_namespace(data["namespace"]),
+                        fully_qualified_name=fully_qualified_name(
+                            data["namespace"], data["name"]
+                        ),
+                        launch_file=launch_file,
+                        parameter_files=parameter_file_paths(
+                            data.get("global_parameters", []) + data["parameters"]
+                        ),
+                        parameters=data["parameters"],
+                        global_parameters=data.get("global_parameters", []),
+                    )
+                )
+            elif kind == "LoadComposableNodes":
+                target_container = normalize_namespace(data["target_container"])
+                for loaded in data["loaded_nodes"]:
+                    self.nodes.append(
+                        LaunchedNode(
+                            kind=COMPOSABLE_NODE,
+                            package=loaded["package"],
+                            executable=loaded["plugin"],
+                            name=loaded["name"],
+                            namespace=normalize_namespace(loaded["namespace"]),
+                            fully_qualified_name=fully_qualified_name(
+                                loaded["namespace"], loaded["name"]
+                            ),
+                            launch_file=launch_file,
+                            parameter_files=parameter_file_paths(
+                                loaded.get("global_parameters", [])
+                                + loaded["parameters"]
+                            ),
+                            parameters=loaded["parameters"],
+                            global_parameters=loaded.get("global_parameters", []),
+                            target_container=target_container,
+                        )
+                    )
+            stack.extend(
+                (child, launch_file) for child in reversed(data.get("children", []))
+            )
+
+    def _add(self, node: LaunchedNode):
+        self._by_name.setdefault(node.fully_qualified_name, []).append(node)
+        self._by_package.setdefault(node.package, []).append(node)
+        self._by_executable.setdefault(node.executable, []).append(node)
+        self._by_namespace.setdefault(node.namespace, []).append(node)
+        namespace = node.namespace
+        while True:
+            self._by_namespace_prefix.setdefault(namespace, []).append(node)
+            if namespace == "/":
+                break
+            namespace = namespace.rsplit("/", 1)[0] or "/"
+        for path in dict.fromkeys(node.parameter_files):
+            self._by_parameter_file.setdefault(path, []).append(node)
+        if node.target_container is not None:
+            self._loaded_into.setdefault(node.target_container, []).append(node)
+
+    def _join_containers(self):
+        for container_name, loaded_nodes in self._loaded_into.items():
+            containers = [
+                node
+                for node in self._by_name.get(container_name, [])
+                if node.kind == COMPOSABLE_NODE_CONTAINER
+            ]
+            if containers:
+                for node in loaded_nodes:
+                    node.container = containers[0]
+
+    def by_name(self, name: str) -> List[LaunchedNode]:
+        """
+        Get the nodes with a fully qualified name.
+
+        Args:
+            name (str): The fully qualified name, e.g. "/sensing/lidar".
+
+        Returns:
+            List[LaunchedNode]: The nodes in launch order.
+        """
+        return list(self._by_name.get(normalize_namespace(name), []))
+
+    def by_package(self, package: str) -> List[LaunchedNode]:
+        """
+        Get the nodes of a package.
+
+        Args:
+            package (str): The package name.
+
+        Returns:
+            List[LaunchedNode]: The nodes in launch order.
+        """
+        return list(self._by_package.get(package, []))
+
+    def by_executable(self, executable: str) -> List[LaunchedNode]:
+        """
+        Get the nodes of an executable, or the composable nodes of a plugin.
+
+        Args:
+            executable (str): The executable or plugin name.
+
+        Returns:
+            List[LaunchedNode]: The nodes in launch order.
+        """
+        return list(self._by_executable.get(executable, []))
+
+    def in_namespace(
+        self, namespace: str, recursive: bool = False
+    ) -> List[LaunchedNode]:
+        """
+        Get the nodes in a namespace.
+
+        Args:
+            namespace (str): The namespace, e.g. "/sensing".
+            recursive (bool): Whether to include the nodes of nested
+                namespaces, e.g. "/sensing/lidar".
+
+        Returns:
+            List[LaunchedNode]: The nodes in launch order.
+        """
+        index = self._by_namespace_prefix if recursive else self._by_namespace
+        return list(index.get(normalize_namespace(namespace), []))
+
+    def by_parameter_file(self, path: str) -> List[LaunchedNode]:
+        """
+        Get the nodes loading a parameter file.
+
+        Args:
+            path (str): The path of the parameter file, as resolved in the tree.
+
+        Returns:
+            List[LaunchedNode]: The nodes in launch order.
+        """
+        return list(self._by_parameter_file.get(path, []))
+
+    def loaded_into(self, container: str) -> List[LaunchedNode]:
+        """
+        Get the composable nodes loaded into a container.
+
+        Args:
+            container (str): The fully qualified name of the container.
+
+        Returns:
+            List[LaunchedNode]: The composable nodes in launch order.
+        """
+        return list(self._loaded_into.get(normalize_namespace(container), []))
+
+    def query(
+        self,
+        name: Optional[str] = None,
+        package: Optional[str] = None,
+        executable: Optional[str] = None,
+        namespace: Optional[str] = None,
+        recursive: bool = False,
+        parameter_file: Optional[str] = None,
+        container: Optional[str] = None,
+    ) -> List[LaunchedNode]:
+        """
+        Get the nodes matching all given criteria.
+
+        The smallest of the matching index entries is filtered by all
+        criteria, so the cost is bounded by the most selective criterion.
+
+        Args:
+            name (Optional[str]): The fully qualified name.
+            package (Optional[str]): The package name.
+            executable (Optional[str]): The executable or plugin name.
+            namespace (Optional[str]): The namespace.
+            recursive (bool): Whether the namespace includes nested namespaces.
+            parameter_file (Optional[str]): The path of a loaded parameter file.
+            container (Optional[str]): The container of composable nodes.
+
+        Returns:
+            List[LaunchedNode]: The matching nodes in launch order, or all
+                nodes if no criterion is given.
+        """
+        candidates: List[List[LaunchedNode]] = []
+        predicates: List[Callable[[LaunchedNode], bool]] = []
+        if name is not None:
+            name = normalize_namespace(name)
+            candidates.append(self._by_name.get(name, []))
+            predicates.append(lambda node: node.fully_qualified_name == name)
+        if package is not None:
+            candidates.append(self._by_package.get(package, []))
+            predicates.append(lambda node: node.package == package)
+        if executable is not None:
+            candidates.append(self._by_executable.get(executable, []))
+            predicates.append(lambda node: node.executable == executable)
+        if namespace is not None:
+            namespace = normalize_namespace(namespace)
+            index = self._by_namespace_prefix if recursive else self._by_namespace
+            candidates.append(index.get(namespace, []))
+            predicates.append(
+                lambda node: node.namespace == namespace
+                or (
+                    recursive
+                    and (namespace == "/" or node.namespace.startswith(namespace + "/"))
+                )
+            )
+        if parameter_file is not None:
+            candidates.append(self._by_parameter_file.get(parameter_file, []))
+            predicates.append(lambda node: parameter_file in node.parameter_files)
+        if container is not None:
+            container = normalize_namespace(container)
+            candidates.append(self._loaded_into.get(container, []))
+            predicates.append(lambda node: node.target_container == container)
+        if not candidates:
+            return list(self.nodes)
+
+        smallest = min(candidates, key=len)
+        return [node for node in smallest if all(match(node) for match in predicates)]
+
+
+_tree_indexes = cache_manager.region("launch_tree_index")
+
+
+def index_tree(tree: Any) -> LaunchTreeIndex:
+    """
+    Get the index of a built launch tree, indexing it on first use.
+
+    Args:
+        tree (Any): The built launch tree node; the index is cached as long
+            as the tree is alive.
+
+    Returns:
+        LaunchTreeIndex: The index, shared by all queries on the tree.
+    """
+    key = id(tree)
+    cached = _tree_indexes.get(key)
+    if cached is not None and cached[0]() is tree:
+        _tree_indexes.stats.hit()
+        return cached[1]
+    _tree_indexes.stats.miss()
+    index = LaunchTreeIndex(tree)
+
+    # The tree is referenced weakly, so that the index does not keep it
+    # alive, and the index is dropped with the tree.
+    def drop(reference: weakref.ref):
+        entry = _tree_indexes.get(key)
+        if entry is not None and entry[0] is reference:
+            _tree_indexes.pop(key)
+
+    # A LaunchedNode with its index entries takes about 500 bytes.
+    _tree_indexes.put(
+        key, (weakref.ref(tree, drop), index), 1000 + 500 * len(index.nodes)
+    )
+    return index
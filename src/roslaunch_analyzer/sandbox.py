@@ -0,0 +1,351 @@
+import json
+import os
+import select
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Importing launch and launch_ros in a fresh worker takes a while, so the
+# first evaluation gets more time than the configured timeout.
+STARTUP_TIMEOUT = 30.0
+
+# Messages encode tuples, e.g. the (name, value) entries of the "global_params"
+# launch configuration, as {TUPLE_KEY: [...]}, since JSON has only lists.
+TUPLE_KEY = "__tuple__"
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, tuple):
+        return {TUPLE_KEY: [_encode(item) for item in value]}
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    return value
+
+
+def _decode(value: Dict[str, Any]) -> Any:
+    if len(value) == 1 and TUPLE_KEY in value:
+        return tuple(value[TUPLE_KEY])
+    return value
+
+
+def dumps_message(message: Dict[str, Any]) -> str:
+    """
+    Dump a message between the sandbox and a worker as one line of JSON.
+
+    Args:
+        message (Dict[str, Any]): The message. Tuples are kept; values that
+            are not JSON-compatible are sent as their string representation.
+
+    Returns:
+        str: The JSON text, without a newline.
+    """
+    return json.dumps(_encode(message), default=str)
+
+
+def loads_message(text: str) -> Dict[str, Any]:
+    """
+    Load a message dumped with dumps_message.
+
+    Args:
+        text (str): The JSON text.
+
+    Returns:
+        Dict[str, Any]: The message, with its tuples restored.
+    """
+    return json.loads(text, object_hook=_decode)
+
+
+class SandboxError(Exception):
+    """
+    Raised when a Python launch file failed in the sandbox.
+    """
+
+
+class SandboxLimitError(SandboxError):
+    """
+    Raised when a Python launch file exceeded the time or memory limit of the
+    sandbox.
+    """
+
+
+class _Worker:
+    def __init__(self, memory: Optional[int]):
+        command = [sys.executable, "-m", "roslaunch_analyzer.sandbox"]
+        if memory is not None:
+            command.append(str(memory))
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self._buffer = b""
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def send(self, message: Dict[str, Any]):
+        self.process.stdin.write(dumps_message(message).encode() + b"\n")
+        self.process.stdin.flush()
+
+    def receive(self, timeout: float) -> Dict[str, Any]:
+        deadline = time.monotonic() + timeout
+        stdout = self.process.stdout
+        while b"\n" not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise SandboxLimitError(f"Timed out after {timeout:g} s")
+            readable, _, _ = select.select([stdout], [], [], remaining)
+            if not readable:
+                continue
+            data = os.read(stdout.fileno(), 65536)
+            if not data:
+                status = self.process.wait()
+                raise SandboxLimitError(f"Sandbox worker exited with status {status}")
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return loads_message(line.decode())
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+
+
+class Sandbox:
+    """
+    Supervised subprocesses evaluating Python launch files.
+
+    generate_launch_description() and the OpaqueFunctions of a Python launch
+    file run arbitrary code, which may block on the network or loop for a
+    long time. In the sandbox, the subtree of a Python launch file is built
+    in a worker process with a wall-clock timeout and an address space limit
+    and returned serialized. Python launch files included by it are handed
+    back and evaluated in workers of their own, each with its own limits, so
+    one slow include only costs its own subtree. A worker that exceeds a
+    limit is killed; idle workers are reused.
+
+    Args:
+        timeout (float): The wall-clock limit of one launch file in seconds,
+            not counting the Python launch files it includes.
+        memory (Optional[int]): The address space limit of a worker in bytes,
+            or None for no limit.
+    """
+
+    def __init__(self, timeout: float = 10.0, memory: Optional[int] = 2**30):
+        self.timeout = timeout
+        self.memory = memory
+        self._idle: List[_Worker] = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> _Worker:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.alive():
+                    return worker
+        worker = _Worker(self.memory)
+        try:
+            worker.receive(STARTUP_TIMEOUT)
+        except (OSError, SandboxLimitError):
+            worker.kill()
+            raise
+        return worker
+
+    def _release(self, worker: _Worker):
+        with self._lock:
+            self._idle.append(worker)
+
+    def evaluate(
+        self,
+        path: str,
+        arguments: Dict[str, str],
+        launch_configurations: Dict[str, Any],
+        environment: Dict[str, str],
+    ) -> Dict[str, Any]:
+        """
+        Build the subtree of a launch file in a worker.
+
+        Args:
+            path (str): The path of the launch file.
+            arguments (Dict[str, str]): The launch arguments of the include.
+            launch_configurations (Dict[str, Any]): The launch configurations
+                before the include.
+            environment (Dict[str, str]): The environment before the include.
+
+        Returns:
+            Dict[str, Any]: The serialized include node as "tree", and the
+                launch configurations and environment at the end of the
+                launch file.
+
+        Raises:
+            SandboxLimitError: If the evaluation exceeded a limit.
+            SandboxError: If the launch file raised an exception.
+        """
+        worker = self._acquire()
+        try:
+            worker.send(
+                {
+                    "path": path,
+                    "arguments": arguments,
+                    "launch_configurations": launch_configurations,
+                    "environment": environment,
+                }
+            )
+            remaining = self.timeout
+            while True:
+                started = time.monotonic()
+                response = worker.receive(remaining)
+                remaining -= time.monotonic() - started
+                if "include" not in response:
+                    break
+                worker.send(self._evaluate_include(response["include"]))
+        except (OSError, SandboxLimitError):
+            worker.kill()
+            raise
+        if response.get("limit"):
+            worker.kill()
+            raise SandboxLimitError(response["error"])
+        self._release(worker)
+        if "error" in response:
+            raise SandboxError(response["error"])
+        return response
+
+    def _evaluate_include(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return self.evaluate(**request)
+        except SandboxError as e:
+            return {"error": str(e), "limit": isinstance(e, SandboxLimitError)}
+
+    def close(self):
+        """
+        Stop the idle workers.
+        """
+        with self._lock:
+            workers, self._idle = self._idle, []
+        for worker in workers:
+            worker.kill()
+
+
+class _ParentSandbox:
+    # The sandbox of a worker: nested Python launch files are handed back to
+    # the parent process.
+
+    def __init__(self, respond: Callable[[Dict[str, Any]], None]):
+        self._respond = respond
+
+    def evaluate(
+        self,
+        path: str,
+        arguments: Dict[str, str],
+        launch_configurations: Dict[str, Any],
+        environment: Dict[str, str],
+    ) -> Dict[str, Any]:
+        self._respond(
+            {
+                "include": {
+                    "path": path,
+                    "arguments": arguments,
+                    "launch_configurations": launch_configurations,
+                    "environment": environment,
+                }
+            }
+        )
+        reply = loads_message(sys.stdin.readline())
+        if reply.get("limit"):
+            raise SandboxLimitError(reply["error"])
+        if "error" in reply:
+            raise SandboxError(reply["error"])
+        return reply
+
+
+sandbox: Optional[Sandbox] = None
+
+
+def enable_sandbox(timeout: float = 10.0, memory: Optional[int] = 2**30) -> Sandbox:
+    """
+    Build the subtrees of Python launch files in a sandbox from now on.
+
+    Args:
+        timeout (float): The wall-clock limit of one evaluation in seconds.
+        memory (Optional[int]): The address space limit of the worker in
+            bytes, or None for no limit.
+
+    Returns:
+        Sandbox: The sandbox.
+    """
+    global sandbox
+    if sandbox is not None:
+        sandbox.close()
+    sandbox = Sandbox(timeout, memory)
+    return sandbox
+
+
+def _evaluate(request: Dict[str, Any]) -> Dict[str, Any]:
+    from launch import LaunchContext
+    from launch.actions import IncludeLaunchDescription
+    from launch.launch_description_sources import AnyLaunchDescriptionSource
+
+    from .tree import IncludeLaunchDescriptionNode
+
+    os.environ.clear()
+    os.environ.update(request["environment"])
+    context = LaunchContext()
+    context.launch_configurations.update(request["launch_configurations"])
+    entity = IncludeLaunchDescription(
+        AnyLaunchDescriptionSource(request["path"]),
+        launch_arguments=list(request["arguments"].items()),
+    )
+    node = IncludeLaunchDescriptionNode(entity=entity, context=context)
+    node.build_in_process()
+    return {
+        "tree": node.serialize(),
+        "launch_configurations": node.launch_configurations,
+        "environment": node.environment,
+    }
+
+
+def _worker_main(memory: Optional[int]):
+    if memory is not None:
+        import resource
+
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+
+    # Launch files may print; keep stdout for the responses only.
+    responses = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    from .patches import apply_patches
+
+    apply_patches()
+
+    def respond(response: Dict[str, Any]):
+        responses.write(dumps_message(response) + "\n")
+        responses.flush()
+
+    global sandbox
+    sandbox = _ParentSandbox(respond)
+
+    respond({"ready": True})
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
+        try:
+            respond(_evaluate(loads_message(line)))
+        except MemoryError:
+            respond({"error": "Memory limit exceeded", "limit": True})
+        except Exception as e:
+            respond({"error": f"{type(e).__name__}: {e}"})
+
+
+if __name__ == "__main__":
+    # Run the worker in the imported module, whose sandbox the tree uses.
+    import roslaunch_analyzer.sandbox
+
+    roslaunch_analyzer.sandbox._worker_main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else None
+    )
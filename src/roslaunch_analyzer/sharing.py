@@ -0,0 +1,231 @@
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from .cache import cache_manager
+
+SHARED_FORMAT = "roslaunch-shared-v1"
+REFERENCE_KEY = "$ref"
+
+# The keys whose values are shared parameter lists.
+SHARED_KEYS = ("parameters", "global_parameters")
+
+# Shorter payloads are emitted inline; a reference would not be smaller.
+_MIN_SHARED_LENGTH = 64
+
+_payloads = cache_manager.region("shared_payload")
+
+
+def content_id(value: Any) -> str:
+    """
+    Return the content address of JSON-compatible data.
+
+    Args:
+        value (Any): The data. Values that are not JSON-compatible are
+            addressed by their string representation.
+
+    Returns:
+        str: A hash of the canonical JSON of the data.
+    """
+    text = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return _text_id(text)
+
+
+def _text_id(text: str) -> str:
+    return hashlib.sha1(text.encode(), usedforsecurity=False).hexdigest()[:16]
+
+
+def share(value: Any) -> Any:
+    """
+    Return the shared instance of a payload equal to the given one.
+
+    The tree builder passes the parameter lists and launch configurations of
+    every node through this, so the nodes of repeated driver stacks reference
+    one object each instead of a copy per node. The instances are kept in the
+    "shared_payload" cache region; payloads returned by this function are
+    shared and must not be modified.
+
+    Args:
+        value (Any): A list or dictionary.
+
+    Returns:
+        Any: The shared instance, or value itself if it is the first of its
+            content or empty.
+    """
+    if not value:
+        return value
+    key = content_id(value)
+    shared = _payloads.get(key)
+    if shared is not None and shared == value:
+        _payloads.stats.hit()
+        return shared
+    _payloads.stats.miss()
+    _payloads.put(key, value)
+    return value
+
+
+def _is_subtree(value: Dict[str, Any]) -> bool:
+    return "type" in value and "children" in value
+
+
+def _is_reference(value: Dict[str, Any]) -> bool:
+    return len(value) == 1 and REFERENCE_KEY in value
+
+
+def share_definitions(data: Any) -> Dict[str, Any]:
+    """
+    Emit repeated subtrees and parameter lists of serialized data once.
+
+    Every subtree (a node with children) and every parameter list is
+    addressed by the hash of its content. Those occurring more than once are
+    stored in a definitions table and replaced by {"$ref": id} everywhere,
+    including inside other definitions. A subtree is hashed from the ids of
+    its parts, so every part of the data is serialized only once.
+
+    Args:
+        data (Any): JSON-compatible data, e.g. the output of
+            LaunchTreeNode.serialize().
+
+    Returns:
+        Dict[str, Any]: The definitions keyed by id and the data referencing
+            them.
+    """
+    counts: Dict[str, int] = {}
+    # id(value) -> content id (None if too short to share) and canonical
+    # text of the shareable values, so payloads shared in memory are hashed
+    # once.
+    ids: Dict[int, Optional[str]] = {}
+    texts: Dict[int, str] = {}
+
+    def canonical(value: Any, parameter_list: bool) -> str:
+        if id(value) in texts:
+            value_id = ids[id(value)]
+            if value_id is not None:
+                counts[value_id] += 1
+            return texts[id(value)]
+        if isinstance(value, dict):
+            shareable = _is_subtree(value)
+            text = (
+                "{"
+                + ",".join(
+                    json.dumps(str(key)) + ":" + canonical(item, key in SHARED_KEYS)
+                    for key, item in sorted(value.items(), key=lambda i: str(i[0]))
+                )
+                + "}"
+            )
+        elif isinstance(value, (list, tuple)):
+            shareable = parameter_list
+            text = "[" + ",".join(canonical(item, False) for item in value) + "]"
+        else:
+            return json.dumps(value, default=str)
+        if not shareable:
+            return text
+        value_id = None
+        if len(text) >= _MIN_SHARED_LENGTH:
+            value_id = _text_id(text)
+            counts[value_id] = counts.get(value_id, 0) + 1
+            text = json.dumps({REFERENCE_KEY: value_id})
+        ids[id(value)] = value_id
+        texts[id(value)] = text
+        return text
+
+    canonical(data, False)
+
+    definitions: Dict[str, Any] = {}
+
+    # Only the shareable values have ids.
+    def replace(value: Any) -> Any:
+        value_id = ids.get(id(value))
+        if value_id is not None and counts[value_id] > 1:
+            if value_id not in definitions:
+                # Reserve the id before descending into the definition.
+                definitions[value_id] = None
+                definitions[value_id] = expand_value(value)
+            return {REFERENCE_KEY: value_id}
+        return expand_value(value)
+
+    def expand_value(value: Any) -> Any:
+        if isinstance(value, dict):
+            return {key: replace(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [replace(item) for item in value]
+        return value
+
+    data = replace(data)
+
+    # The parts of a repeated subtree were counted once per occurrence of the
+    # subtree, so some definitions are only referenced by another one.
+    references: Dict[str, int] = {}
+
+    def count(value: Any):
+        if isinstance(value, dict):
+            if _is_reference(value):
+                value_id = value[REFERENCE_KEY]
+                references[value_id] = references.get(value_id, 0) + 1
+            else:
+                for item in value.values():
+                    count(item)
+        elif isinstance(value, list):
+            for item in value:
+                count(item)
+
+    count(data)
+    for definition in definitions.values():
+        count(definition)
+
+    def inline(value: Any) -> Any:
+        if isinstance(value, dict):
+            if not _is_reference(value):
+                return {key: inline(item) for key, item in value.items()}
+            if references[value[REFERENCE_KEY]] == 1:
+                return inline(definitions[value[REFERENCE_KEY]])
+            return value
+        if isinstance(value, list):
+            return [inline(item) for item in value]
+        return value
+
+    return {
+        "format": SHARED_FORMAT,
+        "definitions": {
+            value_id: inline(definition)
+            for value_id, definition in definitions.items()
+            if references[value_id] > 1
+        },
+        "data": inline(data),
+    }
+
+
+def expand_definitions(document: Dict[str, Any]) -> Any:
+    """
+    Expand data produced by share_definitions.
+
+    Every definition is expanded once, so the references to it share one
+    object in the result.
+
+    Args:
+        document (Dict[str, Any]): The document with the definitions.
+
+    Returns:
+        Any: The original data.
+
+    Raises:
+        ValueError: If the document is not in the shared format.
+    """
+    if document.get("format") != SHARED_FORMAT:
+        raise ValueError(f"Unknown format: {document.get('format')!r}")
+    definitions: Dict[str, Any] = document["definitions"]
+    expanded: Dict[str, Any] = {}
+
+    def expand(value: Any) -> Any:
+        if isinstance(value, dict):
+            if _is_reference(value):
+                value_id = value[REFERENCE_KEY]
+                if value_id not in expanded:
+                    expanded[value_id] = expand(definitions[value_id])
+                return expanded[value_id]
+            return {key: expand(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [expand(item) for item in value]
+        return value
+
+    return expand(document["data"])
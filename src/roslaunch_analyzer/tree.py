@@ -1,5 +1,7 @@
+import dataclasses
 import itertools
-from typing import Any, Dict, List, Optional
+import os
+from typing import Any, Dict, List, MutableMapping, Optional, Tuple
 
 from launch import Action, LaunchContext, LaunchDescription, LaunchDescriptionEntity
 from launch.actions import (
@@ -24,7 +26,11 @@ from launch_ros.actions import (
 )
 from launch_ros.descriptions import ComposableNode
 
-from .parameter import serialize_parameters
+from . import sandbox as _sandbox
+from .cache import cache_manager
+from .parameter import serialize_global_parameters, serialize_parameters
+from .query import parameter_file_paths
+from .sharing import SHARED_KEYS, share
 from .utils import extract_package_name, resolve_symlink
 
 
@@ -84,6 +90,26 @@ def to_string(context: LaunchContext, substitutions: Any) -> str:
     )
 
 
+# The position of an XML element in its launch file: the indices of the
+# element and its ancestors among the children of their parents, () for the
+# <launch> element.
+Element = Tuple[int, ...]
+
+
+def _declared_elements(
+    element: Optional[Element],
+    declared: List[LaunchDescriptionEntity],
+    sub_entities: List[LaunchDescriptionEntity],
+) -> List[Optional[Element]]:
+    if element is None:
+        return [None] * len(sub_entities)
+    indices = {id(entity): index for index, entity in enumerate(declared)}
+    return [
+        element + (indices[id(entity)],) if id(entity) in indices else None
+        for entity in sub_entities
+    ]
+
+
 class LaunchTreeNode:
     """
     Base class for representing a node in the launch description tree.
@@ -95,6 +121,31 @@ class LaunchTreeNode:
         self.entity = entity
         self.context = context
         self.children: List[LaunchTreeNode] = []
+        self.launch_file: Optional[str] = None
+        # The XML element the entity was parsed from, if known.
+        self.element: Optional[Element] = None
+        # The launch configurations each child element was evaluated with,
+        # including the children whose condition was false.
+        self.scopes: Dict[Element, Dict[str, Any]] = {}
+
+    def current_launch_file(self) -> Optional[str]:
+        """
+        Get the launch file in which the children of this node are declared.
+
+        Returns:
+            The path of the launch file, or None if it is unknown.
+        """
+        return self.launch_file
+
+    def included_file(self) -> Optional[str]:
+        """
+        Get the launch file included by this node.
+
+        Returns:
+            The path of the included launch file, or None if the node is not
+            an include.
+        """
+        return None
 
     def complete_entity_info(self):
         """
@@ -102,12 +153,30 @@ class LaunchTreeNode:
         """
         pass
 
+    def child_elements(
+        self, sub_entities: List[LaunchDescriptionEntity]
+    ) -> List[Optional[Element]]:
+        """
+        Get the XML elements the sub-entities were parsed from.
+
+        Args:
+            sub_entities: The list of sub-entities.
+
+        Returns:
+            The element of each sub-entity, or None for the entities that are
+            not parsed from an element of the launch file.
+        """
+        return [None] * len(sub_entities)
+
     def build_children(
         self, sub_entities: Optional[List[LaunchDescriptionEntity]]
     ) -> List["LaunchTreeNode"]:
         """
         Create child nodes for the given sub-entities.
 
+        A child whose build raises an exception is replaced by an ErrorNode,
+        and the remaining children are built regardless.
+
         Args:
             sub_entities: The list of sub-entities.
 
@@ -117,12 +186,25 @@ class LaunchTreeNode:
         if sub_entities is None:
             return []
 
-        return [
-            built_child
-            for entity in sub_entities
-            if (child := LaunchTreeNodeRegistry.get_node(entity, self.context))
-            if (built_child := child.build())
-        ]
+        launch_file = self.current_launch_file()
+        elements = self.child_elements(sub_entities)
+        built_children = []
+        for entity, element in zip(sub_entities, elements):
+            child = LaunchTreeNodeRegistry.get_node(entity, self.context)
+            if child is None:
+                continue
+            child.launch_file = launch_file
+            child.element = element
+            if element is not None:
+                self.scopes[element] = share(dict(self.context.launch_configurations))
+            try:
+                built_child = child.build()
+            except Exception as e:
+                built_child = ErrorNode(entity, self.context, e, launch_file)
+                built_child.element = element
+            if built_child is not None:
+                built_children.append(built_child)
+        return built_children
 
     def build(self) -> Optional["LaunchTreeNode"]:
         """
@@ -144,6 +226,28 @@ class LaunchTreeNode:
         self.children = self.build_children(sub_entities)
         return self
 
+    def iter_nodes(self):
+        """
+        Iterate over this node and all its descendants, depth first.
+
+        Yields:
+            The nodes of the subtree.
+        """
+        stack: List[LaunchTreeNode] = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def errors(self) -> List["ErrorNode"]:
+        """
+        Get the failed actions of the subtree.
+
+        Returns:
+            The error nodes in tree order.
+        """
+        return [node for node in self.iter_nodes() if isinstance(node, ErrorNode)]
+
     def serialize_children(self) -> List[Dict[str, Any]]:
         """
         Serialize the child nodes.
@@ -192,11 +296,139 @@ class SplicedNode(LaunchTreeNode):
         return self.serialize_children()
 
 
+def _launch_arguments_to_dict(
+    context: LaunchContext, entity: IncludeLaunchDescription
+) -> Dict[str, str]:
+    arguments = {}
+    for name, value in entity.launch_arguments:
+        try:
+            arguments[to_string(context, name)] = to_string(context, value)
+        except Exception:
+            arguments[repr(name)] = repr(value)
+    return arguments
+
+
+class ErrorNode(LaunchTreeNode):
+    """
+    Node representing an action whose build raised an exception.
+
+    The error node takes the place of the failed action and its subtree, so
+    the siblings of the action and the rest of the tree are still built.
+    For a failed IncludeLaunchDescription, the included file and its launch
+    arguments are recorded if they can still be evaluated.
+
+    Args:
+        entity: The action that failed.
+        context: The launch context.
+        exception: The exception raised by the build.
+        launch_file: The launch file in which the action is declared.
+    """
+
+    def __init__(
+        self,
+        entity: LaunchDescriptionEntity,
+        context: LaunchContext,
+        exception: Exception,
+        launch_file: Optional[str] = None,
+    ):
+        super().__init__(entity, context)
+        self.exception = exception
+        self.launch_file = launch_file
+        self.action: str = type(entity).__name__
+        self.included_path: Optional[str] = None
+        self.arguments: Dict[str, str] = {}
+        self.message = f"{type(exception).__name__}: {exception}"
+        if isinstance(entity, IncludeLaunchDescription):
+            try:
+                self.included_path = resolve_symlink(entity._get_launch_file())
+            except Exception:
+                pass
+            self.arguments = _launch_arguments_to_dict(context, entity)
+
+    @classmethod
+    def deserialize(cls, data: Dict[str, Any]) -> "ErrorNode":
+        """
+        Rebuild an error node from its serialization.
+
+        Args:
+            data: The serialized error node.
+
+        Returns:
+            The error node, without entity and context.
+        """
+        node = cls(None, None, _sandbox.SandboxError(data["error"]), data["path"])
+        node.action = data["action"]
+        node.included_path = data["included_path"]
+        node.arguments = data["arguments"]
+        node.message = data["error"]
+        return node
+
+    def _serialize(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "type": "Error",
+                "action": self.action,
+                "path": self.launch_file,
+                "included_path": self.included_path,
+                "arguments": self.arguments,
+                "error": self.message,
+                "children": [],
+            }
+        ]
+
+
+class SerializedNode(LaunchTreeNode):
+    """
+    Node rebuilt from the serialization of a node built in another process.
+
+    Args:
+        data: The serialized node.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        super().__init__(None, None)
+        for key in SHARED_KEYS:
+            if key in data:
+                data[key] = share(data[key])
+        self.data = data
+        self.children = [deserialize_node(child) for child in data.get("children", [])]
+
+    def included_file(self) -> Optional[str]:
+        if self.data["type"] == "IncludeLaunchDescription":
+            return self.data["path"]
+        return None
+
+    def _serialize(self) -> List[Dict[str, Any]]:
+        if "children" not in self.data:
+            return [self.data]
+        return [{**self.data, "children": self.serialize_children()}]
+
+
+def deserialize_node(data: Dict[str, Any]) -> LaunchTreeNode:
+    """
+    Rebuild a node from its serialization.
+
+    Args:
+        data: The serialized node.
+
+    Returns:
+        An ErrorNode for serialized errors, otherwise a SerializedNode.
+    """
+    if data["type"] == "Error":
+        return ErrorNode.deserialize(data)
+    return SerializedNode(data)
+
+
 @LaunchTreeNodeRegistry.register(action_cls=LaunchDescription)
 class LaunchDescriptionNode(SplicedNode):
     """Node representing a LaunchDescription."""
 
-    pass
+    entity: LaunchDescription
+
+    def child_elements(
+        self, sub_entities: List[LaunchDescriptionEntity]
+    ) -> List[Optional[Element]]:
+        return _declared_elements(self.element, self.entity.entities, sub_entities)
 
 
 @LaunchTreeNodeRegistry.register(action_cls=DeclareLaunchArgument)
@@ -282,6 +514,13 @@ class GroupActionNode(LaunchTreeNode):
         self.scoped: bool = self.entity._GroupAction__scoped
         self.forwarding: bool = self.entity._GroupAction__forwarding
 
+    def child_elements(
+        self, sub_entities: List[LaunchDescriptionEntity]
+    ) -> List[Optional[Element]]:
+        return _declared_elements(
+            self.element, self.entity._GroupAction__actions, sub_entities
+        )
+
     def _serialize(self) -> List[Dict[str, Any]]:
         children = self.serialize_children()
         if not children:
@@ -296,9 +535,84 @@ class GroupActionNode(LaunchTreeNode):
         ]
 
 
+_subtree_cache = cache_manager.region("launch_subtree")
+
+
+# The entries set and the keys removed by a subtree.
+_Changes = Tuple[Dict[str, Any], Tuple[str, ...]]
+
+
+@dataclasses.dataclass
+class _CachedSubtree:
+    package: Optional[str]
+    path: str
+    children: List[LaunchTreeNode]
+    # The changes of the subtree to the launch configurations and the
+    # environment, which the cache key fixes before the subtree.
+    launch_configuration_changes: _Changes
+    environment_changes: _Changes
+    # The modification times of the launch and parameter files.
+    mtimes: Dict[str, Optional[int]]
+
+
+def _freeze(mapping) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((str(key), repr(value)) for key, value in mapping.items()))
+
+
+def _changes(before: Dict[str, Any], after: Dict[str, Any]) -> _Changes:
+    updated = {
+        key: value
+        for key, value in after.items()
+        if key not in before or before[key] != value
+    }
+    return updated, tuple(key for key in before if key not in after)
+
+
+def _apply(mapping: MutableMapping[str, Any], changes: _Changes):
+    # The environment of a context is os.environ, shared with the builds on
+    # other threads: only the variables the subtree changed are touched.
+    updated, removed = changes
+    for key in removed:
+        mapping.pop(key, None)
+    for key, value in updated.items():
+        mapping[key] = value
+
+
+def _parameter_files(node: LaunchTreeNode) -> List[str]:
+    payloads = [getattr(node, key, None) for key in SHARED_KEYS]
+    for loaded in getattr(node, "loaded_nodes", ()):
+        payloads.extend(loaded.get(key) for key in SHARED_KEYS)
+    return [path for payload in payloads for path in parameter_file_paths(payload)]
+
+
+def _file_mtimes(paths) -> Dict[str, Optional[int]]:
+    mtimes = {}
+    for path in paths:
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            mtimes[path] = None
+    return mtimes
+
+
 @LaunchTreeNodeRegistry.register(action_cls=IncludeLaunchDescription)
 class IncludeLaunchDescriptionNode(LaunchTreeNode):
-    """Node representing an IncludeLaunchDescription."""
+    """
+    Node representing an IncludeLaunchDescription.
+
+    Included subtrees without errors are cached in the "launch_subtree" cache
+    region, keyed by the included file, its launch arguments and the launch
+    configurations and environment before the include. A cached subtree is
+    reused while none of the launch files and parameter files in it changed,
+    so after fixing a failing include only that include is evaluated again.
+    Reusing a subtree applies its changes to the launch configurations and
+    the environment.
+
+    Subtrees with Python launch files are not cached: their code may read
+    any file or helper module. Neither are dependencies of XML launch files
+    beyond their includes and parameter files tracked, e.g. files read with
+    $(command ...).
+    """
 
     entity: IncludeLaunchDescription
 
@@ -311,6 +625,163 @@ class IncludeLaunchDescriptionNode(LaunchTreeNode):
         )
         self.path: str = resolve_symlink(self.entity._get_launch_file())
 
+    def current_launch_file(self) -> Optional[str]:
+        return self.path
+
+    def included_file(self) -> Optional[str]:
+        return self.path
+
+    def child_elements(
+        self, sub_entities: List[LaunchDescriptionEntity]
+    ) -> List[Optional[Element]]:
+        # The launch description of an XML file is parsed from <launch>; the
+        # other sub-entities set the launch arguments.
+        xml = not self.path.endswith(".py")
+        return [
+            () if xml and isinstance(entity, LaunchDescription) else None
+            for entity in sub_entities
+        ]
+
+    def _subtree_key(self) -> Optional[Tuple[Any, ...]]:
+        try:
+            location = to_string(
+                self.context,
+                self.entity.launch_description_source._LaunchDescriptionSource__location,
+            )
+        except Exception:
+            return None
+        return (
+            resolve_symlink(os.path.abspath(location)),
+            tuple(_launch_arguments_to_dict(self.context, self.entity).items()),
+            _freeze(self.context.launch_configurations),
+            _freeze(self.context.environment),
+        )
+
+    def _reuse(self, cached: _CachedSubtree):
+        self.package = cached.package
+        self.path = cached.path
+        self.children = cached.children
+        _apply(self.context.launch_configurations, cached.launch_configuration_changes)
+        _apply(self.context.environment, cached.environment_changes)
+        self.launch_configurations = dict(self.context.launch_configurations)
+        self.environment = dict(self.context.environment)
+
+    def build(self) -> Optional["LaunchTreeNode"]:
+        """
+        Build the tree node and record the launch configurations and the
+        environment at the end of the included launch file.
+
+        Returns:
+            The built tree node or None if the entity's condition evaluates to False.
+        """
+        condition = self.entity.condition
+        if condition is not None and not condition.evaluate(self.context):
+            return None
+
+        key = self._subtree_key()
+        if key is not None:
+            cached = _subtree_cache.get(key)
+            if cached is not None and _file_mtimes(cached.mtimes) == cached.mtimes:
+                _subtree_cache.stats.hit()
+                self._reuse(cached)
+                return self
+            _subtree_cache.stats.miss()
+
+        if _sandbox.sandbox is not None and key is not None and key[0].endswith(".py"):
+            try:
+                self._build_in_sandbox(key[0], dict(key[1]))
+            except Exception as e:
+                if self.launch_file is not None:
+                    raise
+                # The root has no parent to replace it with an ErrorNode.
+                self._build_failed(key[0], e)
+            return self
+
+        return self.build_in_process(key)
+
+    def build_in_process(
+        self, key: Optional[Tuple[Any, ...]] = None
+    ) -> Optional["LaunchTreeNode"]:
+        """
+        Build the tree node in this process, bypassing the sandbox.
+
+        Args:
+            key: The key under which the subtree is cached, or None to not
+                cache it.
+
+        Returns:
+            The built tree node or None if the entity's condition evaluates to False.
+        """
+        before = (
+            dict(self.context.launch_configurations),
+            dict(self.context.environment),
+        )
+        built = super().build()
+        if built is not None:
+            self.launch_configurations: Dict[str, str] = dict(
+                self.context.launch_configurations
+            )
+            self.environment: Dict[str, str] = dict(self.context.environment)
+            if key is not None and not self.errors():
+                self._cache_subtree(key, *before)
+        return built
+
+    def _build_in_sandbox(self, path: str, arguments: Dict[str, str]):
+        launch_configurations = dict(self.context.launch_configurations)
+        environment = dict(self.context.environment)
+        response = _sandbox.sandbox.evaluate(
+            path, arguments, launch_configurations, environment
+        )
+        tree = response["tree"]
+        self._reuse(
+            _CachedSubtree(
+                package=tree["package"],
+                path=tree["path"],
+                children=[deserialize_node(child) for child in tree["children"]],
+                launch_configuration_changes=_changes(
+                    launch_configurations, response["launch_configurations"]
+                ),
+                environment_changes=_changes(environment, response["environment"]),
+                mtimes={},
+            )
+        )
+
+    def _build_failed(self, path: str, exception: Exception):
+        self.package = extract_package_name(path)
+        self.path = path
+        self.children = [ErrorNode(self.entity, self.context, exception)]
+        self.launch_configurations = dict(self.context.launch_configurations)
+        self.environment = dict(self.context.environment)
+
+    def _cache_subtree(
+        self,
+        key: Tuple[Any, ...],
+        launch_configurations: Dict[str, Any],
+        environment: Dict[str, str],
+    ):
+        nodes = list(self.iter_nodes())
+        paths = {path for node in nodes if (path := node.included_file()) is not None}
+        if any(path.endswith(".py") for path in paths):
+            return
+        paths.update(path for node in nodes for path in _parameter_files(node))
+        launch_configuration_changes = _changes(
+            launch_configurations, self.launch_configurations
+        )
+        environment_changes = _changes(environment, self.environment)
+        cached = _CachedSubtree(
+            package=self.package,
+            path=self.path,
+            children=self.children,
+            launch_configuration_changes=launch_configuration_changes,
+            environment_changes=environment_changes,
+            mtimes=_file_mtimes(paths),
+        )
+        # Rough estimate: a built node with its parameters takes about 1 kB.
+        size = 1000 * len(nodes) + 100 * (
+            len(launch_configuration_changes[0]) + len(environment_changes[0])
+        )
+        _subtree_cache.put(key, cached, size)
+
     def _serialize(self) -> List[Dict[str, Any]]:
         return [
             {
@@ -338,7 +809,16 @@ class NodeNode(LaunchTreeNode):
             self.context, self.entity.expanded_node_namespace
         )
         self.name: str = to_string(self.context, self.entity.node_name)
-        self.parameters = serialize_parameters(self.entity._Node__parameters)
+        # Identical payloads of repeated stacks share one object.
+        self.parameters = share(serialize_parameters(self.entity._Node__parameters))
+        self.global_parameters = share(
+            serialize_global_parameters(
+                self.context.launch_configurations.get("global_params")
+            )
+        )
+        self.launch_configurations: Dict[str, str] = share(
+            dict(self.context.launch_configurations)
+        )
 
     def _serialize(self) -> List[Dict[str, Any]]:
         return [
@@ -349,6 +829,7 @@ class NodeNode(LaunchTreeNode):
                 "name": self.name,
                 "namespace": self.namespace,
                 "parameters": self.parameters,
+                "global_parameters": self.global_parameters,
                 "children": self.serialize_children(),
             }
         ]
@@ -370,7 +851,15 @@ class ComposableNodeContainerNode(LaunchTreeNode):
             self.context, self.entity.expanded_node_namespace
         )
         self.name: str = to_string(self.context, self.entity.node_name)
-        self.parameters = serialize_parameters(self.entity._Node__parameters)
+        self.parameters = share(serialize_parameters(self.entity._Node__parameters))
+        self.global_parameters = share(
+            serialize_global_parameters(
+                self.context.launch_configurations.get("global_params")
+            )
+        )
+        self.launch_configurations: Dict[str, str] = share(
+            dict(self.context.launch_configurations)
+        )
 
     def _serialize(self) -> List[Dict[str, Any]]:
         return [
@@ -381,6 +870,7 @@ class ComposableNodeContainerNode(LaunchTreeNode):
                 "name": self.name,
                 "namespace": self.namespace,
                 "parameters": self.parameters,
+                "global_parameters": self.global_parameters,
                 "children": self.serialize_children(),
             }
         ]
@@ -407,7 +897,14 @@ class LoadComposableNodesNode(LaunchTreeNode):
             "plugin": to_string(self.context, entity.node_plugin),
             "namespace": to_string(self.context, entity.node_namespace),
             "name": to_string(self.context, entity.node_name),
-            "parameters": serialize_parameters(entity._ComposableNode__parameters),
+            "parameters": share(
+                serialize_parameters(entity._ComposableNode__parameters)
+            ),
+            "global_parameters": share(
+                serialize_global_parameters(
+                    self.context.launch_configurations.get("global_params")
+                )
+            ),
         }
 
     def complete_entity_info(self):
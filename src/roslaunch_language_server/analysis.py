@@ -0,0 +1,378 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from lsprotocol.types import Diagnostic, DiagnosticSeverity, Position, Range
+from pygls.server import LanguageServer
+from pygls.uris import to_fs_path
+
+from roslaunch_analyzer.cache import register_cache_stats
+from roslaunch_analyzer.include_graph import canonical_path
+from roslaunch_language_server.backend import build_key, build_scheduler
+from roslaunch_language_server.helper.line_index import LineIndex
+from roslaunch_language_server.helper.package_paths import package_paths
+from roslaunch_language_server.helper.substitutions import (
+    iter_attribute_substitutions,
+    path_suffix,
+)
+from roslaunch_language_server.helper.symbols import SymbolTable
+from roslaunch_language_server.helper.syntax import SyntaxTree
+from roslaunch_language_server.helper.workspace_index import include_graph
+from roslaunch_language_server.server import logger
+from roslaunch_language_server.utils import find_package_share_directory
+
+DIAGNOSTIC_SOURCE = "roslaunch-language-server"
+
+_analysis_stats = register_cache_stats("analysis")
+
+
+@dataclass
+class AnalysisResult:
+    """
+    Result of analyzing one version of a document.
+
+    :param version: The analyzed document version.
+    :param diagnostics: The diagnostics of the static checks.
+    :param built: Whether the launch tree was built for this version.
+    :param build_diagnostics: The diagnostics of the tree build.
+    :param tree: The built launch tree, if the build succeeded.
+    """
+
+    version: Optional[int]
+    diagnostics: List[Diagnostic]
+    built: bool = False
+    build_diagnostics: List[Diagnostic] = field(default_factory=list)
+    tree: Optional[Any] = None
+
+
+def _diagnostic(
+    line_index: LineIndex,
+    start: int,
+    end: int,
+    message: str,
+    severity: DiagnosticSeverity,
+) -> Diagnostic:
+    return Diagnostic(
+        range=Range(
+            start=line_index.position_at_offset(start),
+            end=line_index.position_at_offset(end),
+        ),
+        message=message,
+        severity=severity,
+        source=DIAGNOSTIC_SOURCE,
+    )
+
+
+def check_document(source: str) -> List[Diagnostic]:
+    """
+    Run the static checks on a launch file.
+
+    Reports unknown packages in $(find-pkg-share ...), $(find-pkg-prefix ...)
+    and <node pkg=...>, missing $(find-pkg-share ...) paths and $(var ...)
+    references without a visible <arg> or <let>.
+
+    :param source: The text of the document.
+    :return: The diagnostics.
+    """
+    line_index = LineIndex(source)
+    syntax = SyntaxTree(source)
+    symbols = SymbolTable(syntax)
+    diagnostics: List[Diagnostic] = []
+
+    for element in syntax.elements_by_tag.get("node", []):
+        attribute = element.attribute("pkg")
+        if attribute is None or "$(" in attribute.value or not attribute.value:
+            continue
+        if find_package_share_directory(attribute.value) is None:
+            diagnostics.append(
+                _diagnostic(
+                    line_index,
+                    attribute.value_start,
+                    attribute.value_end,
+                    f"Package '{attribute.value}' not found",
+                    DiagnosticSeverity.Error,
+                )
+            )
+
+    for _, attribute, substitution in iter_attribute_substitutions(syntax):
+        argument = substitution.argument
+        if not substitution.closed or not argument or "$(" in argument:
+            continue
+
+        if substitution.name == "var":
+            if not symbols.visible_at(substitution.start, argument):
+                diagnostics.append(
+                    _diagnostic(
+                        line_index,
+                        substitution.argument_start,
+                        substitution.argument_end,
+                        f"Launch argument '{argument}' is not declared in this scope",
+                        DiagnosticSeverity.Warning,
+                    )
+                )
+            continue
+
+        if substitution.name not in ("find-pkg-share", "find-pkg-prefix"):
+            continue
+
+        share_dir = find_package_share_directory(argument)
+        if share_dir is None:
+            diagnostics.append(
+                _diagnostic(
+                    line_index,
+                    substitution.argument_start,
+                    substitution.argument_end,
+                    f"Package '{argument}' not found",
+                    DiagnosticSeverity.Error,
+                )
+            )
+            continue
+
+        if substitution.name != "find-pkg-share":
+            continue
+        suffix, suffix_end = path_suffix(
+            attribute.value, attribute.value_start, substitution
+        )
+        followed_by_substitution = attribute.value.startswith(
+            "$(", suffix_end - attribute.value_start
+        )
+        if not suffix.strip("/") or followed_by_substitution:
+            continue
+        if package_paths.resolve(argument, suffix) is None:
+            diagnostics.append(
+                _diagnostic(
+                    line_index,
+                    substitution.start,
+                    suffix_end,
+                    f"Path '{suffix}' does not exist in package '{argument}'",
+                    DiagnosticSeverity.Warning,
+                )
+            )
+
+    return diagnostics
+
+
+def _build_error_message(path: str, error) -> str:
+    message = f"Failed to build {error.action}"
+    if error.included_path is not None:
+        message += f" {error.included_path}"
+    if error.launch_file is not None and error.launch_file != path:
+        message += f" in {error.launch_file}"
+    return f"{message}: {error.message}"
+
+
+def _located_errors(tree) -> List[Tuple[Any, Optional[Tuple[int, ...]]]]:
+    """
+    Return the errors of a built tree in tree order, each with the element of
+    the launch file of the tree that caused it: the failed action itself, or
+    the include through which the action was reached.
+    """
+    from roslaunch_analyzer.tree import ErrorNode
+
+    errors = []
+    stack = [(tree, None)]
+    while stack:
+        node, element = stack.pop()
+        if node.launch_file == tree.path and node.element is not None:
+            element = node.element
+        if isinstance(node, ErrorNode):
+            errors.append((node, element))
+        stack.extend((child, element) for child in reversed(node.children))
+    return errors
+
+
+def _build_error_diagnostic(
+    tree, syntax: SyntaxTree, line_index: LineIndex, error, element
+) -> Diagnostic:
+    message = _build_error_message(tree.path, error)
+    found = syntax.element_by_indices(element) if element is not None else None
+    if found is None:
+        return _diagnostic(line_index, 0, 0, message, DiagnosticSeverity.Error)
+    file = found.attribute("file") if found.tag == "include" else None
+    if file is not None:
+        start, end = file.value_start, file.value_end
+    else:
+        # The tag name, after the '<'.
+        start, end = found.start + 1, found.start + 1 + len(found.tag)
+    return _diagnostic(line_index, start, end, message, DiagnosticSeverity.Error)
+
+
+def build_document(path: str, arguments: Sequence[Tuple[str, str]] = ()):
+    """
+    Build the launch tree of a launch file.
+
+    Actions that fail inside the tree are reported as diagnostics on the
+    element that failed, or on the include it failed in; the rest of the
+    tree is still built.
+
+    :param path: The path of the launch file.
+    :param arguments: The launch arguments; the defaults are used for the
+        others.
+    :return: The built tree and the diagnostics of the build.
+    """
+    from roslaunch_analyzer import LaunchCommand, command_to_tree
+
+    try:
+        tree = command_to_tree(LaunchCommand(path=path, arguments=list(arguments)))
+        tree.build()
+        include_graph.add_tree(tree)
+    except Exception as e:
+        return None, [
+            Diagnostic(
+                range=Range(start=Position(0, 0), end=Position(0, 0)),
+                message=f"Failed to build the launch tree: {type(e).__name__}: {e}",
+                severity=DiagnosticSeverity.Error,
+                source=DIAGNOSTIC_SOURCE,
+            )
+        ]
+    errors = _located_errors(tree)
+    if not errors:
+        return tree, []
+    try:
+        with open(path) as f:
+            source = f.read()
+    except OSError:
+        source = ""
+    syntax = SyntaxTree(source)
+    line_index = LineIndex(source)
+    return tree, [
+        _build_error_diagnostic(tree, syntax, line_index, error, element)
+        for error, element in errors
+    ]
+
+
+class AnalysisScheduler:
+    """
+    Debounced background analysis of open documents.
+
+    Every edit (re)schedules the analysis of its document after a delay,
+    cancelling a pending or running analysis of an older version. Static
+    checks run on every version; the launch tree is additionally built on
+    open and save, when the file on disk matches the document. Results are
+    cached per document version, so an unchanged document is never analyzed
+    twice. An analysis that is already running in the worker cannot be
+    interrupted; its result is discarded if the document changed meanwhile.
+
+    Builds go through the build scheduler of the backend, which shares them
+    with the other sessions and schedules them fairly across sessions.
+
+    :param ls: The language server publishing the diagnostics.
+    :param session: The session requesting the builds.
+    :param delay: The debounce delay in seconds.
+    """
+
+    def __init__(
+        self, ls: LanguageServer, session: Optional[Hashable] = None, delay: float = 0.3
+    ):
+        self.ls = ls
+        self.session = session if session is not None else self
+        self.delay = delay
+        self.results: Dict[str, AnalysisResult] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="analysis"
+        )
+
+    def schedule(self, uri: str, build: bool = False):
+        """
+        Schedule the analysis of a document, superseding a pending one.
+
+        :param uri: The URI of the document.
+        :param build: Whether to also build the launch tree.
+        """
+        pending = self._tasks.pop(uri, None)
+        if pending is not None and not pending.done():
+            pending.cancel()
+        self._tasks[uri] = asyncio.ensure_future(self._run(uri, build))
+
+    def close(self, uri: str):
+        """
+        Cancel the analysis of a closed document and clear its diagnostics.
+
+        :param uri: The URI of the document.
+        """
+        pending = self._tasks.pop(uri, None)
+        if pending is not None:
+            pending.cancel()
+        self.results.pop(uri, None)
+        self.ls.publish_diagnostics(uri, [])
+
+    def shutdown(self):
+        """
+        Cancel all pending analyses, without publishing anything.
+        """
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        self.results.clear()
+        self._executor.shutdown(wait=False)
+
+    def invalidate_dependents(self, path: str):
+        """
+        Rebuild the open documents whose launch tree includes a changed file.
+
+        :param path: The path of the changed launch file.
+        """
+        dependents = include_graph.dependents(path)
+        if not dependents:
+            return
+        for uri, result in list(self.results.items()):
+            document_path = to_fs_path(uri)
+            if (
+                document_path is not None
+                and canonical_path(document_path) in dependents
+            ):
+                result.built = False
+                self.schedule(uri, build=True)
+
+    async def _run(self, uri: str, build: bool):
+        await asyncio.sleep(self.delay)
+
+        doc = self.ls.workspace.get_document(uri)
+        version = doc.version
+        cached = self.results.get(uri)
+        if (
+            cached is not None
+            and cached.version == version
+            and (cached.built or not build)
+        ):
+            _analysis_stats.hit()
+            return
+        _analysis_stats.miss()
+
+        loop = asyncio.get_running_loop()
+        source = doc.source
+        result = AnalysisResult(version=version, diagnostics=[])
+        if cached is not None:
+            result.build_diagnostics = cached.build_diagnostics
+            result.tree = cached.tree
+
+        try:
+            result.diagnostics = await loop.run_in_executor(
+                self._executor, check_document, source
+            )
+            path = to_fs_path(uri)
+            if build and path is not None and self._matches_disk(path, source):
+                result.tree, result.build_diagnostics = await build_scheduler.build(
+                    self.session, build_key(path, source), build_document, path
+                )
+                result.built = True
+        except Exception:
+            logger.exception("Failed to analyze %s", uri)
+            return
+
+        if self.ls.workspace.get_document(uri).version != version:
+            return
+        self.results[uri] = result
+        self.ls.publish_diagnostics(
+            uri, result.diagnostics + result.build_diagnostics, version=version
+        )
+
+    @staticmethod
+    def _matches_disk(path: str, source: str) -> bool:
+        try:
+            with open(path) as f:
+                return f.read() == source
+        except OSError:
+            return False
@@ -0,0 +1,82 @@
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import BinaryIO
+
+
+def connect_backend(host: str, port: int, timeout: float = 10.0) -> socket.socket:
+    """
+    Connect to the shared backend, starting it in the background if it is not
+    running yet.
+
+    :param host: The host of the backend.
+    :param port: The port of the backend.
+    :param timeout: The time in seconds to wait for a started backend.
+    :return: The connected socket.
+    """
+    try:
+        return socket.create_connection((host, port))
+    except ConnectionRefusedError:
+        pass
+
+    subprocess.Popen(
+        [sys.executable, "-m", "roslaunch_language_server.cli", "--port", str(port)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return socket.create_connection((host, port))
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def _forward_input(stdin: BinaryIO, connection: socket.socket):
+    try:
+        while True:
+            data = stdin.read1(65536)
+            if not data:
+                break
+            connection.sendall(data)
+    except OSError:
+        pass
+    finally:
+        try:
+            connection.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+
+def attach(host: str, port: int, stdin: BinaryIO, stdout: BinaryIO):
+    """
+    Forward an LSP stdio connection to the shared backend.
+
+    The messages are forwarded as bytes in both directions until either side
+    closes the connection; the backend serves the client as a session of its
+    own.
+
+    :param host: The host of the backend.
+    :param port: The port of the backend.
+    :param stdin: The binary input from the client.
+    :param stdout: The binary output to the client.
+    """
+    connection = connect_backend(host, port)
+    threading.Thread(
+        target=_forward_input, args=(stdin, connection), daemon=True
+    ).start()
+    try:
+        while True:
+            data = connection.recv(65536)
+            if not data:
+                break
+            stdout.write(data)
+            stdout.flush()
+    finally:
+        connection.close()
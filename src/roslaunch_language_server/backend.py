@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    Iterable,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from roslaunch_analyzer.cache import cache_manager
+from roslaunch_analyzer.include_graph import canonical_path
+from roslaunch_language_server.server import logger
+
+BuildKey = Tuple[str, str]
+
+_missing = object()
+
+
+def build_key(
+    path: str, source: str, arguments: Sequence[Tuple[str, str]] = ()
+) -> BuildKey:
+    """
+    Return the key under which the build of a launch file is shared.
+
+    :param path: The path of the launch file.
+    :param source: The text of the launch file, which matches the file on disk.
+    :param arguments: The launch arguments of the build.
+    :return: The canonical path and the digest of the text and the arguments.
+    """
+    digest = hashlib.sha1(source.encode())
+    for name, value in arguments:
+        digest.update(f"\0{name}={value}".encode())
+    return canonical_path(path), digest.hexdigest()
+
+
+@dataclass
+class _BuildRequest:
+    key: BuildKey
+    function: Callable[..., Any]
+    args: Tuple[Any, ...]
+    future: asyncio.Future
+    waiters: int = 0
+    started: bool = False
+    stale: bool = False
+    sessions: set = field(default_factory=set)
+
+
+def _result_size(result: Any) -> int:
+    # Rough estimate, as for the cached subtrees: a built node with its
+    # parameters takes about 1 kB. approximate_size would walk the launch
+    # context of every node on the event loop and count shared objects.
+    tree, diagnostics = result
+    nodes = sum(1 for _ in tree.iter_nodes()) if tree is not None else 0
+    return 1000 + 1000 * nodes + 200 * len(diagnostics)
+
+
+class BuildScheduler:
+    """
+    Launch tree builds shared by the sessions of a backend.
+
+    Builds are queued per session and started round-robin across the
+    sessions with queued builds, so a session opening many files does not
+    starve the others. A build requested while the same build (same file and
+    text) is queued or running is not queued again; all requesters await the
+    same result. Finished builds are kept in the "build" cache region until a
+    file they include changes or the cache manager evicts them.
+
+    Must be used from the event loop of the backend.
+
+    :param max_workers: The number of builds running at the same time.
+    :param max_results: The maximum number of finished builds kept.
+    """
+
+    def __init__(self, max_workers: int = 1, max_results: int = 64):
+        self.max_workers = max_workers
+        self._queues: "OrderedDict[Hashable, Deque[_BuildRequest]]" = OrderedDict()
+        self._requests: Dict[BuildKey, _BuildRequest] = {}
+        self._results = cache_manager.region("build", max_entries=max_results)
+        self._running = 0
+        self._stats = self._results.stats
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="build"
+        )
+
+    async def build(
+        self,
+        session: Hashable,
+        key: BuildKey,
+        function: Callable[..., Any],
+        *args: Any,
+    ) -> Any:
+        """
+        Build a launch file, sharing the build with other sessions.
+
+        Cancelling the returned coroutine only withdraws this request; the
+        build is dropped from the queue when no requester is left.
+
+        :param session: The requesting session.
+        :param key: The key of the build, see build_key.
+        :param function: The function building the launch file.
+        :param args: The arguments of the function.
+        :return: The result of the function.
+        """
+        result = self._results.get(key, _missing)
+        if result is not _missing:
+            self._stats.hit()
+            return result
+
+        request = self._requests.get(key)
+        if request is None:
+            self._stats.miss()
+            request = _BuildRequest(
+                key=key,
+                function=function,
+                args=args,
+                future=asyncio.get_running_loop().create_future(),
+            )
+            self._requests[key] = request
+            self._queues.setdefault(session, deque()).append(request)
+            request.sessions.add(session)
+            self._dispatch()
+        else:
+            # Deduplicated with a queued or running build.
+            self._stats.hit()
+            request.sessions.add(session)
+
+        request.waiters += 1
+        try:
+            return await asyncio.shield(request.future)
+        finally:
+            request.waiters -= 1
+            if request.waiters == 0 and not request.started:
+                self._withdraw(request)
+
+    def _withdraw(self, request: _BuildRequest):
+        if self._requests.get(request.key) is request:
+            del self._requests[request.key]
+        for session in request.sessions:
+            queue = self._queues.get(session)
+            if queue is not None and request in queue:
+                queue.remove(request)
+                if not queue:
+                    del self._queues[session]
+        if not request.future.done():
+            request.future.cancel()
+
+    def _next_request(self) -> Optional[_BuildRequest]:
+        if not self._queues:
+            return None
+        session, queue = next(iter(self._queues.items()))
+        request = queue.popleft()
+        if queue:
+            # The session goes to the back of the round.
+            self._queues.move_to_end(session)
+        else:
+            del self._queues[session]
+        return request
+
+    def _dispatch(self):
+        while self._running < self.max_workers:
+            request = self._next_request()
+            if request is None:
+                return
+            request.started = True
+            self._running += 1
+            task = asyncio.get_running_loop().run_in_executor(
+                self._executor, request.function, *request.args
+            )
+            task.add_done_callback(
+                lambda task, request=request: self._finished(request, task)
+            )
+
+    def _finished(self, request: _BuildRequest, task: asyncio.Future):
+        self._running -= 1
+        if self._requests.get(request.key) is request:
+            del self._requests[request.key]
+        exception = task.exception()
+        if exception is not None:
+            logger.error("Failed to build %s: %s", request.key[0], exception)
+            request.future.set_exception(exception)
+        else:
+            result = task.result()
+            if not request.stale:
+                self._results.put(request.key, result, _result_size(result))
+            request.future.set_result(result)
+        # Retrieve the exception of a future nobody awaits anymore.
+        request.future.exception()
+        self._dispatch()
+
+    def invalidate(self, paths: Iterable[str]):
+        """
+        Drop the finished builds of launch files.
+
+        :param paths: The canonical paths of the launch files, e.g. a changed
+            file and the files including it.
+        """
+        paths = set(paths)
+        self._results.remove_if(lambda key: key[0] in paths)
+        # Running builds may have read the old files; their results are still
+        # returned to the requesters but not cached, and new requests build
+        # again.
+        for key, request in list(self._requests.items()):
+            if key[0] in paths and request.started:
+                request.stale = True
+                del self._requests[key]
+
+    def close_session(self, session: Hashable):
+        """
+        Withdraw the queued builds of a session. Builds also requested by
+        other sessions are queued for one of them instead.
+
+        :param session: The session.
+        """
+        queue = self._queues.pop(session, None)
+        for request in queue or ():
+            request.sessions.discard(session)
+            if request.sessions:
+                other = next(iter(request.sessions))
+                self._queues.setdefault(other, deque()).append(request)
+            else:
+                self._withdraw(request)
+
+
+build_scheduler = BuildScheduler()
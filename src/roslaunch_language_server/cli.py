@@ -1,16 +1,82 @@
+import sys
+from typing import Optional
+
 import typer
 
 cli = typer.Typer()
 
 
 @cli.command()
-def run(port: int = 8080):
+def run(
+    port: int = 8080,
+    log_level: Optional[str] = None,
+    stats_file: Optional[str] = None,
+    stats_interval: float = 60.0,
+    cache_budget: Optional[str] = typer.Option(
+        None,
+        help="Memory budget of all caches, e.g. 512M "
+        "(default: $ROSLAUNCH_CACHE_BUDGET or 256M).",
+    ),
+    record: Optional[str] = typer.Option(
+        None, help="Record the messages of all sessions to this file."
+    ),
+    sandbox: bool = typer.Option(
+        False, help="Evaluate Python launch files in a resource-limited subprocess."
+    ),
+    sandbox_timeout: float = typer.Option(
+        10.0, help="Wall-clock limit of a sandboxed launch file in seconds."
+    ),
+    sandbox_memory: str = typer.Option(
+        "1G", help="Memory limit of the sandbox worker, e.g. 512M."
+    ),
+    attach: bool = typer.Option(
+        False,
+        help="Serve over stdio by attaching to the backend on the port, "
+        "starting it if it is not running.",
+    ),
+):
+    if attach:
+        from roslaunch_language_server.attach import attach as attach_backend
+
+        attach_backend("localhost", port, sys.stdin.buffer, sys.stdout.buffer)
+        return
+
     import roslaunch_language_server.feature  # noqa
-    from roslaunch_language_server.server import server
+    from roslaunch_language_server.server import set_log_level
+    from roslaunch_language_server.session import start_backend
+    from roslaunch_language_server.stats import stats
+
+    if log_level is not None and not set_log_level(log_level):
+        raise typer.BadParameter(f"Unknown log level: {log_level}")
+
+    if cache_budget is not None:
+        from roslaunch_analyzer.cache import cache_manager, parse_size
+
+        try:
+            cache_manager.set_budget(parse_size(cache_budget))
+        except ValueError:
+            raise typer.BadParameter(f"Invalid cache budget: {cache_budget}")
+
+    if sandbox:
+        from roslaunch_analyzer.cache import parse_size
+        from roslaunch_analyzer.sandbox import enable_sandbox
+
+        try:
+            enable_sandbox(sandbox_timeout, parse_size(sandbox_memory))
+        except ValueError:
+            raise typer.BadParameter(f"Invalid sandbox memory: {sandbox_memory}")
+
+    if stats_file is not None:
+        stats.start_periodic_dump(stats_file, stats_interval)
+
+    if record is not None:
+        from roslaunch_language_server.recorder import start_recording
+
+        start_recording(record)
 
     print(f"Starting roslaunch-language-server on port {port}")
-    server.start_tcp("localhost", port)
+    start_backend("localhost", port)
 
 
 if __name__ == "__main__":
-    run()
+    cli()
@@ -3,46 +3,239 @@ from typing import List
 
 from lsprotocol import types
 from pygls.server import LanguageServer
+from pygls.uris import to_fs_path
 
-from roslaunch_analyzer import (
-    LaunchCommand,
-    command_to_tree,
-    get_arguments_of_launch_file,
-)
+from roslaunch_analyzer.query import index_tree
+from roslaunch_language_server.analysis import build_document
+from roslaunch_language_server.backend import build_key, build_scheduler
 from roslaunch_language_server.features import (
+    LEGEND,
     completion_feature_eitities,
     definition_feature_eitities,
+    find_references,
+    workspace_symbols,
+)
+from roslaunch_language_server.features.completion import PREFETCH_DIRECTORY_COMMAND
+from roslaunch_language_server.helper.completion_context import (
+    get_completion_context,
 )
-from roslaunch_language_server.server import logger, server
+from roslaunch_language_server.helper.directory_cache import directory_cache
+from roslaunch_language_server.helper.workspace_index import workspace_index
+from roslaunch_language_server.progress import BackgroundProgress
+from roslaunch_language_server.server import (
+    logger,
+    lsp_handler,
+    server_command,
+    server_feature,
+    set_log_level,
+)
+from roslaunch_language_server.session import sessions
+from roslaunch_language_server.stats import stats
 
+QUERY_CRITERIA = (
+    "name",
+    "package",
+    "executable",
+    "namespace",
+    "recursive",
+    "parameter_file",
+    "container",
+)
 
-@server.feature("hello_world")
+completion_features_by_kind = {
+    feature.kind: feature for feature in completion_feature_eitities
+}
+
+
+@server_feature("hello_world")
 def hello_world(ls: LanguageServer, params: dict):
     ls.show_message("Roslaunch Language Server is running!")
     logger.info("Roslaunch Language Server is running!")
     return {"result": "success"}
 
 
-@server.feature("parse_launch_file")
-def parse_launch_file(ls: LanguageServer, params: dict):
+@server_feature("parse_launch_file")
+async def parse_launch_file(ls: LanguageServer, params: dict):
     from .helper.tree import modify_json
 
-    command = LaunchCommand(
-        path=params.filepath, arguments=OrderedDict(params.arguments).items()
+    path = params.filepath
+    arguments = tuple(OrderedDict(params.arguments).items())
+    with open(path) as f:
+        source = f.read()
+    # Built by the build scheduler, off the event loop and shared with the
+    # builds of the same file and arguments by other sessions.
+    tree, diagnostics = await build_scheduler.build(
+        sessions.get(ls),
+        build_key(path, source, arguments),
+        build_document,
+        path,
+        arguments,
     )
-    tree = command_to_tree(command)
-    tree.build()
+    if tree is None:
+        raise RuntimeError(diagnostics[0].message)
     data = modify_json(tree.serialize())[0]
+    # Clients that can decode them ask for the shared definitions and the
+    # compact interned encoding. Every number in the "data" of the interned
+    # encoding is an index into its "values"; resolved while parsing, e.g.
+    # with a JSON.parse reviver, decoding costs about as much as parsing the
+    # plain JSON, while the response is about a fifth of the size.
+    if getattr(params, "share", False):
+        from roslaunch_analyzer.sharing import share_definitions
+
+        data = share_definitions(data)
+    if getattr(params, "encoding", None) == "interned":
+        from roslaunch_analyzer.encoding import encode_interned
+
+        return encode_interned(data)
     return data
 
 
-@server.feature("get_launch_file_parameters")
+@server_feature("get_launch_file_parameters")
 def get_launch_file_parameters(ls: LanguageServer, params: dict):
+    from roslaunch_analyzer import get_arguments_of_launch_file
+
     arguments = get_arguments_of_launch_file(params.filepath)
     return arguments
 
 
-@server.feature(
+@server_feature("roslaunch/query")
+async def query_launch_tree(ls: LanguageServer, params: dict):
+    """
+    Query the nodes launched by the built tree of a launch file.
+
+    The params hold the uri of the launch file and any of the criteria of
+    LaunchTreeIndex.query, and "parameters" to also resolve the effective
+    parameters of the nodes. The tree of the last analysis of an open
+    document is used; other files are built from disk.
+    """
+    uri = params.uri
+    session = sessions.get(ls)
+    result = session.analysis.results.get(uri)
+    tree = result.tree if result is not None else None
+    if tree is None:
+        path = to_fs_path(uri)
+        try:
+            with open(path) as f:
+                source = f.read()
+        except OSError:
+            return None
+        tree, _ = await build_scheduler.build(
+            session, build_key(path, source), build_document, path
+        )
+        if tree is None:
+            return None
+
+    nodes = index_tree(tree).query(
+        **{
+            criterion: getattr(params, criterion)
+            for criterion in QUERY_CRITERIA
+            if getattr(params, criterion, None) is not None
+        }
+    )
+    results = [node.as_dict() for node in nodes]
+    if getattr(params, "parameters", False):
+        for result, node in zip(results, nodes):
+            result.update(node.effective_parameters())
+    return results
+
+
+@server_feature("roslaunch/stats")
+def get_stats(ls: LanguageServer, params: dict):
+    return stats.snapshot()
+
+
+@server_feature("dump_logs")
+def dump_logs(ls: LanguageServer, params: dict):
+    return {"lines": lsp_handler.dump()}
+
+
+@server_feature(types.WORKSPACE_DID_CHANGE_CONFIGURATION)
+def on_did_change_configuration(
+    ls: LanguageServer, params: types.DidChangeConfigurationParams
+):
+    settings = params.settings if isinstance(params.settings, dict) else {}
+    log_level = settings.get("roslaunch", {}).get("logLevel")
+    if log_level is not None and not set_log_level(log_level):
+        logger.warning("Ignoring unknown log level %r", log_level)
+
+
+@server_feature(types.INITIALIZED)
+def on_initialized(ls: LanguageServer, params: types.InitializedParams):
+    folders = [
+        path
+        for folder in ls.workspace.folders.values()
+        if (path := to_fs_path(folder.uri)) is not None
+    ]
+    if not folders and ls.workspace.root_path:
+        folders.append(ls.workspace.root_path)
+    workspace_index.start(folders, BackgroundProgress(ls, "Indexing launch files"))
+    ls.register_capability(
+        types.RegistrationParams(
+            registrations=[
+                types.Registration(
+                    id="roslaunch-launch-file-watcher",
+                    method=types.WORKSPACE_DID_CHANGE_WATCHED_FILES,
+                    register_options=types.DidChangeWatchedFilesRegistrationOptions(
+                        watchers=[
+                            types.FileSystemWatcher(glob_pattern=glob_pattern)
+                            for glob_pattern in (
+                                "**/*.launch.xml",
+                                "**/*.launch",
+                                "**/launch/**/*.xml",
+                            )
+                        ]
+                    ),
+                )
+            ]
+        )
+    )
+
+
+@server_feature(types.WORKSPACE_DID_CHANGE_WATCHED_FILES)
+def on_did_change_watched_files(
+    ls: LanguageServer, params: types.DidChangeWatchedFilesParams
+):
+    for change in params.changes:
+        path = to_fs_path(change.uri)
+        if path is not None:
+            workspace_index.submit(
+                path, deleted=change.type == types.FileChangeType.Deleted
+            )
+            sessions.invalidate_dependents(path)
+
+
+@server_feature(types.TEXT_DOCUMENT_DID_OPEN)
+def on_did_open(ls: LanguageServer, params: types.DidOpenTextDocumentParams):
+    doc = ls.workspace.get_document(params.text_document.uri)
+    session = sessions.get(ls)
+    session.document_models.open(doc)
+    session.analysis.schedule(doc.uri, build=True)
+
+
+@server_feature(types.TEXT_DOCUMENT_DID_CHANGE)
+def on_did_change(ls: LanguageServer, params: types.DidChangeTextDocumentParams):
+    doc = ls.workspace.get_document(params.text_document.uri)
+    session = sessions.get(ls)
+    session.document_models.change(doc, params.content_changes)
+    session.semantic_tokens.change(doc, params.content_changes)
+    session.analysis.schedule(doc.uri)
+
+
+@server_feature(types.TEXT_DOCUMENT_DID_SAVE)
+def on_did_save(ls: LanguageServer, params: types.DidSaveTextDocumentParams):
+    sessions.get(ls).analysis.schedule(params.text_document.uri, build=True)
+    path = to_fs_path(params.text_document.uri)
+    if path is not None:
+        workspace_index.submit(path)
+        sessions.invalidate_dependents(path)
+
+
+@server_feature(types.TEXT_DOCUMENT_DID_CLOSE)
+def on_did_close(ls: LanguageServer, params: types.DidCloseTextDocumentParams):
+    sessions.get(ls).close_document(params.text_document.uri)
+
+
+@server_feature(
     types.TEXT_DOCUMENT_COMPLETION,
     types.CompletionOptions(
         trigger_characters=["$", "(", " ", "/", '"'],
@@ -54,30 +247,34 @@ def on_completion(ls: LanguageServer, params: types.CompletionParams):
     pos = params.position
     doc = ls.workspace.get_document(uri)
 
-    text_before_cursor = (
-        "".join(doc.lines[: pos.line]) + doc.lines[pos.line][: pos.character]
-    )
+    logger.debug("Completion triggered at %d:%d", pos.line, pos.character)
 
-    logger.debug(f"Completion triggered at {pos.line}:{pos.character}")
+    context = get_completion_context(doc.lines, pos.line, pos.character)
+    if context is None:
+        return types.CompletionList(is_incomplete=False, items=[])
 
-    completions: List[types.CompletionItem] = []
+    feature = completion_features_by_kind.get(context.kind)
+    if feature is None:
+        return types.CompletionList(is_incomplete=False, items=[])
+
+    logger.debug("Completion context: %s (%r)", context.kind.value, context.prefix)
+    model = sessions.get(ls).document_models.get(doc)
+    return feature.complete(doc, model, pos, context)
 
-    for feature in completion_feature_eitities:
-        match = feature.pattern.search(text_before_cursor)
-        if match is None:
-            continue
-        logger.debug(f"Matched pattern: {match.group(0)}")
-        completions.extend(feature.complete(doc, pos, match))
 
-    return completions
+@server_command(PREFETCH_DIRECTORY_COMMAND)
+def prefetch_directory(ls: LanguageServer, args: List[str]):
+    for path in args:
+        directory_cache.prefetch(path)
 
 
-@server.feature(types.TEXT_DOCUMENT_DEFINITION)
+@server_feature(types.TEXT_DOCUMENT_DEFINITION)
 def on_go_to_definition(ls: LanguageServer, params: types.DefinitionParams):
     uri = params.text_document.uri
     pos = params.position
     doc = ls.workspace.get_document(uri)
 
+    model = sessions.get(ls).document_models.get(doc)
     definitions: List[types.Location] = []
 
     for feature in definition_feature_eitities:
@@ -89,38 +286,56 @@ def on_go_to_definition(ls: LanguageServer, params: types.DefinitionParams):
             continue
         if extracted_string is None:
             continue
-        logger.debug(f"Extracted string: {extracted_string}")
+        logger.debug("Extracted string: %s", extracted_string)
         match = feature.pattern.search(extracted_string)
         if match is None:
             continue
-        logger.debug(f"Matched pattern: {match.group(0)}")
-        definitions.extend(feature.definition(doc, pos, match))
+        logger.debug("Matched pattern: %s", match.group(0))
+        definitions.extend(feature.definition(doc, model, pos, match))
 
     return definitions
 
 
-# @server.feature(types.TEXT_DOCUMENT_HOVER)
-# def on_hover(ls: LanguageServer, params: types.HoverParams):
-#     uri = params.text_document.uri
-#     pos = params.position
-#     doc = ls.workspace.get_document(uri)
-
-#     hover = None
-
-#     for feature in definition_feature_eitities:
-#         try:
-#             extracted_string = doc.word_at_position(
-#                 pos, feature.re_start_quote, feature.re_end_quote
-#             )
-#         except IndexError:
-#             continue
-#         if extracted_string is None:
-#             continue
-#         logger.debug(f"Extracted string: {extracted_string}")
-#         match = feature.pattern.search(extracted_string)
-#         if match is None:
-#             continue
-#         logger.debug(f"Matched pattern: {match.group(0)}")
-#         hover = feature.hover(doc, pos, match)
-
-#     return hover
+@server_feature(types.TEXT_DOCUMENT_REFERENCES)
+def on_references(ls: LanguageServer, params: types.ReferenceParams):
+    doc = ls.workspace.get_document(params.text_document.uri)
+    model = sessions.get(ls).document_models.get(doc)
+    return find_references(
+        doc, model, params.position, params.context.include_declaration
+    )
+
+
+@server_feature(types.WORKSPACE_SYMBOL)
+def on_workspace_symbol(ls: LanguageServer, params: types.WorkspaceSymbolParams):
+    return workspace_symbols(params.query)
+
+
+@server_feature(types.TEXT_DOCUMENT_DOCUMENT_LINK)
+def on_document_link(ls: LanguageServer, params: types.DocumentLinkParams):
+    doc = ls.workspace.get_document(params.text_document.uri)
+    return sessions.get(ls).document_links.links(doc)
+
+
+@server_feature(types.TEXT_DOCUMENT_SEMANTIC_TOKENS_FULL, LEGEND)
+def on_semantic_tokens_full(ls: LanguageServer, params: types.SemanticTokensParams):
+    doc = ls.workspace.get_document(params.text_document.uri)
+    return sessions.get(ls).semantic_tokens.full(doc)
+
+
+@server_feature(types.TEXT_DOCUMENT_SEMANTIC_TOKENS_FULL_DELTA, LEGEND)
+def on_semantic_tokens_full_delta(
+    ls: LanguageServer, params: types.SemanticTokensDeltaParams
+):
+    doc = ls.workspace.get_document(params.text_document.uri)
+    return sessions.get(ls).semantic_tokens.delta(doc, params.previous_result_id)
+
+
+@server_feature(types.TEXT_DOCUMENT_HOVER)
+def on_hover(ls: LanguageServer, params: types.HoverParams):
+    uri = params.text_document.uri
+    doc = ls.workspace.get_document(uri)
+    session = sessions.get(ls)
+    result = session.analysis.results.get(uri)
+    return session.hover.hover(
+        doc, params.position, result.tree if result is not None else None
+    )
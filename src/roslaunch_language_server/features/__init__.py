@@ -1,9 +1,23 @@
 from roslaunch_language_server.features.completion import completion_feature_eitities
 from roslaunch_language_server.features.definition import definition_feature_eitities
-from roslaunch_language_server.features.hover import hover_feature_entities
+from roslaunch_language_server.features.document_link import DocumentLinkProvider
+from roslaunch_language_server.features.hover import HoverProvider
+from roslaunch_language_server.features.references import (
+    find_references,
+    workspace_symbols,
+)
+from roslaunch_language_server.features.semantic_tokens import (
+    LEGEND,
+    SemanticTokensProvider,
+)
 
 __all__ = [
     "completion_feature_eitities",
     "definition_feature_eitities",
-    "hover_feature_entities",
+    "DocumentLinkProvider",
+    "find_references",
+    "HoverProvider",
+    "LEGEND",
+    "SemanticTokensProvider",
+    "workspace_symbols",
 ]
@@ -1,55 +1,116 @@
 import os
-import re
 from typing import List
 
-import lxml.etree as etree
-from ament_index_python.packages import get_package_share_directory
 from lsprotocol.types import (
+    Command,
     CompletionItem,
     CompletionItemKind,
+    CompletionList,
     InsertTextFormat,
     Position,
 )
 from pygls.workspace import TextDocument
 
-from roslaunch_language_server.utils import all_env_vars, all_ros_packages
+from roslaunch_language_server.helper.completion_context import (
+    CompletionContext,
+    CompletionContextKind,
+)
+from roslaunch_language_server.helper.completion_index import CompletionIndex
+from roslaunch_language_server.helper.directory_cache import directory_cache
+from roslaunch_language_server.helper.document_model import DocumentModel
+from roslaunch_language_server.utils import (
+    env_var_index,
+    find_package_share_directory,
+    ros_package_index,
+)
+
+# Command run by the client when a folder completion item is accepted.
+PREFETCH_DIRECTORY_COMMAND = "roslaunch.prefetchDirectory"
 
 
 class CompletionFeatureEntity:
     """
     Base class for completion features in ROS XML launch files.
-    Each subclass must define a pattern property and implement the complete method.
+    Each subclass must define a kind property and implement the complete method.
     """
 
     @property
-    def pattern(self) -> re.Pattern:
+    def kind(self) -> CompletionContextKind:
         """
-        Regular expression pattern that triggers this completion.
+        Kind of completion context that this completion is dispatched for.
         Must be implemented by subclasses.
         """
-        raise NotImplementedError("The pattern property must be implemented.")
+        raise NotImplementedError("The kind property must be implemented.")
 
     def complete(
-        self, doc: TextDocument, pos: Position, match: re.Match
-    ) -> List[CompletionItem]:
+        self,
+        doc: TextDocument,
+        model: DocumentModel,
+        pos: Position,
+        context: CompletionContext,
+    ) -> CompletionList:
         """
-        Generates completion items based on the match.
+        Generates completion items based on the completion context.
         Must be implemented by subclasses.
 
         :param doc: The text document in which completion is triggered.
+        :param model: The model of the document.
         :param pos: The position in the document where completion is triggered.
-        :param match: The regex match object.
-        :return: A list of completion items.
+        :param context: The completion context at the cursor.
+        :return: The completion list.
         """
         raise NotImplementedError("The complete method must be implemented.")
 
 
+def complete_path_suffix(base_dir: str, path_suffix: str) -> CompletionList:
+    """
+    Generates completion items for the entries of the directory that a path
+    suffix points into.
+
+    Listings come from the directory cache. Accepting a folder item runs the
+    prefetch command, so the listing of that folder is ready for the next
+    completion.
+
+    :param base_dir: The directory the path suffix is relative to.
+    :param path_suffix: The typed path suffix.
+    :return: The completion list.
+    """
+    path = os.path.join(base_dir, path_suffix.lstrip("/"))
+
+    dir_path, incomplete_part = os.path.split(path)
+
+    entries = directory_cache.list(dir_path)
+    if entries is None:
+        return CompletionList(is_incomplete=False, items=[])
+
+    return CompletionList(
+        is_incomplete=False,
+        items=[
+            (
+                CompletionItem(
+                    label=entry.name,
+                    kind=CompletionItemKind.Folder,
+                    command=Command(
+                        title="Prefetch directory",
+                        command=PREFETCH_DIRECTORY_COMMAND,
+                        arguments=[os.path.join(dir_path, entry.name)],
+                    ),
+                )
+                if entry.is_dir
+                else CompletionItem(label=entry.name, kind=CompletionItemKind.File)
+            )
+            for entry in entries
+            if entry.name.startswith(incomplete_part)
+        ],
+    )
+
+
 class SubstitutionCompletion(CompletionFeatureEntity):
     """
     Provides completion items for <substitution> in $(<substitution>).
     """
 
-    pattern = re.compile(r"\".*?\$\((?P<semantics_name_prefix>[a-z-]*)$")
+    kind = CompletionContextKind.SUBSTITUTION
 
     available_semantics = [
         "find-pkg-prefix",
@@ -63,29 +124,39 @@ class SubstitutionCompletion(CompletionFeatureEntity):
         "let",
     ]
 
+    semantics_index = CompletionIndex(available_semantics, infix=False)
+
     def complete(
-        self, doc: TextDocument, pos: Position, match: re.Match
-    ) -> List[CompletionItem]:
+        self,
+        doc: TextDocument,
+        model: DocumentModel,
+        pos: Position,
+        context: CompletionContext,
+    ) -> CompletionList:
         """
         Generates completion items for <substitution> in $(<substitution>).
 
         :param doc: The text document in which completion is triggered.
+        :param model: The model of the document.
         :param pos: The position in the document where completion is triggered.
-        :param match: The regex match object.
+        :param context: The completion context at the cursor.
 
-        :return: A list of completion items.
+        :return: The completion list.
         """
-        semantics_name_prefix: str = match.group("semantics_name_prefix")
-        pattern = re.compile(r"^" + semantics_name_prefix + r"[a-z-]*")
+        semantics_name_prefix: str = context.prefix
+        semantics, is_incomplete = self.semantics_index.query(semantics_name_prefix)
         # TODO: check whether the end-bracket is present and if not, add it
-        return [
-            CompletionItem(
-                label=match.string,
-                kind=CompletionItemKind.Function,
-                insert_text_format=InsertTextFormat.PlainText,
-            )
-            for match in filter(None, map(pattern.match, self.available_semantics))
-        ]
+        return CompletionList(
+            is_incomplete=is_incomplete,
+            items=[
+                CompletionItem(
+                    label=semantic,
+                    kind=CompletionItemKind.Function,
+                    insert_text_format=InsertTextFormat.PlainText,
+                )
+                for semantic in semantics
+            ],
+        )
 
 
 class FindPkgSharePkgNameCompletion(CompletionFeatureEntity):
@@ -93,31 +164,37 @@ class FindPkgSharePkgNameCompletion(CompletionFeatureEntity):
     Provides completion items for <package_name> in $(find-pkg-share <package_name>).
     """
 
-    pattern = re.compile(
-        r"\".*?\$\(find\-pkg\-share\s+(?P<pkg_name_prefix>[a-zA-Z0-9_-]*)$"
-    )
+    kind = CompletionContextKind.FIND_PKG_SHARE_ARG
 
     def complete(
-        self, doc: TextDocument, pos: Position, match: re.Match
-    ) -> List[CompletionItem]:
+        self,
+        doc: TextDocument,
+        model: DocumentModel,
+        pos: Position,
+        context: CompletionContext,
+    ) -> CompletionList:
         """
         Generates completion items for <package_name> in $(find-pkg-share <package_name>).
 
         :param doc: The text document in which completion is triggered.
+        :param model: The model of the document.
         :param pos: The position in the document where completion is triggered.
-        :param match: The regex match object.
-        :return: A list of completion items.
+        :param context: The completion context at the cursor.
+        :return: The completion list.
         """
-        pkg_name_prefix: str = match.group("pkg_name_prefix")
-        pattern = re.compile(r"^" + pkg_name_prefix + r"[a-zA-Z0-9_-]*")
-        return [
-            CompletionItem(
-                label=match.string,
-                kind=CompletionItemKind.Module,
-                insert_text_format=InsertTextFormat.PlainText,
-            )
-            for match in filter(None, map(pattern.match, all_ros_packages))
-        ]
+        pkg_name_prefix: str = context.prefix
+        packages, is_incomplete = ros_package_index().query(pkg_name_prefix, model)
+        return CompletionList(
+            is_incomplete=is_incomplete,
+            items=[
+                CompletionItem(
+                    label=package,
+                    kind=CompletionItemKind.Module,
+                    insert_text_format=InsertTextFormat.PlainText,
+                )
+                for package in packages
+            ],
+        )
 
 
 class EnvCompletion(CompletionFeatureEntity):
@@ -125,29 +202,37 @@ class EnvCompletion(CompletionFeatureEntity):
     Provides completion items for <env_variable> in $(env <env_variable>).
     """
 
-    pattern = re.compile(r"\".*?\$\(env\s+(?P<env_var_prefix>[a-zA-Z0-9_-]*)$")
+    kind = CompletionContextKind.ENV_ARG
 
     def complete(
-        self, doc: TextDocument, pos: Position, match: re.Match
-    ) -> List[CompletionItem]:
+        self,
+        doc: TextDocument,
+        model: DocumentModel,
+        pos: Position,
+        context: CompletionContext,
+    ) -> CompletionList:
         """
         Generates completion items for <env_variable> in $(env <env_variable>).
 
         :param doc: The text document in which completion is triggered.
+        :param model: The model of the document.
         :param pos: The position in the document where completion is triggered.
-        :param match: The regex match object.
-        :return: A list of completion items.
+        :param context: The completion context at the cursor.
+        :return: The completion list.
         """
-        env_var_prefix: str = match.group("env_var_prefix")
-        pattern = re.compile(r"^" + env_var_prefix + r"[a-zA-Z0-9_-]*")
-        return [
-            CompletionItem(
-                label=match.string,
-                kind=CompletionItemKind.Variable,
-                insert_text_format=InsertTextFormat.PlainText,
-            )
-            for match in filter(None, map(pattern.match, all_env_vars))
-        ]
+        env_var_prefix: str = context.prefix
+        env_vars, is_incomplete = env_var_index().query(env_var_prefix, model)
+        return CompletionList(
+            is_incomplete=is_incomplete,
+            items=[
+                CompletionItem(
+                    label=env_var,
+                    kind=CompletionItemKind.Variable,
+                    insert_text_format=InsertTextFormat.PlainText,
+                )
+                for env_var in env_vars
+            ],
+        )
 
 
 class FindPkgShareSuffixPathCompletion(CompletionFeatureEntity):
@@ -155,51 +240,33 @@ class FindPkgShareSuffixPathCompletion(CompletionFeatureEntity):
     Provides completion items for <path> in $(find-pkg-share <package_name>)/<path>.
     """
 
-    pattern = re.compile(
-        r"\".*?\$\(find\-pkg\-share\s+(?P<package_name>[a-zA-Z0-9_-]+)\)(?P<path_suffix>.*)$"
-    )
+    kind = CompletionContextKind.FIND_PKG_SHARE_PATH
 
     def complete(
-        self, doc: TextDocument, pos: Position, match: re.Match
-    ) -> List[CompletionItem]:
+        self,
+        doc: TextDocument,
+        model: DocumentModel,
+        pos: Position,
+        context: CompletionContext,
+    ) -> CompletionList:
         """
         Generates completion items for <path> in $(find-pkg-share package_name)/<path>.
 
         :param doc: The text document in which completion is triggered.
+        :param model: The model of the document.
         :param pos: The position in the document where completion is triggered.
-        :param match: The regex match object.
+        :param context: The completion context at the cursor.
 
-        :return: A list of completion items.
+        :return: The completion list.
         """
-        package_name: str = match.group("package_name")
-        path_suffix: str = match.group("path_suffix")
-
-        try:
-            share_dir = get_package_share_directory(package_name)
-        except Exception:
-            return []
+        package_name: str = context.package_name
+        path_suffix: str = context.prefix
 
-        path = os.path.join(share_dir, path_suffix.lstrip("/"))
+        share_dir = find_package_share_directory(package_name)
+        if share_dir is None:
+            return CompletionList(is_incomplete=False, items=[])
 
-        dir_path, incomplete_part = os.path.split(path)
-
-        if not os.path.isdir(dir_path):
-            return []
-
-        return [
-            CompletionItem(
-                label=os.path.basename(path),
-                kind=(
-                    CompletionItemKind.Folder
-                    if os.path.isdir(path)
-                    else CompletionItemKind.File
-                ),
-            )
-            for path in map(
-                lambda item: os.path.join(dir_path, item),
-                filter(lambda x: x.startswith(incomplete_part), os.listdir(dir_path)),
-            )
-        ]
+        return complete_path_suffix(share_dir, path_suffix)
 
 
 class EnvHomeSuffixPathCompletion(CompletionFeatureEntity):
@@ -207,44 +274,29 @@ class EnvHomeSuffixPathCompletion(CompletionFeatureEntity):
     Provides completion items for <path> of $(env HOME)/<path>.
     """
 
-    pattern = re.compile(r"\".*?\$\(env\s+HOME\)(?P<path_suffix>.*)$")
+    kind = CompletionContextKind.ENV_HOME_PATH
 
     def complete(
-        self, doc: TextDocument, pos: Position, match: re.Match
-    ) -> List[CompletionItem]:
+        self,
+        doc: TextDocument,
+        model: DocumentModel,
+        pos: Position,
+        context: CompletionContext,
+    ) -> CompletionList:
         """
         Generates completion items for <path> within a package's share directory.
 
         :param doc: The text document in which completion is triggered.
+        :param model: The model of the document.
         :param pos: The position in the document where completion is triggered.
-        :param match: The regex match object.
-        :return: A list of completion items.
+        :param context: The completion context at the cursor.
+        :return: The completion list.
         """
-        path_suffix: str = match.group("path_suffix")
+        path_suffix: str = context.prefix
 
         home_dir = os.path.expanduser("~")
 
-        path = os.path.join(home_dir, path_suffix.lstrip("/"))
-
-        dir_path, incomplete_part = os.path.split(path)
-
-        if not os.path.isdir(dir_path):
-            return []
-
-        return [
-            CompletionItem(
-                label=os.path.basename(path),
-                kind=(
-                    CompletionItemKind.Folder
-                    if os.path.isdir(path)
-                    else CompletionItemKind.File
-                ),
-            )
-            for path in map(
-                lambda item: os.path.join(dir_path, item),
-                filter(lambda x: x.startswith(incomplete_part), os.listdir(dir_path)),
-            )
-        ]
+        return complete_path_suffix(home_dir, path_suffix)
 
 
 class VarCompletion(CompletionFeatureEntity):
@@ -252,62 +304,47 @@ class VarCompletion(CompletionFeatureEntity):
     Provides completion items for <variable_name> in $(var <variable_name>).
     """
 
-    pattern = re.compile(r"\".*?\$\(var\s+(?P<var_name_prefix>[a-zA-Z0-9_-]*)$")
+    kind = CompletionContextKind.VAR_ARG
 
     def complete(
-        self, doc: TextDocument, pos: Position, match: re.Match
-    ) -> List[CompletionItem]:
+        self,
+        doc: TextDocument,
+        model: DocumentModel,
+        pos: Position,
+        context: CompletionContext,
+    ) -> CompletionList:
         """
         Generates completion items for <variable_name> in $(var <variable_name>).
 
         :param doc: The text document in which completion is triggered.
+        :param model: The model of the document.
         :param pos: The position in the document where completion is triggered.
-        :param match: The regex match object.
-        :return: A list of completion items.
+        :param context: The completion context at the cursor.
+        :return: The completion list.
         """
-        var_name_prefix: str = match.group("var_name_prefix")
-        parser = etree.XMLPullParser(events=("start", "end"))
-
-        try:
-            text_before_element_at_cursor = (
-                doc.source[: doc.offset_at_position(pos)]
-                + re.search(
-                    r"^([^>^<]*>)", doc.source[doc.offset_at_position(pos) :]
-                ).group()
-            )
-        except AttributeError:
-            return []
-
-        parser.feed(text_before_element_at_cursor)
-
-        event, elem_at_cursor = list(parser.read_events())[-1]
-
-        def search_usable_variable(elem: etree.Element, tag: str = "arg"):
-            parent = elem.getparent()
-            if parent is not None:
-                return [
-                    e.get("name")
-                    for e in parent.findall(tag)
-                    if e.get("name", "").startswith(var_name_prefix)
-                ] + search_usable_variable(parent, tag)
-            else:
-                return []
+        var_name_prefix: str = context.prefix
+        offset = model.line_index.offset_at_position(pos)
 
-        usable_vars = search_usable_variable(
-            elem_at_cursor, "arg"
-        ) + search_usable_variable(elem_at_cursor, "let")
+        usable_vars = [
+            declaration.name
+            for declaration in model.symbols.visible_at(offset)
+            if declaration.name.startswith(var_name_prefix)
+        ]
 
         # Remove duplicates
-        usable_vars = list(set(usable_vars))
+        usable_vars = list(dict.fromkeys(usable_vars))
 
-        return [
-            CompletionItem(
-                label=var,
-                kind=CompletionItemKind.Variable,
-                insert_text_format=InsertTextFormat.PlainText,
-            )
-            for var in usable_vars
-        ]
+        return CompletionList(
+            is_incomplete=False,
+            items=[
+                CompletionItem(
+                    label=var,
+                    kind=CompletionItemKind.Variable,
+                    insert_text_format=InsertTextFormat.PlainText,
+                )
+                for var in usable_vars
+            ],
+        )
 
 
 class NodePkgCompletion(CompletionFeatureEntity):
@@ -315,29 +352,37 @@ class NodePkgCompletion(CompletionFeatureEntity):
     Provides completion items for <package_name> in <node pkg="<package_name>".
     """
 
-    pattern = re.compile(r"\<node[^<]*pkg\s*=\s*\"(?P<pkg_name_prefix>[a-zA-Z0-9_-]*)$")
+    kind = CompletionContextKind.NODE_PKG
 
     def complete(
-        self, doc: TextDocument, pos: Position, match: re.Match
-    ) -> List[CompletionItem]:
+        self,
+        doc: TextDocument,
+        model: DocumentModel,
+        pos: Position,
+        context: CompletionContext,
+    ) -> CompletionList:
         """
         Generates completion items for <package_name> in <node pkg="<package_name>" />.
 
         :param doc: The text document in which completion is triggered.
+        :param model: The model of the document.
         :param pos: The position in the document where completion is triggered.
-        :param match: The regex match object.
-        :return: A list of completion items.
+        :param context: The completion context at the cursor.
+        :return: The completion list.
         """
-        pkg_name_prefix: str = match.group("pkg_name_prefix")
-        pattern = re.compile(r"^" + pkg_name_prefix + r"[a-zA-Z0-9_-]*")
-        return [
-            CompletionItem(
-                label=match.string,
-                kind=CompletionItemKind.Module,
-                insert_text_format=InsertTextFormat.PlainText,
-            )
-            for match in filter(None, map(pattern.match, all_ros_packages))
-        ]
+        pkg_name_prefix: str = context.prefix
+        packages, is_incomplete = ros_package_index().query(pkg_name_prefix, model)
+        return CompletionList(
+            is_incomplete=is_incomplete,
+            items=[
+                CompletionItem(
+                    label=package,
+                    kind=CompletionItemKind.Module,
+                    insert_text_format=InsertTextFormat.PlainText,
+                )
+                for package in packages
+            ],
+        )
 
 
 completion_feature_eitities: List[CompletionFeatureEntity] = [
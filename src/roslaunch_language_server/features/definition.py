@@ -1,38 +1,17 @@
-import os
 import re
 from typing import List
 
-from ament_index_python.packages import (
-    PackageNotFoundError,
-    get_package_share_directory,
-)
 from lsprotocol.types import Location, Position, Range
-from lxml import etree
+from pygls.uris import from_fs_path, to_fs_path
 from pygls.workspace import TextDocument
 
-from roslaunch_analyzer.utils import resolve_symlink
+from roslaunch_language_server.features.references import launch_argument_at
+from roslaunch_language_server.helper.document_model import DocumentModel
+from roslaunch_language_server.helper.package_paths import package_paths
+from roslaunch_language_server.helper.workspace_index import workspace_index
 from roslaunch_language_server.server import logger
 
 
-def position_at_offset(text: TextDocument, offset: int) -> Position:
-    """Return the position pointed at by the given character offset using the provided object."""
-    lines = text.lines
-    accumulated_offset = 0
-
-    for i, line in enumerate(lines):
-        line_length = text._position_codec.client_num_units(line)
-        if accumulated_offset + line_length >= offset:
-            col = offset - accumulated_offset
-            server_position = text._position_codec.position_to_client_units(
-                lines, Position(line=i, character=col)
-            )
-            return server_position
-
-        accumulated_offset += line_length
-
-    raise ValueError("Offset out of range")
-
-
 class DefinitionFeatureEntity:
 
     @property
@@ -48,7 +27,7 @@ class DefinitionFeatureEntity:
         raise NotImplementedError("The pattern property must be implemented.")
 
     def definition(
-        self, doc: TextDocument, pos: Position, match: re.Match
+        self, doc: TextDocument, model: DocumentModel, pos: Position, match: re.Match
     ) -> List[Location]:
         raise NotImplementedError("The get_definition method must be implemented.")
 
@@ -66,62 +45,27 @@ class FindPkgSharePathDefinition(DefinitionFeatureEntity):
     )
 
     def definition(
-        self, doc: TextDocument, pos: Position, match: re.Match
+        self, doc: TextDocument, model: DocumentModel, pos: Position, match: re.Match
     ) -> List[Location]:
         pkg_name: str = match.group("pkg_name")
         relative_path: str = match.group("relative_path")
 
-        try:
-            pkg_share_path = get_package_share_directory(pkg_name)
-        except PackageNotFoundError:
+        resolved_path = package_paths.resolve(pkg_name, relative_path)
+        if resolved_path is None:
             self.logger.error(
-                f"Failed to find share directory for package '{pkg_name}'"
+                f"Failed to resolve '{relative_path}' in package '{pkg_name}'"
             )
             return []
-        resolved_path = resolve_symlink(
-            os.path.join(pkg_share_path, relative_path.lstrip("/"))
-        )
-        self.logger.debug(f"Resolved path: {resolved_path}")
-
-        # check if the resolved path exists
-        if not os.path.exists(resolved_path):
-            self.logger.error(f"Resolved path '{resolved_path}' does not exist")
-            return []
+        self.logger.debug("Resolved path: %s", resolved_path)
 
         return [
             Location(
-                uri=f"file://{resolved_path}",
+                uri=from_fs_path(resolved_path),
                 range=Range(start=Position(0, 0), end=Position(0, 0)),
             )
         ]
 
 
-def _are_in_same_scope(higer_elem: etree.Element, lower_elem: etree.Element):
-    if lower_elem.getparent() is None:
-        return False
-
-    if higer_elem in lower_elem.getparent().getchildren():
-        return True
-
-    return _are_in_same_scope(higer_elem, lower_elem.getparent())
-
-
-def are_in_same_scope(
-    text_before_element_at_cursor: str, text_before_matched_element: str
-):
-    parser = etree.XMLPullParser(events=("start", "end"))
-
-    parser.feed(text_before_matched_element)
-
-    event, matched_elem = list(parser.read_events())[-1]
-
-    parser.feed(text_before_element_at_cursor.replace(text_before_matched_element, ""))
-
-    event, elem_at_cursor = list(parser.read_events())[-1]
-
-    return _are_in_same_scope(matched_elem, elem_at_cursor)
-
-
 class FindVarDefinition(DefinitionFeatureEntity):
 
     re_start_quote = re.compile(r"\$\(var\s+(.*)$")
@@ -131,67 +75,50 @@ class FindVarDefinition(DefinitionFeatureEntity):
     pattern = re.compile(r"(?P<var_name>[a-zA-Z0-9_-]+)$")
 
     def definition(
-        self, doc: TextDocument, pos: Position, match: re.Match
+        self, doc: TextDocument, model: DocumentModel, pos: Position, match: re.Match
     ) -> List[Location]:
 
         var_name = match.group("var_name")
 
-        arg_definition_pattern = re.compile(
-            rf'(?P<higher_contents>.*)<arg\b[^>]*\bname=["\'](?P<name>{var_name})["\'][^>]*(?:>(?P<content>.*?)<\/arg>|\/>)',
-            re.DOTALL,
-        )
-        let_definition_pattern = re.compile(
-            rf'(?P<higher_contents>.*)<let\b[^>]*\bname=["\'](?P<name>{var_name})["\'][^>]*\bvalue=["\'](?P<value>[^"\']+)["\'][^>]*(?:>(?P<content>.*?)<\/let>|\/>)',
-            re.DOTALL,
-        )
+        cursor_offset = model.line_index.offset_at_position(pos)
 
-        text_before_cursor = doc.source[: doc.offset_at_position(pos)]
+        return [
+            Location(
+                uri=doc.uri,
+                range=Range(
+                    start=model.line_index.position_at_offset(declaration.name_start),
+                    end=model.line_index.position_at_offset(declaration.name_end),
+                ),
+            )
+            for declaration in model.symbols.visible_at(cursor_offset, var_name)
+        ]
 
-        text_before_element_at_cursor = (
-            doc.source[: doc.offset_at_position(pos)]
-            + doc.source[doc.offset_at_position(pos) :].split("<")[0]
-        )
 
-        matches = re.finditer(arg_definition_pattern, text_before_cursor)
-
-        definitions = []
-
-        for match in matches:
-            text_before_matched_element = match.group()
-            if not are_in_same_scope(
-                text_before_element_at_cursor, text_before_matched_element
-            ):
-                continue
-            start = position_at_offset(doc, match.start("name"))
-            end = position_at_offset(doc, match.end("name"))
-            definitions.append(
-                Location(
-                    uri=doc.uri,
-                    range=Range(start=start, end=end),
-                )
-            )
+class IncludeArgDefinition(DefinitionFeatureEntity):
 
-        matches = re.finditer(let_definition_pattern, text_before_cursor)
-
-        for match in matches:
-            text_before_matched_element = match.group()
-            if not are_in_same_scope(
-                text_before_element_at_cursor, text_before_matched_element
-            ):
-                continue
-            start = position_at_offset(doc, match.start("name"))
-            end = position_at_offset(doc, match.end("name"))
-            definitions.append(
-                Location(
-                    uri=doc.uri,
-                    range=Range(start=start, end=end),
-                )
-            )
+    re_start_quote = re.compile(r'name="([^"]*)$')
+
+    re_end_quote = re.compile(r'^[^"]*')
 
-        return definitions
+    pattern = re.compile(r"(?P<arg_name>[^\s]+)")
+
+    def definition(
+        self, doc: TextDocument, model: DocumentModel, pos: Position, match: re.Match
+    ) -> List[Location]:
+        path = to_fs_path(doc.uri)
+        if path is None:
+            return []
+        argument = launch_argument_at(
+            model, path, model.line_index.offset_at_position(pos)
+        )
+        if argument is None or argument.path is None:
+            return []
+        workspace_index.ensure(argument.path)
+        return workspace_index.declarations(argument.path, argument.name)
 
 
 definition_feature_eitities: List[DefinitionFeatureEntity] = [
     FindPkgSharePathDefinition(),
     FindVarDefinition(),
+    IncludeArgDefinition(),
 ]
@@ -0,0 +1,91 @@
+from typing import List
+
+from lsprotocol.types import DocumentLink, Range
+from pygls.uris import from_fs_path
+from pygls.workspace import TextDocument
+
+from roslaunch_analyzer.cache import cache_manager
+from roslaunch_language_server.helper.document_model import DocumentModelStore
+from roslaunch_language_server.helper.package_paths import package_paths
+from roslaunch_language_server.helper.substitutions import (
+    iter_attribute_substitutions,
+    path_suffix,
+)
+
+
+class DocumentLinkProvider:
+    """
+    Links from every $(find-pkg-share pkg)/path in a document to the file.
+
+    All occurrences are collected in one scan of the syntax tree and resolved
+    together against the shared package path cache. The links of the last
+    version of each document are kept in the "document_link" cache region
+    until the document changes.
+
+    :param document_models: The document models of the session.
+    """
+
+    def __init__(self, document_models: DocumentModelStore):
+        self._document_models = document_models
+        self._owner = object()
+        self._links = cache_manager.region("document_link")
+        self._stats = self._links.stats
+
+    def links(self, doc: TextDocument) -> List[DocumentLink]:
+        """
+        Return the links of a document.
+
+        :param doc: The document.
+        :return: The links to the existing files.
+        """
+        cached = self._links.get((self._owner, doc.uri))
+        if cached is not None and cached[0] == doc.version:
+            self._stats.hit()
+            return cached[1]
+        self._stats.miss()
+
+        model = self._document_models.get(doc)
+        occurrences = []
+        for _, attribute, substitution in iter_attribute_substitutions(model.syntax):
+            argument = substitution.argument
+            if (
+                substitution.name != "find-pkg-share"
+                or not substitution.closed
+                or not argument
+                or "$(" in argument
+            ):
+                continue
+            suffix, suffix_end = path_suffix(
+                attribute.value, attribute.value_start, substitution
+            )
+            if not suffix.strip("/"):
+                continue
+            occurrences.append((substitution.start, suffix_end, (argument, suffix)))
+
+        resolved = package_paths.resolve_many(key for _, _, key in occurrences)
+
+        links = []
+        for start, end, key in occurrences:
+            path = resolved[key]
+            if path is None:
+                continue
+            links.append(
+                DocumentLink(
+                    range=Range(
+                        start=model.line_index.position_at_offset(start),
+                        end=model.line_index.position_at_offset(end),
+                    ),
+                    target=from_fs_path(path),
+                )
+            )
+
+        self._links.put((self._owner, doc.uri), (doc.version, links), 400 * len(links))
+        return links
+
+    def close(self, uri: str):
+        """
+        Drop the links of a closed document.
+
+        :param uri: The URI of the document.
+        """
+        self._links.pop((self._owner, uri))
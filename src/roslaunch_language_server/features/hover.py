@@ -1,43 +1,228 @@
-import re
-from typing import List, Optional
+import json
+from typing import Any, Dict, List, Optional, Tuple
 
-from lsprotocol.types import Hover, Position
+from lsprotocol.types import Hover, MarkupContent, MarkupKind, Position, Range
 from pygls.workspace import TextDocument
 
+from roslaunch_analyzer.cache import approximate_size, cache_manager
+from roslaunch_language_server.helper.document_model import DocumentModelStore
+from roslaunch_language_server.helper.interval_index import IntervalIndex
+from roslaunch_language_server.helper.substitutions import iter_attribute_substitutions
+from roslaunch_language_server.helper.syntax import SyntaxTree, XmlElement
+from roslaunch_language_server.utils import (
+    find_package_share_directory,
+    ros_package_prefixes,
+)
 
-class HoverFeatureEntity:
-    @property
-    def re_start_quote(self) -> re.Pattern:
-        raise NotImplementedError("The re_start_quote property must be implemented.")
+# Tags of the elements that are built into NodeNode / ComposableNodeContainerNode.
+NODE_TAGS = ("node", "node_container")
 
-    @property
-    def re_end_quote(self) -> re.Pattern:
-        raise NotImplementedError("The re_end_quote property must be implemented.")
 
-    @property
-    def pattern(self) -> re.Pattern:
-        raise NotImplementedError("The pattern property must be implemented.")
+def _collect(
+    tree: Any,
+) -> Tuple[Dict[Tuple[int, ...], Any], Dict[Tuple[int, ...], Dict[str, Any]]]:
+    """
+    Return the built nodes of the launch file of a tree and the launch
+    configurations its elements were evaluated with, both by element, without
+    those of included launch files.
+    """
+    from roslaunch_analyzer.tree import (
+        ComposableNodeContainerNode,
+        IncludeLaunchDescriptionNode,
+        NodeNode,
+    )
+
+    nodes = {}
+    scopes = {}
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (NodeNode, ComposableNodeContainerNode)):
+            if node.element is not None:
+                nodes[node.element] = node
+        if node is tree or not isinstance(node, IncludeLaunchDescriptionNode):
+            scopes.update(node.scopes)
+            stack.extend(node.children)
+    return nodes, scopes
+
+
+def _element_positions(syntax: SyntaxTree) -> Dict[XmlElement, Tuple[int, ...]]:
+    """
+    Return the positions of the elements of a document in the format of
+    LaunchTreeNode.element.
+    """
+    positions: Dict[XmlElement, Tuple[int, ...]] = {}
+    if not syntax.root.children:
+        return positions
+    stack = [(syntax.root.children[0], ())]
+    while stack:
+        element, position = stack.pop()
+        positions[element] = position
+        stack.extend(
+            (child, position + (index,)) for index, child in enumerate(element.children)
+        )
+    return positions
+
+
+def _code(value: Any) -> str:
+    return f"`{value}`"
+
+
+def _node_markdown(node: Any) -> str:
+    namespace = (
+        node.namespace if node.namespace.startswith("/") else "/" + node.namespace
+    )
+    lines = [
+        f"**{namespace.rstrip('/')}/{node.name}**",
+        "",
+        f"{_code(node.package)} / {_code(node.executable)}",
+    ]
+    if node.parameters:
+        lines += [
+            "",
+            "Parameters:",
+            "```json",
+            json.dumps(node.parameters, indent=2, default=str),
+            "```",
+        ]
+    return "\n".join(lines)
+
+
+def _substitution_markdown(
+    name: str,
+    argument: str,
+    launch_configurations: Dict[str, str],
+    environment: Dict[str, str],
+) -> Optional[str]:
+    if name == "var":
+        value = launch_configurations.get(argument)
+        if value is None:
+            return f"{_code(argument)} is not set in the last build"
+        return f"{_code(argument)} = {_code(value)}"
+    if name == "env":
+        variable, _, default = argument.partition(" ")
+        value = environment.get(variable)
+        if value is None:
+            if default:
+                return f"{_code(variable)} is not set, defaults to {_code(default.strip())}"
+            return f"{_code(variable)} is not set"
+        return f"{_code(variable)} = {_code(value)}"
+    if name == "find-pkg-share":
+        path = find_package_share_directory(argument)
+    elif name == "find-pkg-prefix":
+        path = ros_package_prefixes().get(argument)
+    else:
+        return None
+    if path is None:
+        return f"Package {_code(argument)} not found"
+    return _code(path)
 
-    def hover(
-        self, doc: TextDocument, pos: Position, match: re.Match
-    ) -> Optional[Hover]:
-        raise NotImplementedError("The hover method must be implemented.")
 
+def build_hover_index(syntax: SyntaxTree, tree: Any) -> IntervalIndex[str]:
+    """
+    Map the substitutions and node start tags of a document to the values
+    they resolved to in a built launch tree.
 
-class SubstitutionHover(HoverFeatureEntity):
-    re_start_quote = re.compile(r"\$\{")
-    re_end_quote = re.compile(r"\}")
+    :param syntax: The syntax tree of the document.
+    :param tree: The built launch tree of the document.
+    :return: The hover texts indexed by document offset.
+    """
+    nodes, scopes = _collect(tree)
+    positions = _element_positions(syntax)
 
-    @property
-    def pattern(self) -> re.Pattern:
-        return re.compile(r"\$\{([^}]*)\}")
+    intervals: List[Tuple[int, int, str]] = [
+        (element.start, element.start_tag_end, _node_markdown(nodes[position]))
+        for tag in NODE_TAGS
+        for element in syntax.elements_by_tag.get(tag, [])
+        if (position := positions.get(element)) in nodes
+    ]
+
+    environment = getattr(tree, "environment", {})
+    for element, _, substitution in iter_attribute_substitutions(syntax):
+        argument = substitution.argument
+        if not substitution.closed or not argument or "$(" in argument:
+            continue
+        # The configurations of the innermost evaluated element, e.g. of the
+        # <node> of a <param>; the end of the file if the element is unknown.
+        launch_configurations = getattr(tree, "launch_configurations", {})
+        for candidate in (element, *element.ancestors()):
+            scope = scopes.get(positions.get(candidate))
+            if scope is not None:
+                launch_configurations = scope
+                break
+        markdown = _substitution_markdown(
+            substitution.name, argument, launch_configurations, environment
+        )
+        if markdown is not None:
+            intervals.append((substitution.start, substitution.end, markdown))
+
+    return IntervalIndex(intervals)
+
+
+class HoverProvider:
+    """
+    Hover texts with the values resolved in the last build of a document.
+
+    The texts are precomputed into an interval index by document offset when
+    a build is first hovered (and again after edits, which only re-match the
+    syntax tree against the same build), so a hover is a lookup and never
+    evaluates the launch file. The indexes are kept in the "hover_index"
+    cache region; the built tree they refer to is accounted by the build
+    cache.
+
+    :param document_models: The document models of the session.
+    """
+
+    def __init__(self, document_models: DocumentModelStore):
+        self._document_models = document_models
+        self._owner = object()
+        self._indexes = cache_manager.region("hover_index")
+        self._stats = self._indexes.stats
 
     def hover(
-        self, doc: TextDocument, pos: Position, match: re.Match
+        self, doc: TextDocument, pos: Position, tree: Optional[Any]
     ) -> Optional[Hover]:
+        """
+        Return the hover at a position.
+
+        :param doc: The document.
+        :param pos: The hovered position.
+        :param tree: The last built launch tree of the document, if any.
+        :return: The hover, or None if nothing resolved is at the position.
+        """
+        if tree is None:
+            return None
+
+        model = self._document_models.get(doc)
+        cached = self._indexes.get((self._owner, doc.uri))
+        if cached is not None and cached[0] == doc.version and cached[1] is tree:
+            self._stats.hit()
+            index = cached[2]
+        else:
+            self._stats.miss()
+            index = build_hover_index(model.syntax, tree)
+            self._indexes.put(
+                (self._owner, doc.uri),
+                (doc.version, tree, index),
+                approximate_size(index),
+            )
+
+        found = index.find(model.line_index.offset_at_position(pos))
+        if found is None:
+            return None
+        start, end, markdown = found
         return Hover(
-            contents={"kind": "markdown", "value": f"Substitution: `{match.group(1)}`"}
+            contents=MarkupContent(kind=MarkupKind.Markdown, value=markdown),
+            range=Range(
+                start=model.line_index.position_at_offset(start),
+                end=model.line_index.position_at_offset(end),
+            ),
         )
 
+    def close(self, uri: str):
+        """
+        Drop the hover index of a closed document.
 
-hover_feature_entities: List[HoverFeatureEntity] = [SubstitutionHover()]
+        :param uri: The URI of the document.
+        """
+        self._indexes.pop((self._owner, uri))
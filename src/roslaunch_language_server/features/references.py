@@ -0,0 +1,159 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+from lsprotocol.types import (
+    Location,
+    Position,
+    Range,
+    SymbolInformation,
+    SymbolKind,
+)
+from pygls.uris import to_fs_path
+from pygls.workspace import TextDocument
+
+from roslaunch_language_server.helper.document_model import DocumentModel
+from roslaunch_language_server.helper.substitutions import iter_substitutions
+from roslaunch_language_server.helper.workspace_index import (
+    resolve_include_target,
+    workspace_index,
+)
+
+
+@dataclass(frozen=True)
+class LaunchArgumentAt:
+    """
+    A launch argument under the cursor.
+
+    :param name: The name of the launch argument.
+    :param path: The path of the file declaring it, or None if it is declared
+        in the document itself.
+    """
+
+    name: str
+    path: Optional[str]
+
+
+def launch_argument_at(
+    model: DocumentModel, path: str, offset: int
+) -> Optional[LaunchArgumentAt]:
+    """
+    Return the launch argument named at an offset: in a $(var ...), in the
+    name of an <arg> declaration or in the name of an <arg> passed to an
+    <include>.
+
+    :param model: The document model.
+    :param path: The path of the document.
+    :param offset: The offset in the document.
+    :return: The launch argument, or None.
+    """
+    element = model.syntax.element_at(offset)
+    if element is None:
+        return None
+    for attribute in element.attributes.values():
+        if not attribute.value_start <= offset <= attribute.value_end:
+            continue
+        if element.tag == "arg" and attribute.name == "name":
+            parent = element.parent
+            if parent is None or parent.tag != "include":
+                return LaunchArgumentAt(attribute.value, None)
+            file = parent.get("file")
+            target = resolve_include_target(path, file) if file else None
+            if target is None:
+                return None
+            return LaunchArgumentAt(attribute.value, target)
+        for substitution in iter_substitutions(attribute.value, attribute.value_start):
+            if (
+                substitution.name == "var"
+                and substitution.argument
+                and "$(" not in substitution.argument
+                and substitution.argument_start <= offset <= substitution.argument_end
+            ):
+                return LaunchArgumentAt(substitution.argument, None)
+    return None
+
+
+def _location(model: DocumentModel, uri: str, start: int, end: int) -> Location:
+    return Location(
+        uri=uri,
+        range=Range(
+            start=model.line_index.position_at_offset(start),
+            end=model.line_index.position_at_offset(end),
+        ),
+    )
+
+
+def find_references(
+    doc: TextDocument, model: DocumentModel, pos: Position, include_declaration: bool
+) -> List[Location]:
+    """
+    Return the references of the launch argument at a position across the
+    workspace.
+
+    References in the document itself come from its up-to-date model, those
+    in other files from the workspace index.
+
+    :param doc: The document.
+    :param model: The model of the document.
+    :param pos: The position of the cursor.
+    :param include_declaration: Whether to include the declarations.
+    :return: The locations of the references.
+    """
+    path = to_fs_path(doc.uri)
+    if path is None:
+        return []
+    argument = launch_argument_at(model, path, model.line_index.offset_at_position(pos))
+    if argument is None:
+        return []
+
+    if argument.path is not None:
+        locations = workspace_index.references(argument.path, argument.name)
+        if include_declaration:
+            locations = (
+                workspace_index.declarations(argument.path, argument.name) + locations
+            )
+        return locations + workspace_index.include_arguments(
+            argument.path, argument.name
+        )
+
+    locations = []
+    if include_declaration:
+        locations += [
+            _location(model, doc.uri, declaration.name_start, declaration.name_end)
+            for declaration in model.symbols.by_name.get(argument.name, [])
+            if declaration.tag == "arg"
+        ]
+    for element in model.syntax.root.iter():
+        for attribute in element.attributes.values():
+            if "$(var" not in attribute.value:
+                continue
+            locations += [
+                _location(
+                    model,
+                    doc.uri,
+                    substitution.argument_start,
+                    substitution.argument_end,
+                )
+                for substitution in iter_substitutions(
+                    attribute.value, attribute.value_start
+                )
+                if substitution.name == "var" and substitution.argument == argument.name
+            ]
+    return locations + workspace_index.include_arguments(path, argument.name)
+
+
+def workspace_symbols(query: str) -> List[SymbolInformation]:
+    """
+    Return the launch arguments of the workspace matching a query.
+
+    :param query: The case-insensitive query.
+    :return: The symbols.
+    """
+    return [
+        SymbolInformation(
+            name=name,
+            kind=SymbolKind.Variable,
+            location=location,
+            container_name=path,
+        )
+        for name, path, location in workspace_index.symbols(query)
+    ]
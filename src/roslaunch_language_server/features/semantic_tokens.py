@@ -0,0 +1,400 @@
+import itertools
+import re
+from typing import List, Optional, Sequence, Tuple, Union
+
+from lsprotocol.types import (
+    SemanticTokens,
+    SemanticTokensDelta,
+    SemanticTokensEdit,
+    SemanticTokensLegend,
+    TextDocumentContentChangeEvent,
+)
+from pygls.workspace import TextDocument
+
+from roslaunch_analyzer.cache import cache_manager
+from roslaunch_language_server.features.completion import SubstitutionCompletion
+from roslaunch_language_server.helper.document_model import DocumentModelStore
+from roslaunch_language_server.helper.line_index import LineIndex, utf16_length
+from roslaunch_language_server.helper.substitutions import iter_substitutions
+
+TOKEN_TYPES = ["macro", "function", "variable", "namespace"]
+TOKEN_MODIFIERS = ["declaration"]
+
+LEGEND = SemanticTokensLegend(token_types=TOKEN_TYPES, token_modifiers=TOKEN_MODIFIERS)
+
+_MACRO = TOKEN_TYPES.index("macro")
+_FUNCTION = TOKEN_TYPES.index("function")
+_VARIABLE = TOKEN_TYPES.index("variable")
+_NAMESPACE = TOKEN_TYPES.index("namespace")
+_DECLARATION = 1 << TOKEN_MODIFIERS.index("declaration")
+
+_PACKAGE_SUBSTITUTIONS = ("find-pkg-prefix", "find-pkg-share")
+
+_COMMENT = "!--"
+
+_markup = re.compile(
+    r"<!--|-->|<(?P<end>/)?(?P<tag>[A-Za-z_][\w:.-]*)|(?P<close>/?>)"
+    r"|(?P<name>[A-Za-z_][\w:.-]*)\s*=\s*(?P<quote>[\"'])(?P<value>.*?)(?P=quote)"
+)
+
+# The state of the tokenizer at the end of a line: the tag of the start tag
+# that is still open, _COMMENT inside a comment, or None.
+LineState = Optional[str]
+
+
+def _attribute_tokens(
+    tag: str, name: str, value: str, value_start: int
+) -> List[Tuple[int, int, int, int]]:
+    tokens = []
+    if value and "$(" not in value:
+        if name == "name" and tag in ("arg", "let"):
+            tokens.append((value_start, len(value), _VARIABLE, _DECLARATION))
+        elif name == "pkg":
+            tokens.append((value_start, len(value), _NAMESPACE, 0))
+        return tokens
+
+    for substitution in iter_substitutions(value, value_start):
+        tokens.append((substitution.start, 2, _MACRO, 0))
+        if substitution.name in SubstitutionCompletion.available_semantics:
+            tokens.append(
+                (substitution.name_start, len(substitution.name), _FUNCTION, 0)
+            )
+        argument = substitution.argument
+        if argument and "$(" not in argument:
+            if substitution.name == "var":
+                token_type = _VARIABLE
+            elif substitution.name in _PACKAGE_SUBSTITUTIONS:
+                token_type = _NAMESPACE
+            else:
+                token_type = None
+            if token_type is not None:
+                tokens.append(
+                    (substitution.argument_start, len(argument), token_type, 0)
+                )
+        if substitution.closed:
+            tokens.append((substitution.end - 1, 1, _MACRO, 0))
+    return tokens
+
+
+def tokenize_line(text: str, state: LineState) -> Tuple[List[int], LineState]:
+    """
+    Compute the semantic tokens of a single line.
+
+    :param text: The text of the line without its line break.
+    :param state: The state at the end of the previous line.
+    :return: The tokens encoded as in the LSP, with the line delta of the first
+        token left at 0 and its start relative to the line, and the state at
+        the end of the line.
+    """
+    tokens: List[Tuple[int, int, int, int]] = []
+    for match in _markup.finditer(text):
+        markup = match.group()
+        if state == _COMMENT:
+            if markup == "-->":
+                state = None
+        elif markup == "<!--":
+            state = _COMMENT
+        elif match.group("tag") is not None:
+            state = None if match.group("end") else match.group("tag")
+        elif match.group("close") is not None:
+            state = None
+        elif match.group("name") is not None and state is not None:
+            tokens.extend(
+                _attribute_tokens(
+                    state,
+                    match.group("name"),
+                    match.group("value"),
+                    match.start("value"),
+                )
+            )
+    tokens.sort()
+
+    data: List[int] = []
+    previous_start = 0
+    for start, length, token_type, modifiers in tokens:
+        if not text.isascii():
+            length = utf16_length(text[start : start + length])
+            start = utf16_length(text[:start])
+        data += [0, start - previous_start, length, token_type, modifiers]
+        previous_start = start
+    return data, state
+
+
+def _merge_range(
+    pending: Optional[Tuple[int, int]], start: int, end: int, new_end: int
+) -> Tuple[int, int]:
+    """
+    Merge the replacement of the lines [start, end) by the lines
+    [start, new_end) into a pending range of changed lines.
+    """
+    if pending is None:
+        return start, new_end
+    low, high = pending
+    if high >= end:
+        high += new_end - end
+    elif high > start:
+        high = new_end
+    return min(low, start), max(high, new_end)
+
+
+def _map_ranges(
+    ranges: List[Tuple[int, int]], start: int, end: int, new_end: int
+) -> List[Tuple[int, int]]:
+    """
+    Map sorted, disjoint ranges of changed lines through the replacement of
+    the lines [start, end) by the lines [start, new_end), adding the latter.
+    """
+    low, high = start, new_end
+    mapped = []
+    for range_low, range_high in ranges:
+        if range_high < start:
+            mapped.append((range_low, range_high))
+        elif range_low > end:
+            shift = new_end - end
+            mapped.append((range_low + shift, range_high + shift))
+        else:
+            low = min(low, range_low)
+            if range_high >= end:
+                high = max(high, range_high + new_end - end)
+    mapped.append((low, high))
+    mapped.sort()
+    return mapped
+
+
+class _DocumentTokens:
+    """
+    Semantic tokens of a document, stored per line together with the
+    tokenizer states at the start and end of every line.
+    """
+
+    def __init__(self, line_index: LineIndex, version: Optional[int]):
+        self.version = version
+        self.line_tokens: List[List[int]] = []
+        self.start_states: List[LineState] = []
+        self.end_states: List[LineState] = []
+        self.retokenize(line_index, 0, len(line_index.line_starts))
+        self.data: List[int] = []
+        previous_line = 0
+        for line, data in enumerate(self.line_tokens):
+            if data:
+                self.data += data
+                self.data[-len(data)] = line - previous_line
+                previous_line = line
+        self.result_id = 0
+        self.generation = 0
+        # Range of lines changed since the last result, in current line numbers.
+        self.pending: Optional[Tuple[int, int]] = None
+
+    def splice(self, start: int, end: int, count: int):
+        """
+        Replace the lines [start, end) by count lines that are not tokenized yet.
+        """
+        self.line_tokens[start:end] = [[] for _ in range(count)]
+        self.start_states[start:end] = [None] * count
+        self.end_states[start:end] = [None] * count
+
+    def retokenize(self, line_index: LineIndex, low: int, high: int) -> int:
+        """
+        Tokenize the lines [low, high), and the following lines as long as the
+        state at their start differs from the one they were tokenized with.
+
+        :return: The end of the range of tokenized lines.
+        """
+        state = self.end_states[low - 1] if low > 0 else None
+        line = low
+        while line < len(line_index.line_starts):
+            if line >= high and self.start_states[line] == state:
+                break
+            data, end_state = tokenize_line(line_index.line_text(line), state)
+            if line < len(self.line_tokens):
+                self.line_tokens[line] = data
+                self.start_states[line] = state
+                self.end_states[line] = end_state
+            else:
+                self.line_tokens.append(data)
+                self.start_states.append(state)
+                self.end_states.append(end_state)
+            state = end_state
+            line += 1
+        return line
+
+    def flush(self) -> Optional[SemanticTokensEdit]:
+        """
+        Splice the tokens of the pending lines into the encoded data.
+
+        :return: The edit of the encoded data, or None if nothing changed.
+        """
+        if self.pending is None:
+            return None
+        low, high = self.pending
+        self.pending = None
+
+        previous_line = low - 1
+        while previous_line >= 0 and not self.line_tokens[previous_line]:
+            previous_line -= 1
+        next_line = high
+        while next_line < len(self.line_tokens) and not self.line_tokens[next_line]:
+            next_line += 1
+
+        start = sum(map(len, self.line_tokens[: previous_line + 1]))
+        kept = sum(map(len, self.line_tokens[next_line + 1 :]))
+
+        region: List[int] = []
+        last_line = max(previous_line, 0)
+        for line in range(low, min(next_line + 1, len(self.line_tokens))):
+            data = self.line_tokens[line]
+            if data:
+                region += data
+                region[-len(data)] = line - last_line
+                last_line = line
+
+        delete_count = len(self.data) - start - kept
+        self.data[start : start + delete_count] = region
+        self.result_id += 1
+        return SemanticTokensEdit(start=start, delete_count=delete_count, data=region)
+
+
+def _approximate_size(tokens: _DocumentTokens) -> int:
+    # Two list slots per encoded integer (in data and in the tokens of its
+    # line; small integers are shared), and a list and two states per line.
+    return 16 * len(tokens.data) + 120 * len(tokens.line_tokens)
+
+
+class SemanticTokensProvider:
+    """
+    Semantic tokens of substitutions, package names and launch argument
+    declarations and references.
+
+    Tokens are kept per line together with the tokenizer state at the end of
+    the line. An edit re-tokenizes the edited lines, and the following lines
+    only until the state at their start is unchanged. The encoded data is
+    spliced in place, so a delta costs time proportional to the edit rather
+    than to the document.
+
+    The tokens are kept in the "semantic_tokens" cache region. If they were
+    evicted, the next request is answered with all tokens.
+
+    :param document_models: The document models of the session.
+    """
+
+    def __init__(self, document_models: DocumentModelStore):
+        self._document_models = document_models
+        self._owner = object()
+        self._documents = cache_manager.region("semantic_tokens")
+        self._stats = self._documents.stats
+        self._generations = itertools.count()
+
+    def _result_id(self, uri: str, tokens: _DocumentTokens) -> str:
+        return f"{uri}#{tokens.generation}.{tokens.result_id}"
+
+    def _get(self, uri: str) -> Optional[_DocumentTokens]:
+        return self._documents.get((self._owner, uri))
+
+    def _put(self, uri: str, tokens: _DocumentTokens):
+        self._documents.put((self._owner, uri), tokens, _approximate_size(tokens))
+
+    def _tokens(self, doc: TextDocument) -> _DocumentTokens:
+        tokens = self._get(doc.uri)
+        if tokens is None or tokens.version != doc.version:
+            self._stats.miss()
+            tokens = _DocumentTokens(
+                self._document_models.get(doc).line_index, doc.version
+            )
+            # Result IDs of evicted or closed tokens are never reused.
+            tokens.generation = next(self._generations)
+            self._put(doc.uri, tokens)
+        else:
+            self._stats.hit()
+            tokens.flush()
+        return tokens
+
+    def full(self, doc: TextDocument) -> SemanticTokens:
+        """
+        Return all semantic tokens of a document.
+
+        :param doc: The document.
+        :return: The tokens.
+        """
+        tokens = self._tokens(doc)
+        return SemanticTokens(
+            data=tokens.data, result_id=self._result_id(doc.uri, tokens)
+        )
+
+    def delta(
+        self, doc: TextDocument, previous_result_id: str
+    ) -> Union[SemanticTokens, SemanticTokensDelta]:
+        """
+        Return the changes of the semantic tokens since a previous result.
+
+        :param doc: The document.
+        :param previous_result_id: The result ID of the previous result.
+        :return: The delta, or all tokens if the previous result is unknown.
+        """
+        tokens = self._get(doc.uri)
+        if (
+            tokens is None
+            or tokens.version != doc.version
+            or previous_result_id != self._result_id(doc.uri, tokens)
+        ):
+            return self.full(doc)
+        self._stats.hit()
+        edit = tokens.flush()
+        return SemanticTokensDelta(
+            edits=[edit] if edit is not None else [],
+            result_id=self._result_id(doc.uri, tokens),
+        )
+
+    def change(
+        self,
+        doc: TextDocument,
+        changes: Sequence[TextDocumentContentChangeEvent],
+    ):
+        """
+        Update the tokens of a document with the changes of a didChange.
+
+        :param doc: The document after the changes were applied.
+        :param changes: The content changes in the order they were applied.
+        """
+        tokens = self._get(doc.uri)
+        if tokens is None:
+            return
+        if any(getattr(change, "range", None) is None for change in changes):
+            self.close(doc.uri)
+            return
+
+        dirty: List[Tuple[int, int]] = []
+        for change in changes:
+            start = change.range.start.line
+            end = min(change.range.end.line + 1, len(tokens.line_tokens))
+            if start >= end:
+                self.close(doc.uri)
+                return
+            count = change.text.count("\n") + 1
+            tokens.splice(start, end, count)
+            dirty = _map_ranges(dirty, start, end, start + count)
+            tokens.pending = _merge_range(tokens.pending, start, end, start + count)
+
+        line_index = self._document_models.get(doc).line_index
+        if len(tokens.line_tokens) != len(line_index.line_starts):
+            self.close(doc.uri)
+            return
+        # Changed lines are re-tokenized per range, so that distant edits (e.g.
+        # with multiple cursors) do not re-tokenize the lines between them.
+        tokenized = 0
+        for low, high in dirty:
+            if high <= tokenized:
+                continue
+            low = max(low, tokenized)
+            tokenized = tokens.retokenize(line_index, low, high)
+            tokens.pending = _merge_range(tokens.pending, low, tokenized, tokenized)
+        tokens.version = doc.version
+        # Account for the new size.
+        self._put(doc.uri, tokens)
+
+    def close(self, uri: str):
+        """
+        Drop the tokens of a closed document.
+
+        :param uri: The URI of the document.
+        """
+        self._documents.pop((self._owner, uri))
@@ -0,0 +1,150 @@
+import enum
+import re
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+
+class CompletionContextKind(enum.Enum):
+    """
+    Kinds of cursor contexts in which completion is offered.
+    """
+
+    SUBSTITUTION = "substitution"
+    FIND_PKG_SHARE_ARG = "find-pkg-share-arg"
+    ENV_ARG = "env-arg"
+    VAR_ARG = "var-arg"
+    FIND_PKG_SHARE_PATH = "find-pkg-share-path"
+    ENV_HOME_PATH = "env-home-path"
+    NODE_PKG = "node-pkg"
+
+
+@dataclass(frozen=True)
+class CompletionContext:
+    """
+    The classified context at the cursor.
+
+    :param kind: The kind of context the cursor is in.
+    :param prefix: The partially typed text that is being completed.
+    :param package_name: The package name of a $(find-pkg-share <package_name>)
+        substitution, if the context is a path suffix of it.
+    """
+
+    kind: CompletionContextKind
+    prefix: str
+    package_name: Optional[str] = None
+
+
+# Maximum number of lines to look back for the start tag of an attribute.
+MAX_TAG_LOOKBACK_LINES = 32
+
+_open_substitution_name = re.compile(r"[a-z-]*")
+_open_substitution_arg = re.compile(
+    r"(?P<name>find-pkg-share|env|var)\s+(?P<prefix>[a-zA-Z0-9_-]*)"
+)
+_closed_substitution = re.compile(
+    r"(?P<name>find-pkg-share|env)\s+(?P<arg>[a-zA-Z0-9_-]+)\)(?P<suffix>.*)",
+    re.DOTALL,
+)
+_plain_name = re.compile(r"[a-zA-Z0-9_-]*")
+_pkg_attribute = re.compile(r"(?:^|\s)pkg\s*=\s*$")
+_tag_name = re.compile(r"<\s*(?P<tag>[a-zA-Z_][\w.:-]*)")
+
+_open_substitution_kinds = {
+    "find-pkg-share": CompletionContextKind.FIND_PKG_SHARE_ARG,
+    "env": CompletionContextKind.ENV_ARG,
+    "var": CompletionContextKind.VAR_ARG,
+}
+
+
+def _classify_substitution(value: str) -> Optional[CompletionContext]:
+    """
+    Classify the context from the last $( in an attribute value.
+
+    :param value: The attribute value from its opening quote up to the cursor.
+    :return: The completion context, or None if nothing can be completed.
+    """
+    inner = value[value.rfind("$(") + 2 :]
+
+    if ")" not in inner:
+        if _open_substitution_name.fullmatch(inner):
+            return CompletionContext(CompletionContextKind.SUBSTITUTION, inner)
+        match = _open_substitution_arg.fullmatch(inner)
+        if match is None:
+            return None
+        return CompletionContext(
+            _open_substitution_kinds[match.group("name")], match.group("prefix")
+        )
+
+    match = _closed_substitution.match(inner)
+    if match is None:
+        return None
+    if match.group("name") == "find-pkg-share":
+        return CompletionContext(
+            CompletionContextKind.FIND_PKG_SHARE_PATH,
+            match.group("suffix"),
+            package_name=match.group("arg"),
+        )
+    if match.group("arg") == "HOME":
+        return CompletionContext(
+            CompletionContextKind.ENV_HOME_PATH, match.group("suffix")
+        )
+    return None
+
+
+def _enclosing_tag(lines: Sequence[str], line: int, head: str) -> Optional[str]:
+    """
+    Find the name of the tag whose start tag contains the cursor.
+
+    Only the current start tag is scanned, and at most MAX_TAG_LOOKBACK_LINES
+    lines are looked back, so the cost does not depend on the document length.
+
+    :param lines: The lines of the document.
+    :param line: The line of the cursor.
+    :param head: The text of the cursor line preceding the attribute value.
+    :return: The tag name, or None if the cursor is not inside a start tag.
+    """
+    text = head
+    for index in range(line, max(line - MAX_TAG_LOOKBACK_LINES, -1), -1):
+        if index != line:
+            text = lines[index]
+        start = text.rfind("<")
+        if ">" in text[start + 1 :]:
+            return None
+        if start >= 0:
+            match = _tag_name.match(text, start)
+            return match.group("tag") if match else None
+    return None
+
+
+def get_completion_context(
+    lines: Sequence[str], line: int, character: int
+) -> Optional[CompletionContext]:
+    """
+    Classify the completion context at the cursor in a single pass.
+
+    Only the attribute value the cursor is in is inspected (plus the start tag
+    it belongs to for attribute completions), so the cost is independent of
+    the length of the document.
+
+    :param lines: The lines of the document.
+    :param line: The line of the cursor.
+    :param character: The column of the cursor.
+    :return: The completion context, or None if nothing can be completed.
+    """
+    if line >= len(lines):
+        return None
+    text = lines[line][:character]
+
+    quote = max(text.rfind('"'), text.rfind("'"))
+    if quote < 0:
+        return None
+    value = text[quote + 1 :]
+
+    if "$(" in value:
+        return _classify_substitution(value)
+
+    if not _plain_name.fullmatch(value) or not _pkg_attribute.search(text[:quote]):
+        return None
+    if _enclosing_tag(lines, line, text[:quote]) != "node":
+        return None
+    return CompletionContext(CompletionContextKind.NODE_PKG, value)
@@ -0,0 +1,84 @@
+import weakref
+from bisect import bisect_left
+from typing import Any, Iterable, List, Optional, Tuple
+
+from roslaunch_analyzer.cache import register_cache_stats
+
+# Maximum number of items returned by a query.
+DEFAULT_LIMIT = 100
+
+
+class CompletionIndex:
+    """
+    Sorted word list answering ranked, bounded completion queries.
+
+    Prefix matches are found by binary search and ranked before infix matches
+    (words containing the query elsewhere, case-insensitively). When the user
+    extends the previous query in the same document, the infix candidates of
+    the previous query are narrowed instead of scanning all words again.
+
+    :param words: The words to complete.
+    :param infix: Whether to also return infix matches.
+    :param limit: The maximum number of items returned by a query.
+    """
+
+    def __init__(
+        self, words: Iterable[str], infix: bool = True, limit: int = DEFAULT_LIMIT
+    ):
+        self.words: List[str] = sorted(set(words))
+        self.infix = infix
+        self.limit = limit
+        self._lowered: List[Tuple[str, str]] = [
+            (word.lower(), word) for word in self.words
+        ]
+        # The last query and its infix candidates per document, dropped with
+        # the document.
+        self._last: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._stats = register_cache_stats("completion_narrowing")
+
+    def _prefix_range(self, prefix: str) -> Tuple[int, int]:
+        start = bisect_left(self.words, prefix)
+        end = bisect_left(self.words, prefix + "\U0010ffff", lo=start)
+        return start, end
+
+    def _infix_matches(self, query: str, document: Optional[Any]) -> List[str]:
+        last = self._last.get(document) if document is not None else None
+        if last is not None and query.startswith(last[0]):
+            self._stats.hit()
+            candidates = last[1]
+        else:
+            self._stats.miss()
+            candidates = self._lowered
+        lowered = query.lower()
+        matches = [candidate for candidate in candidates if lowered in candidate[0]]
+        if document is not None:
+            self._last[document] = (query, matches)
+        return [word for _, word in matches]
+
+    def query(
+        self, query: str, document: Optional[Any] = None
+    ) -> Tuple[List[str], bool]:
+        """
+        Return the best matching words for the typed query.
+
+        :param query: The typed text.
+        :param document: The document the query is typed in, e.g. its model,
+            whose previous query is narrowed. Without one, all words are
+            scanned.
+        :return: The ranked matching words and whether the result was cut off
+            at the limit.
+        """
+        start, end = self._prefix_range(query)
+        prefix_matches = self.words[start : min(end, start + self.limit + 1)]
+        if len(prefix_matches) > self.limit or not self.infix or not query:
+            return prefix_matches[: self.limit], end - start > self.limit
+
+        # Shorter words are closer to what has been typed so far.
+        prefix_matches.sort(key=len)
+        seen = set(prefix_matches)
+        infix_matches = sorted(
+            (word for word in self._infix_matches(query, document) if word not in seen),
+            key=len,
+        )
+        results = prefix_matches + infix_matches
+        return results[: self.limit], len(results) > self.limit
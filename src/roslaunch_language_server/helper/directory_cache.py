@@ -0,0 +1,101 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+from roslaunch_analyzer.cache import cache_manager
+
+
+@dataclass(frozen=True)
+class DirectoryEntry:
+    """
+    An entry of a directory listing.
+
+    :param name: The name of the entry.
+    :param is_dir: Whether the entry is a directory (following symlinks).
+    """
+
+    name: str
+    is_dir: bool
+
+
+class DirectoryListingCache:
+    """
+    Cache of directory listings for path completion.
+
+    Listings are read with os.scandir, which provides the entry types without
+    a stat per entry. A cached listing is trusted for revalidate_interval
+    seconds and then revalidated with a single stat of the directory, which
+    is re-listed only if its mtime changed.
+
+    :param revalidate_interval: Seconds during which a listing is used without
+        checking the directory.
+    :param max_directories: The number of listings kept in the
+        "directory_listing" cache region (least recently used listings are
+        evicted first).
+    """
+
+    def __init__(self, revalidate_interval: float = 2.0, max_directories: int = 256):
+        self.revalidate_interval = revalidate_interval
+        self._listings = cache_manager.region(
+            "directory_listing", max_entries=max_directories
+        )
+        self._stats = self._listings.stats
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="directory-prefetch"
+        )
+
+    @staticmethod
+    def _scan(path: str) -> List[DirectoryEntry]:
+        entries = []
+        with os.scandir(path) as iterator:
+            for entry in iterator:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                entries.append(DirectoryEntry(entry.name, is_dir))
+        entries.sort(key=lambda entry: entry.name)
+        return entries
+
+    def list(self, path: str) -> Optional[List[DirectoryEntry]]:
+        """
+        Return the listing of a directory.
+
+        :param path: The path of the directory.
+        :return: The entries sorted by name, or None if it is not a directory.
+        """
+        now = time.monotonic()
+        cached = self._listings.get(path)
+        if cached is not None and now - cached[1] < self.revalidate_interval:
+            self._stats.hit()
+            return cached[2]
+
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+            if cached is not None and cached[0] == mtime_ns:
+                self._stats.hit()
+                entries = cached[2]
+            else:
+                self._stats.miss()
+                entries = self._scan(path)
+        except OSError:
+            self._listings.pop(path)
+            return None
+
+        # An entry with its name takes about 100 bytes.
+        self._listings.put(path, (mtime_ns, now, entries), 200 + 100 * len(entries))
+        return entries
+
+    def prefetch(self, path: str):
+        """
+        List a directory in the background so that the next completion in it
+        is served from the cache.
+
+        :param path: The path of the directory.
+        """
+        self._executor.submit(self.list, path)
+
+
+directory_cache = DirectoryListingCache()
@@ -0,0 +1,140 @@
+from typing import Optional, Sequence
+
+from lsprotocol.types import TextDocumentContentChangeEvent
+from pygls.workspace import TextDocument
+
+from roslaunch_analyzer.cache import cache_manager, register_cache_stats
+from roslaunch_language_server.helper.line_index import LineIndex
+from roslaunch_language_server.helper.symbols import SymbolTable
+from roslaunch_language_server.helper.syntax import SyntaxTree
+
+_symbol_table_stats = register_cache_stats("symbol_table")
+
+# Approximate memory of a parsed document per character of its text, measured
+# with approximate_size on generated launch files.
+DOCUMENT_MODEL_BYTES_PER_CHARACTER = 20
+
+
+class DocumentModel:
+    """
+    Parsed state of an open document that is kept up to date on every edit.
+
+    :param source: The text of the document.
+    :param version: The version of the document.
+    """
+
+    def __init__(self, source: str, version: Optional[int]):
+        self.source = source
+        self.version = version
+        self.line_index = LineIndex(source)
+        self.syntax = SyntaxTree(source)
+        self._symbols: Optional[SymbolTable] = None
+
+    @property
+    def symbols(self) -> SymbolTable:
+        """
+        The symbol table of the document, built on first use after an edit.
+        """
+        if self._symbols is None:
+            _symbol_table_stats.miss()
+            self._symbols = SymbolTable(self.syntax)
+        else:
+            _symbol_table_stats.hit()
+        return self._symbols
+
+    def apply_change(self, change: TextDocumentContentChangeEvent):
+        """
+        Apply a single content change to the model.
+
+        :param change: The incremental or full content change.
+        """
+        change_range = getattr(change, "range", None)
+        if change_range is None:
+            self.source = change.text
+            self.syntax = SyntaxTree(change.text)
+        else:
+            start = self.line_index.offset_at_position(change_range.start)
+            end = self.line_index.offset_at_position(change_range.end)
+            self.source = self.source[:start] + change.text + self.source[end:]
+            self.syntax.apply_edit(start, end, change.text)
+        self.line_index = LineIndex(self.source)
+        self._symbols = None
+
+
+class DocumentModelStore:
+    """
+    Document models of the open documents of a session, keyed by URI, in the
+    "document_model" cache region. An evicted model is parsed again on its
+    next use.
+    """
+
+    def __init__(self):
+        self._owner = object()
+        self._models = cache_manager.region("document_model")
+        self._stats = self._models.stats
+
+    def _put(self, uri: str, model: DocumentModel):
+        self._models.put(
+            (self._owner, uri),
+            model,
+            DOCUMENT_MODEL_BYTES_PER_CHARACTER * len(model.source),
+        )
+
+    def open(self, doc: TextDocument) -> DocumentModel:
+        """
+        Create the model of a newly opened document.
+
+        :param doc: The opened document.
+        :return: The document model.
+        """
+        model = DocumentModel(doc.source, doc.version)
+        self._put(doc.uri, model)
+        return model
+
+    def change(
+        self,
+        doc: TextDocument,
+        changes: Sequence[TextDocumentContentChangeEvent],
+    ) -> DocumentModel:
+        """
+        Update the model of a document with the changes of a didChange.
+
+        Falls back to a full parse if the model is missing or out of sync.
+
+        :param doc: The document after the changes were applied.
+        :param changes: The content changes in the order they were applied.
+        :return: The document model.
+        """
+        model = self._models.get((self._owner, doc.uri))
+        if model is None:
+            return self.open(doc)
+        for change in changes:
+            model.apply_change(change)
+        model.version = doc.version
+        if model.source != doc.source:
+            return self.open(doc)
+        # Account for the new size.
+        self._put(doc.uri, model)
+        return model
+
+    def close(self, uri: str):
+        """
+        Drop the model of a closed document.
+
+        :param uri: The URI of the closed document.
+        """
+        self._models.pop((self._owner, uri))
+
+    def get(self, doc: TextDocument) -> DocumentModel:
+        """
+        Return the model of a document, parsing it if it is not up to date.
+
+        :param doc: The document.
+        :return: The document model.
+        """
+        model = self._models.get((self._owner, doc.uri))
+        if model is None or model.version != doc.version or model.source != doc.source:
+            self._stats.miss()
+            return self.open(doc)
+        self._stats.hit()
+        return model
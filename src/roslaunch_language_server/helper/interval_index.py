@@ -0,0 +1,52 @@
+from bisect import bisect_right
+from typing import Generic, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class IntervalIndex(Generic[T]):
+    """
+    Index of nested intervals of document offsets for point lookups.
+
+    The intervals are expected to nest like the elements and substitutions
+    they are taken from. Each interval keeps a link to the innermost interval
+    containing it, so a lookup is a bisection followed by a walk up at most
+    the nesting depth.
+
+    :param intervals: The (start, end, value) triples, with end exclusive.
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[int, int, T]]):
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        self._values: List[T] = []
+        self._parents: List[int] = []
+        stack: List[int] = []
+        for start, end, value in sorted(
+            intervals, key=lambda interval: (interval[0], -interval[1])
+        ):
+            while stack and self._ends[stack[-1]] <= start:
+                stack.pop()
+            self._parents.append(stack[-1] if stack else -1)
+            stack.append(len(self._starts))
+            self._starts.append(start)
+            self._ends.append(end)
+            self._values.append(value)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def find(self, offset: int) -> Optional[Tuple[int, int, T]]:
+        """
+        Return the innermost interval containing an offset.
+
+        :param offset: The offset.
+        :return: The (start, end, value) triple, or None if no interval
+            contains the offset.
+        """
+        index = bisect_right(self._starts, offset) - 1
+        while index >= 0:
+            if offset < self._ends[index]:
+                return self._starts[index], self._ends[index], self._values[index]
+            index = self._parents[index]
+        return None
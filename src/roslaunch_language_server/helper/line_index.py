@@ -0,0 +1,91 @@
+from bisect import bisect_right
+from typing import List
+
+from lsprotocol.types import Position
+
+
+def utf16_to_index(line: str, character: int) -> int:
+    """
+    Convert a column in UTF-16 code units to an index into the line.
+
+    :param line: The text of the line.
+    :param character: The column in UTF-16 code units.
+    :return: The index of the column in the line.
+    """
+    if line.isascii():
+        return min(character, len(line))
+    units = 0
+    for index, char in enumerate(line):
+        if units >= character:
+            return index
+        units += 2 if ord(char) > 0xFFFF else 1
+    return len(line)
+
+
+def utf16_length(text: str) -> int:
+    """
+    Return the length of a text in UTF-16 code units.
+
+    :param text: The text.
+    :return: The number of UTF-16 code units.
+    """
+    if text.isascii():
+        return len(text)
+    return len(text) + sum(1 for char in text if ord(char) > 0xFFFF)
+
+
+class LineIndex:
+    """
+    Offsets of the start of every line of a text, for converting between LSP
+    positions and offsets in O(log n) without scanning the preceding lines.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.line_starts: List[int] = [0]
+        start = text.find("\n")
+        while start >= 0:
+            self.line_starts.append(start + 1)
+            start = text.find("\n", start + 1)
+
+    def line_text(self, line: int) -> str:
+        """
+        Return the text of a line without its line break.
+
+        :param line: The line number.
+        :return: The text of the line.
+        """
+        start = self.line_starts[line]
+        end = (
+            self.line_starts[line + 1] - 1
+            if line + 1 < len(self.line_starts)
+            else len(self.text)
+        )
+        return self.text[start:end]
+
+    def offset_at_position(self, position: Position) -> int:
+        """
+        Return the offset of an LSP position, clamped to the text.
+
+        :param position: The position, with the column in UTF-16 code units.
+        :return: The offset in the text.
+        """
+        if position.line >= len(self.line_starts):
+            return len(self.text)
+        return self.line_starts[position.line] + utf16_to_index(
+            self.line_text(position.line), position.character
+        )
+
+    def position_at_offset(self, offset: int) -> Position:
+        """
+        Return the LSP position of an offset.
+
+        :param offset: The offset in the text.
+        :return: The position, with the column in UTF-16 code units.
+        """
+        offset = max(0, min(offset, len(self.text)))
+        line = bisect_right(self.line_starts, offset) - 1
+        return Position(
+            line=line,
+            character=utf16_length(self.text[self.line_starts[line] : offset]),
+        )
@@ -0,0 +1,73 @@
+import os
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from roslaunch_analyzer.cache import cache_manager
+from roslaunch_analyzer.utils import resolve_symlink
+from roslaunch_language_server.utils import find_package_share_directory
+
+
+class PackagePathCache:
+    """
+    Cache of paths inside package share directories, as written in
+    $(find-pkg-share pkg)/path.
+
+    A resolved path is trusted for revalidate_interval seconds, after which
+    its existence is checked again, so files created or removed while the
+    server runs are picked up.
+
+    :param revalidate_interval: Seconds during which a resolution is used
+        without touching the file system.
+    :param max_paths: The number of resolutions kept in the "package_path"
+        cache region (least recently used resolutions are evicted first).
+    """
+
+    def __init__(self, revalidate_interval: float = 5.0, max_paths: int = 4096):
+        self.revalidate_interval = revalidate_interval
+        self._paths = cache_manager.region("package_path", max_entries=max_paths)
+        self._stats = self._paths.stats
+
+    @staticmethod
+    def _resolve(package_name: str, relative_path: str) -> Optional[str]:
+        share_dir = find_package_share_directory(package_name)
+        if share_dir is None:
+            return None
+        path = resolve_symlink(os.path.join(share_dir, relative_path.lstrip("/")))
+        if not os.path.exists(path):
+            return None
+        return path
+
+    def resolve(self, package_name: str, relative_path: str) -> Optional[str]:
+        """
+        Resolve a path relative to the share directory of a package.
+
+        :param package_name: The name of the package.
+        :param relative_path: The path relative to the share directory.
+        :return: The resolved path, or None if the package or path does not exist.
+        """
+        key = (package_name, relative_path)
+        now = time.monotonic()
+        cached = self._paths.get(key)
+        if cached is not None and now - cached[0] < self.revalidate_interval:
+            self._stats.hit()
+            return cached[1]
+
+        self._stats.miss()
+        path = self._resolve(package_name, relative_path)
+        size = 200 + len(package_name) + len(relative_path) + len(path or "")
+        self._paths.put(key, (now, path), size)
+        return path
+
+    def resolve_many(
+        self, paths: Iterable[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], Optional[str]]:
+        """
+        Resolve several paths, each distinct path only once.
+
+        :param paths: The (package name, relative path) pairs.
+        :return: The resolved paths keyed by their pair.
+        """
+        return {key: self.resolve(*key) for key in dict.fromkeys(paths)}
+
+
+package_paths = PackagePathCache()
@@ -0,0 +1,111 @@
+import re
+from dataclasses import dataclass
+from typing import Iterator, Tuple
+
+from roslaunch_language_server.helper.syntax import SyntaxTree, XmlAttribute, XmlElement
+
+_name = re.compile(r"[a-zA-Z0-9_-]*")
+_whitespace = re.compile(r"\s*")
+_path = re.compile(r"[^\s$;,]*")
+
+
+@dataclass(frozen=True)
+class Substitution:
+    """
+    A $(...) substitution in an attribute value.
+
+    :param name: The name of the substitution, e.g. "find-pkg-share".
+    :param argument: The argument text with surrounding whitespace removed.
+    :param start: The offset of "$(".
+    :param end: The offset just after the closing ")", or the end of the
+        scanned value if the substitution is not closed.
+    :param name_start: The offset of the name.
+    :param argument_start: The offset of the argument.
+    :param closed: Whether the substitution has a closing ")".
+    """
+
+    name: str
+    argument: str
+    start: int
+    end: int
+    name_start: int
+    argument_start: int
+    closed: bool
+
+    @property
+    def name_end(self) -> int:
+        return self.name_start + len(self.name)
+
+    @property
+    def argument_end(self) -> int:
+        return self.argument_start + len(self.argument)
+
+
+def iter_substitutions(value: str, offset: int = 0) -> Iterator[Substitution]:
+    """
+    Yield the substitutions in a value, including nested ones, in the order
+    of their "$(".
+
+    :param value: The text to scan, typically an attribute value.
+    :param offset: The offset of the value in the document.
+    """
+    start = value.find("$(")
+    while start >= 0:
+        name_start = start + 2
+        name = _name.match(value, name_start).group()
+        argument_start = _whitespace.match(value, name_start + len(name)).end()
+
+        depth = 1
+        end = argument_start
+        while end < len(value) and depth:
+            if value.startswith("$(", end):
+                depth += 1
+                end += 2
+                continue
+            if value[end] == ")":
+                depth -= 1
+            end += 1
+        closed = depth == 0
+        argument = value[argument_start : end - 1 if closed else end].rstrip()
+
+        yield Substitution(
+            name=name,
+            argument=argument,
+            start=offset + start,
+            end=offset + end,
+            name_start=offset + name_start,
+            argument_start=offset + argument_start,
+            closed=closed,
+        )
+        start = value.find("$(", name_start)
+
+
+def path_suffix(value: str, offset: int, substitution: Substitution) -> Tuple[str, int]:
+    """
+    Return the path following a substitution, as in $(find-pkg-share pkg)/path.
+
+    :param value: The attribute value containing the substitution.
+    :param offset: The offset of the value in the document.
+    :param substitution: The substitution.
+    :return: The path suffix (possibly empty) and its end offset.
+    """
+    match = _path.match(value, substitution.end - offset)
+    return match.group(), offset + match.end()
+
+
+def iter_attribute_substitutions(
+    syntax: SyntaxTree,
+) -> Iterator[Tuple[XmlElement, XmlAttribute, Substitution]]:
+    """
+    Yield the substitutions in all attribute values of a document.
+
+    :param syntax: The syntax tree of the document.
+    """
+    for element in syntax.root.iter():
+        for attribute in element.attributes.values():
+            if "$(" not in attribute.value:
+                continue
+            for substitution in iter_substitutions(
+                attribute.value, attribute.value_start
+            ):
+                yield element, attribute, substitution
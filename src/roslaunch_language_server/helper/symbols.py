@@ -0,0 +1,82 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from roslaunch_language_server.helper.syntax import SyntaxTree
+
+DECLARATION_TAGS: Tuple[str, ...] = ("arg", "let")
+
+
+@dataclass(frozen=True)
+class Declaration:
+    """
+    A launch configuration declared by an <arg> or <let> element.
+
+    :param name: The declared name.
+    :param tag: The tag of the declaring element.
+    :param name_start: The offset of the name in the name attribute.
+    :param name_end: The offset just after the name.
+    :param scope_start: The offset from which the declaration is visible,
+        i.e. the end of the declaring element.
+    :param scope_end: The offset up to which the declaration is visible,
+        i.e. the end of the enclosing element.
+    """
+
+    name: str
+    tag: str
+    name_start: int
+    name_end: int
+    scope_start: int
+    scope_end: int
+
+    def is_visible_at(self, offset: int) -> bool:
+        return self.scope_start <= offset < self.scope_end
+
+
+class SymbolTable:
+    """
+    Declarations of a document indexed by name, with their scope ranges.
+
+    :param syntax: The syntax tree of the document.
+    """
+
+    def __init__(self, syntax: SyntaxTree):
+        self.declarations: List[Declaration] = []
+        self.by_name: Dict[str, List[Declaration]] = {}
+
+        elements = sorted(
+            (
+                element
+                for tag in DECLARATION_TAGS
+                for element in syntax.elements_by_tag.get(tag, [])
+            ),
+            key=lambda element: element.start,
+        )
+        for element in elements:
+            attribute = element.attribute("name")
+            if attribute is None:
+                continue
+            declaration = Declaration(
+                name=attribute.value,
+                tag=element.tag,
+                name_start=attribute.value_start,
+                name_end=attribute.value_end,
+                scope_start=element.end,
+                scope_end=element.parent.end,
+            )
+            self.declarations.append(declaration)
+            self.by_name.setdefault(declaration.name, []).append(declaration)
+
+    def visible_at(self, offset: int, name: Optional[str] = None) -> List[Declaration]:
+        """
+        Return the declarations visible at the offset.
+
+        :param offset: The offset in the document.
+        :param name: If given, only declarations of this name are returned.
+        :return: The visible declarations in document order.
+        """
+        candidates = self.declarations if name is None else self.by_name.get(name, [])
+        return [
+            declaration
+            for declaration in candidates
+            if declaration.is_visible_at(offset)
+        ]
@@ -0,0 +1,342 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterator, List, Optional, Tuple
+
+_markup = re.compile(
+    r"<!--.*?(?:-->|\Z)"
+    r"|<!\[CDATA\[.*?(?:\]\]>|\Z)"
+    r"|<\?.*?(?:\?>|\Z)"
+    r"|<![^<>]*>?"
+    r"|</\s*(?P<end>[^\s<>]*)\s*>?"
+    r"|<(?P<start>[a-zA-Z_][\w.:-]*)(?P<attrs>(?:[^<>\"']|\"[^\"<]*\"|'[^'<]*')*)(?P<close>>)?"
+    r"|<",
+    re.DOTALL,
+)
+
+_attribute = re.compile(
+    r"(?P<name>[^\s=/<>\"']+)\s*=\s*(?:\"(?P<dq>[^\"<]*)\"|'(?P<sq>[^'<]*)')"
+)
+
+
+class XmlAttribute:
+    """
+    An attribute of a start tag.
+
+    :param name: The attribute name.
+    :param value: The attribute value without quotes.
+    :param name_start: The offset of the attribute name.
+    :param value_start: The offset of the attribute value (after the quote).
+    """
+
+    __slots__ = ("name", "value", "name_start", "value_start")
+
+    def __init__(self, name: str, value: str, name_start: int, value_start: int):
+        self.name = name
+        self.value = value
+        self.name_start = name_start
+        self.value_start = value_start
+
+    @property
+    def value_end(self) -> int:
+        return self.value_start + len(self.value)
+
+
+class _Token:
+    """
+    A markup token. Attribute spans are relative to the token start so that
+    tokens behind an edit can be shifted by updating start and end only.
+    """
+
+    __slots__ = ("start", "end", "tag", "is_end_tag", "closed", "empty", "attrs")
+
+    @property
+    def signature(self) -> Tuple[Optional[str], bool, bool]:
+        """The part of the token that determines the shape of the tree."""
+        return self.tag, self.is_end_tag, self.empty
+
+    def __init__(self, start, end, tag, is_end_tag, closed, empty, attrs):
+        self.start: int = start
+        self.end: int = end
+        self.tag: Optional[str] = tag
+        self.is_end_tag: bool = is_end_tag
+        self.closed: bool = closed
+        self.empty: bool = empty
+        self.attrs: List[Tuple[str, str, int, int]] = attrs
+
+
+def _scan(text: str, pos: int) -> Iterator[_Token]:
+    """
+    Tokenize the markup of a text from a position on.
+
+    Comments, processing instructions, declarations and stray '<' are
+    returned as tokens without a tag. A start tag without '>' extends to the
+    next '<' and is treated as empty.
+    """
+    while True:
+        pos = text.find("<", pos)
+        if pos < 0:
+            return
+        match = _markup.match(text, pos)
+        end = match.end()
+        if match.group("start") is not None:
+            attrs_text = match.group("attrs")
+            attrs_start = match.start("attrs") - pos
+            attrs = []
+            for attr in _attribute.finditer(attrs_text):
+                is_double = attr.group("dq") is not None
+                attrs.append(
+                    (
+                        attr.group("name"),
+                        attr.group("dq") if is_double else attr.group("sq"),
+                        attrs_start + attr.start("name"),
+                        attrs_start + attr.start("dq" if is_double else "sq"),
+                    )
+                )
+            closed = match.group("close") is not None
+            if not closed:
+                next_markup = text.find("<", end)
+                end = len(text) if next_markup < 0 else next_markup
+            yield _Token(
+                pos,
+                end,
+                match.group("start"),
+                False,
+                closed,
+                not closed or attrs_text.rstrip().endswith("/"),
+                attrs,
+            )
+        elif match.group("end") is not None:
+            yield _Token(pos, end, match.group("end"), True, True, False, [])
+        else:
+            yield _Token(pos, end, None, False, True, False, [])
+        pos = max(end, pos + 1)
+
+
+class XmlElement:
+    """
+    An element of the tolerant syntax tree.
+
+    Offsets are read from the tokens of the element, so elements stay valid
+    when the tokens are shifted or updated in place by an edit.
+    """
+
+    __slots__ = (
+        "tag",
+        "parent",
+        "children",
+        "_start_token",
+        "_end_token",
+        "_end_at_token_start",
+        "_document_end",
+    )
+
+    def __init__(
+        self,
+        start_token: _Token,
+        parent: Optional["XmlElement"],
+        document_end: List[int],
+    ):
+        self.tag: str = start_token.tag
+        self.parent = parent
+        self.children: List[XmlElement] = []
+        self._start_token = start_token
+        self._end_token: Optional[_Token] = None
+        self._end_at_token_start = False
+        self._document_end = document_end
+
+    @property
+    def start(self) -> int:
+        """The offset of the '<' of the start tag."""
+        return self._start_token.start
+
+    @property
+    def start_tag_end(self) -> int:
+        """The offset just after the start tag."""
+        return self._start_token.end
+
+    @property
+    def end(self) -> int:
+        """
+        The offset just after the end tag, or where the element is implicitly
+        closed if it has no end tag.
+        """
+        if self._start_token.empty:
+            return self._start_token.end
+        if self._end_token is None:
+            return self._document_end[0]
+        if self._end_at_token_start:
+            return self._end_token.start
+        return self._end_token.end
+
+    @property
+    def attributes(self) -> Dict[str, XmlAttribute]:
+        start = self._start_token.start
+        return {
+            name: XmlAttribute(name, value, start + name_start, start + value_start)
+            for name, value, name_start, value_start in self._start_token.attrs
+        }
+
+    def attribute(self, name: str) -> Optional[XmlAttribute]:
+        start = self._start_token.start
+        for attr_name, value, name_start, value_start in self._start_token.attrs:
+            if attr_name == name:
+                return XmlAttribute(
+                    name, value, start + name_start, start + value_start
+                )
+        return None
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        for attr_name, value, _, _ in self._start_token.attrs:
+            if attr_name == name:
+                return value
+        return default
+
+    def ancestors(self) -> Iterator["XmlElement"]:
+        """Yield the parent, grandparent and so on of the element."""
+        element = self.parent
+        while element is not None:
+            yield element
+            element = element.parent
+
+    def iter(self) -> Iterator["XmlElement"]:
+        """Yield the element and all its descendants in document order."""
+        stack = [self]
+        while stack:
+            element = stack.pop()
+            yield element
+            stack.extend(reversed(element.children))
+
+
+class SyntaxTree:
+    """
+    Tolerant, error-recovering XML syntax tree of a document.
+
+    Unclosed elements end where their parent ends, end tags without a
+    matching start tag are ignored, and half-typed start tags end at the next
+    '<'. The markup tokens are kept so that edits only re-tokenize the region
+    around the edit, and the tree is only rebuilt when the edit changes its
+    shape (e.g. not while typing inside an attribute value).
+
+    The children of every element are sorted by offset and disjoint, so the
+    tree itself serves as the offset-to-element interval index.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self._document_end = [len(text)]
+        self._tokens: List[_Token] = list(_scan(text, 0))
+        self._build()
+
+    def apply_edit(self, start: int, end: int, new_text: str):
+        """
+        Replace text[start:end] with new_text and update the tree.
+
+        Tokens before the edit are kept, tokens after it are shifted, and
+        only the region in between is re-tokenized.
+
+        :param start: The start offset of the replaced range.
+        :param end: The end offset of the replaced range.
+        :param new_text: The replacement text.
+        """
+        tokens = self._tokens
+        delta = len(new_text) - (end - start)
+        self.text = self.text[:start] + new_text + self.text[end:]
+        self._document_end[0] = len(self.text)
+
+        # The first token that may be affected is the first one reaching the
+        # edit, since a token may extend up to the next '<'.
+        first = bisect_left(tokens, start, key=lambda token: token.end)
+        scan_from = min(start, tokens[first].start) if first < len(tokens) else start
+
+        # Re-tokenize until a token lines up with an old token behind the
+        # edit; from there on the text and hence the tokens are the same.
+        region: List[_Token] = []
+        resume = len(tokens)
+        for token in _scan(self.text, scan_from):
+            if token.start >= end + delta:
+                index = bisect_left(
+                    tokens, token.start - delta, lo=first, key=lambda t: t.start
+                )
+                if index < len(tokens) and tokens[index].start == token.start - delta:
+                    resume = index
+                    break
+            region.append(token)
+
+        for token in tokens[resume:]:
+            token.start += delta
+            token.end += delta
+
+        replaced = tokens[first:resume]
+        if [token.signature for token in replaced] == [
+            token.signature for token in region
+        ]:
+            for old, new in zip(replaced, region):
+                old.start, old.end = new.start, new.end
+                old.closed, old.attrs = new.closed, new.attrs
+        else:
+            self._tokens = tokens[:first] + region + tokens[resume:]
+            self._build()
+
+    def _build(self):
+        root = XmlElement(
+            _Token(0, 0, "", False, True, False, []), None, self._document_end
+        )
+        stack = [root]
+        elements_by_tag: Dict[str, List[XmlElement]] = {}
+
+        for token in self._tokens:
+            if token.tag is None:
+                continue
+            if token.is_end_tag:
+                for depth in range(len(stack) - 1, 0, -1):
+                    if stack[depth].tag == token.tag:
+                        break
+                else:
+                    continue
+                while len(stack) > depth:
+                    element = stack.pop()
+                    element._end_token = token
+                    element._end_at_token_start = len(stack) > depth
+                continue
+
+            element = XmlElement(token, stack[-1], self._document_end)
+            stack[-1].children.append(element)
+            elements_by_tag.setdefault(element.tag, []).append(element)
+            if not token.empty:
+                stack.append(element)
+
+        self.root = root
+        self.elements_by_tag = elements_by_tag
+
+    def element_by_indices(self, indices: Tuple[int, ...]) -> Optional[XmlElement]:
+        """
+        Return an element by its indices among the children of its ancestors,
+        starting below the document element, as recorded by the tree builder.
+
+        :param indices: The indices; () for the document element.
+        :return: The element, or None if the tree has no such element.
+        """
+        if not self.root.children:
+            return None
+        element = self.root.children[0]
+        for index in indices:
+            if index >= len(element.children):
+                return None
+            element = element.children[index]
+        return element
+
+    def element_at(self, offset: int) -> Optional[XmlElement]:
+        """
+        Return the innermost element containing the offset.
+
+        :param offset: The offset in the document.
+        :return: The element, or None if the offset is outside all elements.
+        """
+        element = self.root
+        while True:
+            children = element.children
+            index = bisect_right(children, offset, key=lambda child: child.start) - 1
+            if index < 0 or children[index].end <= offset:
+                break
+            element = children[index]
+        return element if element is not self.root else None
@@ -34,6 +34,16 @@ def modify_json(json_data: dict):
             for loaded_node in json_data["loaded_nodes"]
         ]
 
+    elif json_data["type"] == "Error":
+        return [
+            {
+                "title": f'{json_data["action"]} ({json_data["error"]})',
+                "path": json_data["included_path"] or json_data["path"] or "",
+                "type": json_data["type"],
+                "children": [],
+            }
+        ]
+
     elif json_data["type"] in [
         "GroupAction",
         "ComposableNodeContainer",
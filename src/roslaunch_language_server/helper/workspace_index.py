@@ -0,0 +1,531 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from lsprotocol.types import Location, Position, Range
+from pygls.uris import from_fs_path
+
+from roslaunch_analyzer.cache import register_cache_stats
+from roslaunch_analyzer.include_graph import (
+    STATIC,
+    IncludeGraph,
+    canonical_path,
+    is_launch_file,
+    iter_launch_files,
+    resolve_include_file,
+)
+from roslaunch_language_server.helper.line_index import LineIndex
+from roslaunch_language_server.helper.package_paths import package_paths
+from roslaunch_language_server.helper.substitutions import iter_attribute_substitutions
+from roslaunch_language_server.helper.syntax import SyntaxTree, XmlElement
+from roslaunch_language_server.progress import BackgroundProgress
+from roslaunch_language_server.server import logger
+from roslaunch_language_server.snapshot import startup_snapshot
+from roslaunch_language_server.utils import ros_package_prefixes
+
+
+@dataclass(frozen=True)
+class IndexedSymbol:
+    """
+    A named range in a launch file.
+
+    :param name: The name, e.g. of the launch argument.
+    :param range: The range of the name.
+    """
+
+    name: str
+    range: Range
+
+
+@dataclass
+class IncludeEdge:
+    """
+    An <include> of another launch file.
+
+    :param target: The resolved path of the included file, if it could be
+        resolved without building the launch file.
+    :param range: The range of the file attribute value.
+    :param arguments: The <arg> elements passed to the included file.
+    """
+
+    target: Optional[str]
+    range: Range
+    arguments: List[IndexedSymbol] = field(default_factory=list)
+
+
+@dataclass
+class LaunchFileSummary:
+    """
+    Declarations, includes and references of a launch file.
+
+    :param path: The canonical path of the file.
+    :param declarations: The launch arguments declared by the file.
+    :param includes: The includes of other launch files.
+    :param references: The $(var ...) references.
+    """
+
+    path: str
+    declarations: List[IndexedSymbol] = field(default_factory=list)
+    includes: List[IncludeEdge] = field(default_factory=list)
+    references: List[IndexedSymbol] = field(default_factory=list)
+
+
+def _range_to_json(range: Range) -> List[int]:
+    return [
+        range.start.line,
+        range.start.character,
+        range.end.line,
+        range.end.character,
+    ]
+
+
+def _range_from_json(data: List[int]) -> Range:
+    return Range(start=Position(data[0], data[1]), end=Position(data[2], data[3]))
+
+
+def summary_to_json(summary: LaunchFileSummary) -> Dict[str, Any]:
+    """
+    Convert a summary to the JSON representation stored in the startup snapshot.
+
+    :param summary: The summary.
+    """
+    return {
+        "declarations": [
+            [symbol.name, _range_to_json(symbol.range)]
+            for symbol in summary.declarations
+        ],
+        "includes": [
+            [
+                edge.target,
+                _range_to_json(edge.range),
+                [
+                    [argument.name, _range_to_json(argument.range)]
+                    for argument in edge.arguments
+                ],
+            ]
+            for edge in summary.includes
+        ],
+        "references": [
+            [symbol.name, _range_to_json(symbol.range)] for symbol in summary.references
+        ],
+    }
+
+
+def summary_from_json(path: str, data: Dict[str, Any]) -> LaunchFileSummary:
+    """
+    Convert the JSON representation of summary_to_json back to a summary.
+
+    :param path: The canonical path of the file.
+    :param data: The JSON representation.
+    """
+    return LaunchFileSummary(
+        path=path,
+        declarations=[
+            IndexedSymbol(name, _range_from_json(range))
+            for name, range in data["declarations"]
+        ],
+        includes=[
+            IncludeEdge(
+                target=target,
+                range=_range_from_json(range),
+                arguments=[
+                    IndexedSymbol(name, _range_from_json(argument_range))
+                    for name, argument_range in arguments
+                ],
+            )
+            for target, range, arguments in data["includes"]
+        ],
+        references=[
+            IndexedSymbol(name, _range_from_json(range))
+            for name, range in data["references"]
+        ],
+    )
+
+
+def resolve_include_target(path: str, value: str) -> Optional[str]:
+    """
+    Resolve the file attribute of an <include> without building the launch
+    file, with package paths from the package path cache.
+
+    :param path: The path of the including file.
+    :param value: The value of the file attribute.
+    :return: The canonical path of the included file, or None.
+    """
+    return resolve_include_file(path, value, package_paths.resolve)
+
+
+def summarize_launch_file(path: str, source: str) -> LaunchFileSummary:
+    """
+    Extract the declarations, includes and references of a launch file.
+
+    :param path: The canonical path of the file.
+    :param source: The text of the file.
+    :return: The summary.
+    """
+    line_index = LineIndex(source)
+    syntax = SyntaxTree(source)
+    summary = LaunchFileSummary(path=path)
+
+    def symbol(element: XmlElement, name: str) -> Optional[IndexedSymbol]:
+        attribute = element.attribute(name)
+        if attribute is None or not attribute.value:
+            return None
+        return IndexedSymbol(
+            name=attribute.value,
+            range=Range(
+                start=line_index.position_at_offset(attribute.value_start),
+                end=line_index.position_at_offset(attribute.value_end),
+            ),
+        )
+
+    for element in syntax.elements_by_tag.get("arg", []):
+        if element.parent is not None and element.parent.tag == "include":
+            continue
+        declaration = symbol(element, "name")
+        if declaration is not None:
+            summary.declarations.append(declaration)
+
+    for element in syntax.elements_by_tag.get("include", []):
+        file = symbol(element, "file")
+        if file is None:
+            continue
+        edge = IncludeEdge(
+            target=resolve_include_target(path, file.name), range=file.range
+        )
+        for child in element.children:
+            if child.tag == "arg":
+                argument = symbol(child, "name")
+                if argument is not None:
+                    edge.arguments.append(argument)
+        summary.includes.append(edge)
+
+    for _, _, substitution in iter_attribute_substitutions(syntax):
+        argument = substitution.argument
+        if substitution.name != "var" or not argument or "$(" in argument:
+            continue
+        summary.references.append(
+            IndexedSymbol(
+                name=argument,
+                range=Range(
+                    start=line_index.position_at_offset(substitution.argument_start),
+                    end=line_index.position_at_offset(substitution.argument_end),
+                ),
+            )
+        )
+
+    return summary
+
+
+class WorkspaceIndex:
+    """
+    In-memory index of the launch files of the workspace and the ament share
+    directories.
+
+    Files are summarized in a background thread and re-summarized one by one
+    on file events. Lookups only read dictionaries keyed by name or path, so
+    they do not depend on the size of the workspace.
+
+    The summaries of files read from disk are persisted in the startup
+    snapshot together with their modification times. On startup they are
+    loaded first, and only files modified since are summarized again.
+    """
+
+    def __init__(self):
+        self.files: Dict[str, LaunchFileSummary] = {}
+        # Modification times of the files read from disk. Files indexed from
+        # the text of an open document have no entry.
+        self._mtimes: Dict[str, float] = {}
+        self._declarations: Dict[str, Dict[str, List[IndexedSymbol]]] = {}
+        self._references: Dict[str, Dict[str, List[IndexedSymbol]]] = {}
+        self._includers: Dict[str, Dict[str, List[IncludeEdge]]] = {}
+        self._lock = threading.Lock()
+        self._folders: List[str] = []
+        self._started = False
+        self._stats = register_cache_stats("workspace_index")
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="workspace-index"
+        )
+
+    def _remove(self, path: str):
+        summary = self.files.pop(path, None)
+        self._mtimes.pop(path, None)
+        if summary is None:
+            return
+        for table, symbols in (
+            (self._declarations, summary.declarations),
+            (self._references, summary.references),
+        ):
+            for symbol in symbols:
+                by_path = table.get(symbol.name)
+                if by_path is not None:
+                    by_path.pop(path, None)
+                    if not by_path:
+                        del table[symbol.name]
+        include_graph.remove(path, STATIC)
+        for edge in summary.includes:
+            by_path = self._includers.get(edge.target)
+            if by_path is not None:
+                by_path.pop(path, None)
+                if not by_path:
+                    del self._includers[edge.target]
+
+    def _add(self, summary: LaunchFileSummary, mtime: Optional[float] = None):
+        path = summary.path
+        self.files[path] = summary
+        if mtime is not None:
+            self._mtimes[path] = mtime
+        for table, symbols in (
+            (self._declarations, summary.declarations),
+            (self._references, summary.references),
+        ):
+            for symbol in symbols:
+                table.setdefault(symbol.name, {}).setdefault(path, []).append(symbol)
+        include_graph.set_includes(
+            path,
+            [edge.target for edge in summary.includes if edge.target is not None],
+            STATIC,
+        )
+        for edge in summary.includes:
+            if edge.target is not None:
+                self._includers.setdefault(edge.target, {}).setdefault(path, []).append(
+                    edge
+                )
+
+    def update(self, path: str, source: Optional[str] = None):
+        """
+        (Re-)index a launch file.
+
+        :param path: The path of the file.
+        :param source: The text of the file, read from disk if not given.
+        """
+        path = canonical_path(path)
+        mtime = None
+        if source is None:
+            try:
+                mtime = os.stat(path).st_mtime
+                with open(path) as f:
+                    source = f.read()
+            except (OSError, UnicodeDecodeError):
+                self.remove(path)
+                return
+        summary = summarize_launch_file(path, source)
+        with self._lock:
+            self._remove(path)
+            self._add(summary, mtime)
+
+    def ensure(self, path: str):
+        """
+        Index a launch file now if it is not indexed yet.
+
+        :param path: The path of the file.
+        """
+        with self._lock:
+            indexed = canonical_path(path) in self.files
+        if not indexed:
+            self.update(path)
+
+    def remove(self, path: str):
+        """
+        Remove a launch file from the index.
+
+        :param path: The path of the file.
+        """
+        with self._lock:
+            self._remove(canonical_path(path))
+
+    def _load_snapshot(self) -> int:
+        count = 0
+        with self._lock:
+            for path, data in startup_snapshot.launch_files.items():
+                if path in self.files:
+                    continue
+                try:
+                    summary = summary_from_json(path, data["summary"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                self._add(summary, data["mtime"])
+                count += 1
+        return count
+
+    def _save_snapshot(self):
+        with self._lock:
+            startup_snapshot.launch_files = {
+                path: {"mtime": mtime, "summary": summary_to_json(self.files[path])}
+                for path, mtime in self._mtimes.items()
+            }
+        try:
+            startup_snapshot.save()
+        except OSError:
+            logger.exception("Failed to save the startup snapshot")
+
+    def _warm_up(self, workspace_folders: List[str], progress: BackgroundProgress):
+        progress.begin()
+        try:
+            startup_snapshot.load()
+            loaded = self._load_snapshot()
+            logger.info("Loaded %d launch files from the startup snapshot", loaded)
+            progress.report("Reading packages", 0, 1)
+            packages_changed = startup_snapshot.refresh_packages()
+            share_directories = [
+                os.path.join(prefix, "share", package, "launch")
+                for package, prefix in ros_package_prefixes().items()
+            ]
+            paths = [
+                canonical_path(path)
+                for directory in [
+                    *workspace_folders,
+                    *filter(os.path.isdir, share_directories),
+                ]
+                for path in iter_launch_files(directory)
+            ]
+            updated = 0
+            for done, path in enumerate(paths):
+                progress.report(os.path.basename(path), done, len(paths))
+                if not packages_changed:
+                    try:
+                        mtime = os.stat(path).st_mtime
+                    except OSError:
+                        mtime = None
+                    with self._lock:
+                        if mtime is not None and self._mtimes.get(path) == mtime:
+                            continue
+                try:
+                    self.update(path)
+                except Exception:
+                    logger.exception("Failed to index %s", path)
+                updated += 1
+            # Files of the snapshot that no longer exist. Open documents are
+            # not in _mtimes and are kept.
+            with self._lock:
+                for path in set(self._mtimes).difference(paths):
+                    self._remove(path)
+            logger.info(
+                "Indexed %d launch files, %d of them changed since the last run",
+                len(paths),
+                updated,
+            )
+            self._save_snapshot()
+        except Exception:
+            logger.exception("Failed to index the launch files")
+        finally:
+            progress.end()
+
+    def start(self, workspace_folders: Iterable[str], progress: BackgroundProgress):
+        """
+        Index the launch files of the workspace folders and of the share
+        directories of all packages in the background.
+
+        The summaries of the startup snapshot are available first, then the
+        packages and files are revalidated and the snapshot is saved again.
+        With a shared backend, every session starts the index with its
+        folders; nothing is done if all of them are indexed already.
+
+        :param workspace_folders: The paths of the workspace folders.
+        :param progress: The progress reported to the client.
+        """
+        new_folders = [
+            folder for folder in workspace_folders if folder not in self._folders
+        ]
+        if self._started and not new_folders:
+            return
+        self._started = True
+        self._folders.extend(new_folders)
+        self._executor.submit(self._warm_up, list(self._folders), progress)
+
+    def submit(self, path: str, deleted: bool = False):
+        """
+        Re-index a launch file in the background after a file event.
+
+        :param path: The path of the file.
+        :param deleted: Whether the file was deleted.
+        """
+        if not is_launch_file(path):
+            return
+        self._executor.submit(self.remove if deleted else self.update, path)
+
+    def declarations(self, path: str, name: str) -> List[Location]:
+        """
+        Return the declarations of a launch argument in a file.
+
+        :param path: The path of the file.
+        :param name: The name of the launch argument.
+        """
+        path = canonical_path(path)
+        with self._lock:
+            symbols = self._declarations.get(name, {}).get(path, [])
+            return [
+                Location(uri=from_fs_path(path), range=symbol.range)
+                for symbol in symbols
+            ]
+
+    def references(self, path: str, name: str) -> List[Location]:
+        """
+        Return the $(var ...) references of a launch argument in a file.
+
+        :param path: The path of the file.
+        :param name: The name of the launch argument.
+        """
+        path = canonical_path(path)
+        with self._lock:
+            return [
+                Location(uri=from_fs_path(path), range=symbol.range)
+                for symbol in self._references.get(name, {}).get(path, [])
+            ]
+
+    def include_arguments(self, path: str, name: str) -> List[Location]:
+        """
+        Return the <arg> elements passing a launch argument to a file in the
+        includes of the file.
+
+        :param path: The path of the included file.
+        :param name: The name of the launch argument.
+        """
+        path = canonical_path(path)
+        with self._lock:
+            includers = self._includers.get(path)
+            if includers is None:
+                self._stats.miss()
+                return []
+            self._stats.hit()
+            return [
+                Location(uri=from_fs_path(includer), range=argument.range)
+                for includer, edges in includers.items()
+                for edge in edges
+                for argument in edge.arguments
+                if argument.name == name
+            ]
+
+    def symbols(self, query: str, limit: int = 200) -> List[Tuple[str, str, Location]]:
+        """
+        Return the launch arguments whose name contains the query.
+
+        :param query: The case-insensitive query.
+        :param limit: The maximum number of symbols returned.
+        :return: The (name, path, location) triples.
+        """
+        query = query.lower()
+        found = []
+        with self._lock:
+            for name, by_path in self._declarations.items():
+                if query not in name.lower():
+                    continue
+                for path, symbols in by_path.items():
+                    for symbol in symbols:
+                        found.append(
+                            (
+                                name,
+                                path,
+                                Location(uri=from_fs_path(path), range=symbol.range),
+                            )
+                        )
+                        if len(found) >= limit:
+                            return found
+        return found
+
+
+# Include edges between launch files, from the workspace index and from builds.
+include_graph = IncludeGraph()
+
+workspace_index = WorkspaceIndex()
@@ -0,0 +1,531 @@
+import asyncio
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import typer
+
+from roslaunch_language_server.recorder import MessageBuffer, encode_message
+from roslaunch_language_server.stats import LatencyHistogram
+
+cli = typer.Typer()
+
+REQUEST_KINDS = ("completion", "definition", "parse", "edit")
+
+_mix_entry = re.compile(r"^\s*(\w+)\s*=\s*([0-9.]+)\s*$")
+
+
+@dataclass
+class SyntheticDocument:
+    """
+    A generated launch file and the positions requests are made at.
+
+    :param path: The path of the file.
+    :param text: The text of the file.
+    :param completion_positions: The (line, character) positions inside
+        substitutions and attributes offering completions.
+    :param definition_positions: The (line, character) positions on launch
+        argument references and include paths.
+    """
+
+    path: str
+    text: str
+    completion_positions: List[Tuple[int, int]] = field(default_factory=list)
+    definition_positions: List[Tuple[int, int]] = field(default_factory=list)
+
+    @property
+    def uri(self) -> str:
+        return f"file://{self.path}"
+
+
+def generate_document(
+    directory: str, index: int, size: int, packages: List[str]
+) -> SyntheticDocument:
+    """
+    Generate a launch file with arguments, groups, nodes and includes.
+
+    :param directory: The directory to write the file to.
+    :param index: The number of the document, used in names.
+    :param size: The number of argument and node blocks.
+    :param packages: Package names used in pkg attributes and substitutions.
+    :return: The document, written to disk.
+    """
+    path = os.path.join(directory, f"synthetic_{index}.launch.xml")
+    lines = ["<launch>"]
+    document = SyntheticDocument(path=path, text="")
+
+    def mark(positions: List[Tuple[int, int]], line: str, marker: str):
+        positions.append((len(lines), line.index(marker) + len(marker)))
+
+    for block in range(size):
+        package = packages[block % len(packages)]
+        lines.append(f'  <arg name="arg_{block}" default="value_{block}"/>')
+        line = f'  <group if="$(var arg_{block})">'
+        mark(document.definition_positions, line, "$(var arg_")
+        lines.append(line)
+        line = (
+            f'    <node pkg="{package}" exec="node_{block}" '
+            f'name="$(var arg_{block})_node"/>'
+        )
+        mark(document.completion_positions, line, 'pkg="')
+        lines.append(line)
+        line = (
+            f'    <let name="path_{block}" '
+            f'value="$(find-pkg-share {package})/config/$(var arg_{block}).yaml"/>'
+        )
+        mark(document.completion_positions, line, "$(find-pkg-share ")
+        mark(document.completion_positions, line, "$(var ")
+        mark(document.definition_positions, line, "$(var arg_")
+        lines.append(line)
+        if block and block % 10 == 0:
+            included = f"synthetic_{index}_{block}.xml"
+            # Written too, so that parse requests build the included file.
+            with open(os.path.join(directory, included), "w") as f:
+                f.write(
+                    "<launch>\n"
+                    f'  <arg name="included_{block}" default="value_{block}"/>\n'
+                    f'  <node pkg="{package}" exec="node_{block}" '
+                    f'name="included_{block}_node"/>\n'
+                    "</launch>\n"
+                )
+            line = f'    <include file="$(dirname)/{included}"/>'
+            mark(document.definition_positions, line, "$(dirname)/")
+            lines.append(line)
+        lines.append("  </group>")
+    lines.append("</launch>")
+    # Edits toggle a space at the end of this comment.
+    lines.append("<!-- edited -->")
+    document.text = "\n".join(lines)
+    with open(path, "w") as f:
+        f.write(document.text)
+    return document
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """
+    Parse a request mix such as "completion=6,definition=3,parse=1".
+
+    :param mix: Comma separated kind=weight pairs.
+    :return: The weights keyed by request kind.
+    """
+    weights = {}
+    for entry in mix.split(","):
+        match = _mix_entry.match(entry)
+        if match is None or match.group(1) not in REQUEST_KINDS:
+            raise typer.BadParameter(
+                f"Invalid mix entry {entry!r}, expected one of "
+                f"{', '.join(REQUEST_KINDS)} with a weight"
+            )
+        weights[match.group(1)] = float(match.group(2))
+    return weights
+
+
+def read_rss(pid: int) -> Optional[int]:
+    """
+    Return the resident set size of a process in bytes (Linux only).
+
+    :param pid: The process ID.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def find_listening_pid(port: int) -> Optional[int]:
+    """
+    Find the process listening on a local TCP port (Linux only).
+
+    :param port: The port.
+    :return: The process ID, or None if it cannot be determined.
+    """
+    inodes = set()
+    for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(table) as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    # State 0A is LISTEN.
+                    if int(fields[1].rsplit(":", 1)[1], 16) == port and (
+                        fields[3] == "0A"
+                    ):
+                        inodes.add(fields[9])
+        except OSError:
+            continue
+    if not inodes:
+        return None
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            for fd in os.listdir(f"/proc/{pid}/fd"):
+                target = os.readlink(f"/proc/{pid}/fd/{fd}")
+                if target.startswith("socket:[") and target[8:-1] in inodes:
+                    return int(pid)
+        except OSError:
+            continue
+    return None
+
+
+class LoadStatistics:
+    """
+    Latencies and counts of the requests of all clients, per report interval
+    and in total.
+    """
+
+    def __init__(self):
+        self.total: Dict[str, LatencyHistogram] = {}
+        self.interval: Dict[str, LatencyHistogram] = {}
+        self.errors = 0
+        self.timeouts = 0
+
+    def record(self, kind: str, seconds: float):
+        for histograms in (self.total, self.interval):
+            histograms.setdefault(kind, LatencyHistogram()).record(seconds)
+
+    def take_interval(self) -> Dict[str, LatencyHistogram]:
+        interval, self.interval = self.interval, {}
+        return interval
+
+
+class LoadClient:
+    """
+    One simulated developer: a TCP connection with its own open documents,
+    sending requests at exponentially distributed intervals without waiting
+    for the responses.
+
+    :param documents: The documents opened by the client.
+    :param statistics: The statistics to record to.
+    :param rate: The requests per second of this client.
+    :param weights: The weights of the request kinds.
+    :param timeout: The time in seconds after which a request is counted as
+        timed out.
+    :param seed: The seed of the random choices.
+    """
+
+    def __init__(
+        self,
+        documents: List[SyntheticDocument],
+        statistics: LoadStatistics,
+        rate: float,
+        weights: Dict[str, float],
+        timeout: float,
+        seed: int,
+    ):
+        self.documents = documents
+        self.statistics = statistics
+        self.rate = rate
+        self.kinds = list(weights)
+        self.weights = list(weights.values())
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        self.versions = {document.uri: 1 for document in documents}
+        self._edited = {document.uri: False for document in documents}
+        self._next_id = 0
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    def _send(self, message: Dict[str, Any]):
+        self._writer.write(encode_message({"jsonrpc": "2.0", **message}))
+
+    def _notify(self, method: str, params: Any):
+        self._send({"method": method, "params": params})
+
+    def _request(self, method: str, params: Any) -> Tuple[asyncio.Future, float]:
+        # The latency is measured from the write of the request, not from
+        # when a task gets to await the response.
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._next_id] = future
+        started = time.perf_counter()
+        self._send({"id": self._next_id, "method": method, "params": params})
+        return future, started
+
+    async def _read(self, reader: asyncio.StreamReader):
+        buffer = MessageBuffer()
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            for body in buffer.feed(data):
+                message = json.loads(body)
+                if "method" in message:
+                    if "id" in message:
+                        self._send({"id": message["id"], "result": None})
+                    continue
+                future = self._pending.pop(message.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+        for future in self._pending.values():
+            future.cancel()
+
+    async def _timed(self, kind: str, future: asyncio.Future, started: float):
+        remaining = self.timeout - (time.perf_counter() - started)
+        try:
+            response = await asyncio.wait_for(future, max(remaining, 0))
+        except asyncio.TimeoutError:
+            self.statistics.timeouts += 1
+            return
+        except asyncio.CancelledError:
+            return
+        if "error" in response:
+            self.statistics.errors += 1
+        self.statistics.record(kind, time.perf_counter() - started)
+
+    def _fire(self, kind: str) -> Optional[Tuple[asyncio.Future, float]]:
+        document = self.random.choice(self.documents)
+        text_document = {"uri": document.uri}
+        if kind == "completion" and document.completion_positions:
+            line, character = self.random.choice(document.completion_positions)
+            return self._request(
+                "textDocument/completion",
+                {
+                    "textDocument": text_document,
+                    "position": {"line": line, "character": character},
+                },
+            )
+        if kind == "definition" and document.definition_positions:
+            line, character = self.random.choice(document.definition_positions)
+            return self._request(
+                "textDocument/definition",
+                {
+                    "textDocument": text_document,
+                    "position": {"line": line, "character": character},
+                },
+            )
+        if kind == "parse":
+            return self._request(
+                "parse_launch_file", {"filepath": document.path, "arguments": []}
+            )
+        if kind == "edit":
+            line = document.text.count("\n")
+            character = len(document.text) - document.text.rfind("\n") - 1
+            edited = self._edited[document.uri]
+            self._edited[document.uri] = not edited
+            self.versions[document.uri] += 1
+            self._notify(
+                "textDocument/didChange",
+                {
+                    "textDocument": {
+                        "uri": document.uri,
+                        "version": self.versions[document.uri],
+                    },
+                    "contentChanges": [
+                        {
+                            "range": {
+                                "start": {"line": line, "character": character},
+                                "end": {
+                                    "line": line,
+                                    "character": character + 1 if edited else character,
+                                },
+                            },
+                            "text": "" if edited else " ",
+                        }
+                    ],
+                },
+            )
+        return None
+
+    async def run(self, host: str, port: int, duration: float):
+        """
+        Connect, open the documents and send requests for a duration.
+
+        :param host: The host of the server.
+        :param port: The port of the server.
+        :param duration: The time in seconds to send requests for.
+        """
+        reader, self._writer = await asyncio.open_connection(host, port)
+        reading = asyncio.ensure_future(self._read(reader))
+        root = os.path.dirname(self.documents[0].path)
+        initialized, _ = self._request(
+            "initialize",
+            {"processId": os.getpid(), "rootUri": f"file://{root}", "capabilities": {}},
+        )
+        await initialized
+        self._notify("initialized", {})
+        for document in self.documents:
+            self._notify(
+                "textDocument/didOpen",
+                {
+                    "textDocument": {
+                        "uri": document.uri,
+                        "languageId": "xml",
+                        "version": 1,
+                        "text": document.text,
+                    }
+                },
+            )
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + duration
+        timed = []
+        while True:
+            await asyncio.sleep(self.random.expovariate(self.rate))
+            if loop.time() >= deadline:
+                break
+            kind = self.random.choices(self.kinds, self.weights)[0]
+            request = self._fire(kind)
+            if request is not None:
+                timed.append(asyncio.ensure_future(self._timed(kind, *request)))
+            await self._writer.drain()
+        await asyncio.gather(*timed)
+
+        shutdown, _ = self._request("shutdown", None)
+        await shutdown
+        self._notify("exit", None)
+        await self._writer.drain()
+        self._writer.close()
+        await reading
+
+
+def _format_row(name: str, histogram: LatencyHistogram, elapsed: float) -> str:
+    latency = histogram.as_dict()
+    return (
+        f"{name:<12} {histogram.count / elapsed:>8.1f} {latency['p50_ms']:>8.2f} "
+        f"{latency['p95_ms']:>8.2f} {latency['p99_ms']:>8.2f} "
+        f"{latency['max_ms']:>8.2f}"
+    )
+
+
+async def run_load(
+    host: str,
+    port: int,
+    clients: int,
+    documents: int,
+    size: int,
+    rate: float,
+    weights: Dict[str, float],
+    duration: float,
+    interval: float,
+    timeout: float,
+    server_pid: Optional[int],
+    seed: int,
+) -> List[Dict[str, Any]]:
+    """
+    Run the load test and print a report every interval.
+
+    :return: The reports of the intervals.
+    """
+    directory = tempfile.mkdtemp(prefix="roslaunch-loadgen-")
+    packages = ["demo_nodes_cpp", "rviz2", "robot_state_publisher", "nav2_bringup"]
+    statistics = LoadStatistics()
+    load_clients = [
+        LoadClient(
+            [
+                generate_document(directory, client * documents + index, size, packages)
+                for index in range(documents)
+            ],
+            statistics,
+            rate / clients,
+            weights,
+            timeout,
+            seed + client,
+        )
+        for client in range(clients)
+    ]
+
+    reports = []
+    header = (
+        f"{'request':<12} {'req/s':>8} {'p50_ms':>8} {'p95_ms':>8} "
+        f"{'p99_ms':>8} {'max_ms':>8}"
+    )
+
+    async def report_periodically():
+        started = time.perf_counter()
+        last = started
+        while True:
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            histograms = statistics.take_interval()
+            rss = read_rss(server_pid) if server_pid is not None else None
+            rss_text = f"{rss / 2**20:.1f} MiB" if rss is not None else "unknown"
+            typer.echo(f"t={now - started:.1f}s server RSS {rss_text}")
+            typer.echo(header)
+            for kind, histogram in sorted(histograms.items()):
+                typer.echo(_format_row(kind, histogram, now - last))
+            reports.append(
+                {
+                    "time": now - started,
+                    "rss": rss,
+                    "requests": {
+                        kind: {
+                            "throughput": histogram.count / (now - last),
+                            **histogram.as_dict(),
+                        }
+                        for kind, histogram in histograms.items()
+                    },
+                }
+            )
+            last = now
+
+    reporting = asyncio.ensure_future(report_periodically())
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(
+            *(client.run(host, port, duration) for client in load_clients)
+        )
+    finally:
+        reporting.cancel()
+    elapsed = time.perf_counter() - started
+
+    typer.echo(f"Total over {elapsed:.1f}s with {clients} clients")
+    typer.echo(header)
+    for kind, histogram in sorted(statistics.total.items()):
+        typer.echo(_format_row(kind, histogram, elapsed))
+    typer.echo(f"errors {statistics.errors}, timeouts {statistics.timeouts}")
+    return reports
+
+
+@cli.command()
+def main(
+    port: int = 8080,
+    host: str = "localhost",
+    clients: int = 4,
+    documents: int = 2,
+    size: int = 200,
+    rate: float = 20.0,
+    mix: str = "completion=6,definition=3,parse=1,edit=4",
+    duration: float = 30.0,
+    interval: float = 5.0,
+    timeout: float = 10.0,
+    server_pid: Optional[int] = None,
+    output: Optional[str] = None,
+    seed: int = 0,
+):
+    """
+    Load test a running server: each client opens synthetic launch files and
+    sends a random mix of requests, in total --rate per second.
+    """
+    if server_pid is None:
+        server_pid = find_listening_pid(port)
+    reports = asyncio.run(
+        run_load(
+            host,
+            port,
+            clients,
+            documents,
+            size,
+            rate,
+            parse_mix(mix),
+            duration,
+            interval,
+            timeout,
+            server_pid,
+            seed,
+        )
+    )
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    cli()
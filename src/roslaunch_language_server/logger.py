@@ -1,20 +1,132 @@
 import logging
+from collections import deque
+from typing import Deque, List
 
+from lsprotocol.types import MessageType
 from pygls.server import LanguageServer
 
 
+def _message_type(levelno: int) -> MessageType:
+    if levelno >= logging.ERROR:
+        return MessageType.Error
+    if levelno >= logging.WARNING:
+        return MessageType.Warning
+    if levelno >= logging.INFO:
+        return MessageType.Info
+    return MessageType.Log
+
+
 class LSPLogHandler(logging.Handler):
     """
     Custom log handler to send log messages to the Language Server.
+
+    Records are queued and sent in batches as a single window/logMessage from
+    the server's event loop, so emitting a record only appends it to a queue.
+    When more than max_pending records are waiting, records below WARNING are
+    dropped and the number of dropped records is reported with the next
+    batch. The last ring_size records are kept in a ring buffer regardless,
+    so they can be dumped on demand.
+
+    With a shared backend, the records are sent to the servers of all
+    attached sessions.
     """
 
-    def __init__(self, ls: LanguageServer):
+    def __init__(
+        self,
+        ls: LanguageServer,
+        flush_interval: float = 0.2,
+        max_pending: int = 1000,
+        ring_size: int = 2000,
+    ):
         super().__init__()
         self.ls = ls
+        self.clients: List[LanguageServer] = [ls]
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Deque[logging.LogRecord] = deque()
+        self._ring: Deque[logging.LogRecord] = deque(maxlen=ring_size)
+        self._dropped = 0
+        self._flush_scheduled = False
 
     def emit(self, record):
+        # Called with self.lock held by logging.Handler.handle.
+        self._ring.append(record)
+        if len(self._pending) >= self.max_pending:
+            self._dropped += 1
+            if record.levelno < logging.WARNING:
+                return
+            self._pending.popleft()
+        self._pending.append(record)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            try:
+                self.ls.loop.call_soon_threadsafe(
+                    self.ls.loop.call_later, self.flush_interval, self.flush
+                )
+            except RuntimeError:
+                # The event loop is closed; there is no client to send to.
+                self._flush_scheduled = False
+
+    def flush(self):
+        """
+        Send the queued records to the client as a single log message.
+        """
+        self.acquire()
+        try:
+            records = list(self._pending)
+            dropped = self._dropped
+            self._pending.clear()
+            self._dropped = 0
+            self._flush_scheduled = False
+        finally:
+            self.release()
+
+        if not records:
+            return
+
+        lines = [self.format(record) for record in records]
+        if dropped:
+            lines.append(f"({dropped} log records dropped)")
+        message = "\n".join(lines)
+        message_type = _message_type(max(record.levelno for record in records))
+        for client in list(self.clients):
+            try:
+                client.show_message_log(message, message_type)
+            except Exception:
+                self.handleError(records[-1])
+
+    def attach(self, ls: LanguageServer):
+        """
+        Also send the records to the client of another server.
+
+        :param ls: The server, which must share the event loop of self.ls.
+        """
+        self.acquire()
+        try:
+            self.clients.append(ls)
+        finally:
+            self.release()
+
+    def detach(self, ls: LanguageServer):
+        """
+        Stop sending the records to the client of a server.
+
+        :param ls: The server.
+        """
+        self.acquire()
+        try:
+            if ls in self.clients:
+                self.clients.remove(ls)
+        finally:
+            self.release()
+
+    def dump(self) -> List[str]:
+        """
+        Return the formatted records of the ring buffer, oldest first.
+        """
+        self.acquire()
         try:
-            msg = self.format(record)
-            self.ls.show_message_log(msg)
-        except Exception:
-            self.handleError(record)
+            records = list(self._ring)
+        finally:
+            self.release()
+        return [self.format(record) for record in records]
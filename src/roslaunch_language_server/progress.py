@@ -0,0 +1,93 @@
+import uuid
+from typing import Optional
+
+from lsprotocol.types import (
+    WorkDoneProgressBegin,
+    WorkDoneProgressEnd,
+    WorkDoneProgressReport,
+)
+from pygls.server import LanguageServer
+
+
+class BackgroundProgress:
+    """
+    Server initiated $/progress for work running in a background thread.
+
+    All notifications are sent from the server's event loop. The begin
+    notification waits for the client to create the token; reports made
+    before then are dropped, and an end made before then is sent after the
+    begin. Nothing is sent if the client does not support work done progress.
+
+    :param ls: The language server.
+    :param title: The title of the progress.
+    """
+
+    def __init__(self, ls: LanguageServer, title: str):
+        self.ls = ls
+        self.title = title
+        self.token = f"roslaunch-{uuid.uuid4()}"
+        window = getattr(ls.client_capabilities, "window", None)
+        self.enabled = bool(window is not None and window.work_done_progress)
+        self._begun = False
+        self._end_message: Optional[str] = None
+        self._ended = False
+        self._last_percentage = -1
+
+    def _call_soon(self, callback, *args):
+        if not self.enabled:
+            return
+        try:
+            self.ls.loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # The event loop is closed; there is no client to report to.
+            self.enabled = False
+
+    def _on_created(self, *args, **kwargs):
+        self.ls.progress.begin(
+            self.token, WorkDoneProgressBegin(title=self.title, percentage=0)
+        )
+        self._begun = True
+        if self._ended:
+            self._end(self._end_message)
+
+    def _report(self, message: str, percentage: int):
+        if self._begun and not self._ended:
+            self.ls.progress.report(
+                self.token,
+                WorkDoneProgressReport(message=message, percentage=percentage),
+            )
+
+    def _end(self, message: Optional[str]):
+        self._ended = True
+        self._end_message = message
+        if self._begun:
+            self.ls.progress.end(self.token, WorkDoneProgressEnd(message=message))
+
+    def begin(self):
+        """
+        Create the progress token and begin the progress.
+        """
+        self._call_soon(self.ls.progress.create, self.token, self._on_created)
+
+    def report(self, message: str, done: int, total: int):
+        """
+        Report the progress, sending a notification only when the percentage
+        changes.
+
+        :param message: The message shown to the user.
+        :param done: The amount of work done.
+        :param total: The total amount of work.
+        """
+        percentage = 100 * done // total if total else 100
+        if percentage == self._last_percentage:
+            return
+        self._last_percentage = percentage
+        self._call_soon(self._report, message, percentage)
+
+    def end(self, message: Optional[str] = None):
+        """
+        End the progress.
+
+        :param message: The final message shown to the user.
+        """
+        self._call_soon(self._end, message)
@@ -0,0 +1,163 @@
+import itertools
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from pygls.server import LanguageServer
+
+_header_end = b"\r\n\r\n"
+_content_length = re.compile(rb"^Content-Length: *(\d+)", re.IGNORECASE | re.MULTILINE)
+
+
+class MessageBuffer:
+    """
+    Splits a stream of LSP base protocol bytes into message bodies.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        """
+        Add received bytes and yield the bodies of the completed messages.
+
+        :param data: The received bytes.
+        """
+        self._buffer += data
+        while True:
+            header_end = self._buffer.find(_header_end)
+            if header_end < 0:
+                return
+            match = _content_length.search(self._buffer, 0, header_end)
+            if match is None:
+                # Not a valid header; drop it.
+                del self._buffer[: header_end + len(_header_end)]
+                continue
+            start = header_end + len(_header_end)
+            end = start + int(match.group(1))
+            if len(self._buffer) < end:
+                return
+            body = bytes(self._buffer[start:end])
+            del self._buffer[:end]
+            yield body
+
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    """
+    Frame a JSON-RPC message with the LSP base protocol header.
+
+    :param message: The message.
+    :return: The header and the body.
+    """
+    body = json.dumps(message).encode()
+    return b"Content-Length: %d\r\n\r\n" % len(body) + body
+
+
+@dataclass
+class RecordedMessage:
+    """
+    A message received by the server.
+
+    :param session: The number of the session that received the message.
+    :param time: The time in seconds since the recording started.
+    :param message: The JSON-RPC message.
+    """
+
+    session: int
+    time: float
+    message: Dict[str, Any]
+
+
+class SessionRecorder:
+    """
+    Records every message received by the attached servers to a JSON lines
+    file, including the document contents and edits.
+
+    The message bodies are written as received, without decoding them, so
+    recording costs little more than the write.
+
+    :param path: The path of the recording, overwritten if it exists.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "wb")
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._session_numbers = itertools.count(1)
+
+    def attach(self, ls: LanguageServer):
+        """
+        Record the messages received by a server as a new session.
+
+        :param ls: The server, before its connection is made.
+        """
+        session = next(self._session_numbers)
+        buffer = MessageBuffer()
+        data_received = ls.lsp.data_received
+
+        def recording_data_received(data: bytes):
+            received = time.monotonic() - self._started
+            for body in buffer.feed(data):
+                self._write(session, received, body)
+            data_received(data)
+
+        ls.lsp.data_received = recording_data_received
+
+    def _write(self, session: int, received: float, body: bytes):
+        # Line breaks can only be whitespace between JSON tokens.
+        body = body.replace(b"\r", b" ").replace(b"\n", b" ")
+        line = b'{"session": %d, "time": %.6f, "message": %s}\n' % (
+            session,
+            received,
+            body,
+        )
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        """
+        Close the recording.
+        """
+        with self._lock:
+            self._file.close()
+
+
+session_recorder: Optional[SessionRecorder] = None
+
+
+def start_recording(path: str) -> SessionRecorder:
+    """
+    Record the sessions of all servers created from now on.
+
+    :param path: The path of the recording.
+    :return: The recorder.
+    """
+    global session_recorder
+    session_recorder = SessionRecorder(path)
+    return session_recorder
+
+
+def read_recording(path: str) -> List[RecordedMessage]:
+    """
+    Read a recording written by SessionRecorder.
+
+    :param path: The path of the recording.
+    :return: The messages in the order they were received.
+    """
+    messages = []
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            messages.append(
+                RecordedMessage(
+                    session=data["session"], time=data["time"], message=data["message"]
+                )
+            )
+    return messages
@@ -0,0 +1,213 @@
+import asyncio
+import json
+from typing import Any, Dict, List, Optional
+
+import typer
+
+from roslaunch_language_server.recorder import (
+    MessageBuffer,
+    RecordedMessage,
+    encode_message,
+    read_recording,
+)
+from roslaunch_language_server.stats import LatencyHistogram
+
+cli = typer.Typer()
+
+
+class _ReplayTransport(asyncio.Transport):
+    """
+    Transport of a replayed session, answering the requests of the server to
+    the client and resolving the futures of the replayed requests.
+    """
+
+    def __init__(self, lsp, responses: Dict[Any, asyncio.Future]):
+        super().__init__()
+        self.lsp = lsp
+        self.responses = responses
+        self._buffer = MessageBuffer()
+        self._closing = False
+
+    def write(self, data: bytes):
+        for body in self._buffer.feed(data):
+            message = json.loads(body)
+            if "method" in message:
+                if "id" in message:
+                    # A request of the server, e.g. client/registerCapability.
+                    reply = {"jsonrpc": "2.0", "id": message["id"], "result": None}
+                    self.lsp._server.loop.call_soon(
+                        self.lsp.data_received, encode_message(reply)
+                    )
+                continue
+            future = self.responses.pop(message.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(message)
+
+    def close(self):
+        self._closing = True
+
+    def is_closing(self) -> bool:
+        return self._closing
+
+
+async def replay_session(
+    messages: List[RecordedMessage],
+    histograms: Dict[str, LatencyHistogram],
+    speed: float = 0.0,
+    timeout: float = 30.0,
+):
+    """
+    Replay the messages of one session on a fresh in-process server.
+
+    Requests are sent one at a time: the next message is sent once the
+    response arrived, so the order in which the server sees the messages is
+    the recorded one. Responses of the recorded client to requests of the
+    server are not replayed; the requests of the server are answered with
+    null instead.
+
+    :param messages: The messages of the session.
+    :param histograms: The latency histograms to add to, keyed by method.
+    :param speed: 0 to send the messages as fast as possible, 1 to keep the
+        recorded gaps between them, 2 for half the gaps and so on.
+    :param timeout: The time in seconds to wait for a response.
+    """
+    from roslaunch_language_server.session import create_session_server
+
+    loop = asyncio.get_running_loop()
+    ls = create_session_server(loop)
+    responses: Dict[Any, asyncio.Future] = {}
+    ls.lsp.connection_made(_ReplayTransport(ls.lsp, responses))
+
+    started = loop.time()
+    first = messages[0].time if messages else 0.0
+    try:
+        for recorded in messages:
+            message = recorded.message
+            if "method" not in message:
+                continue
+            if speed > 0:
+                delay = (recorded.time - first) / speed - (loop.time() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            is_request = "id" in message
+            if is_request:
+                future = loop.create_future()
+                responses[message["id"]] = future
+            sent = loop.time()
+            ls.lsp.data_received(encode_message(message))
+            if not is_request:
+                # Let the handlers of the notification start.
+                await asyncio.sleep(0)
+                continue
+            try:
+                await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                typer.echo(f"No response to {message['method']}", err=True)
+                continue
+            histograms.setdefault(message["method"], LatencyHistogram()).record(
+                loop.time() - sent
+            )
+    finally:
+        ls.lsp.connection_lost(None)
+
+
+def replay(
+    messages: List[RecordedMessage],
+    session: Optional[int] = None,
+    repeat: int = 1,
+    speed: float = 0.0,
+) -> Dict[str, LatencyHistogram]:
+    """
+    Replay a recording and measure the latency of every request.
+
+    The sessions of the recording are replayed one after the other, each on
+    a fresh server. The caches of the process are shared by all of them, so
+    later repetitions measure warm caches.
+
+    :param messages: The recorded messages.
+    :param session: The session to replay, or None for all sessions.
+    :param repeat: The number of times the recording is replayed.
+    :param speed: See replay_session.
+    :return: The latency histograms keyed by method.
+    """
+    import roslaunch_language_server.feature  # noqa
+    from roslaunch_language_server.server import lsp_handler, server
+
+    # Nothing is sent to the client of the template server.
+    lsp_handler.detach(server)
+
+    by_session: Dict[int, List[RecordedMessage]] = {}
+    for message in messages:
+        if session is None or message.session == session:
+            by_session.setdefault(message.session, []).append(message)
+
+    histograms: Dict[str, LatencyHistogram] = {}
+
+    async def run():
+        for _ in range(repeat):
+            for session_messages in by_session.values():
+                await replay_session(session_messages, histograms, speed)
+
+    server.loop.run_until_complete(run())
+    return histograms
+
+
+@cli.command()
+def main(
+    recording: str,
+    session: Optional[int] = None,
+    repeat: int = 1,
+    speed: float = 0.0,
+    output: Optional[str] = None,
+    baseline: Optional[str] = None,
+    tolerance: float = 0.2,
+):
+    """
+    Replay a recording made with --record and report the request latencies.
+
+    With --baseline, exit with status 1 if the p95 latency of a method
+    exceeds the one of the baseline (an --output of an earlier run) by more
+    than the tolerance.
+    """
+    histograms = replay(read_recording(recording), session, repeat, speed)
+    report = {
+        method: {"requests": histogram.count, **histogram.as_dict()}
+        for method, histogram in sorted(histograms.items())
+    }
+
+    typer.echo(
+        f"{'method':<40} {'requests':>8} {'p50_ms':>8} {'p95_ms':>8} "
+        f"{'p99_ms':>8} {'max_ms':>8}"
+    )
+    for method, row in report.items():
+        typer.echo(
+            f"{method:<40} {row['requests']:>8} {row['p50_ms']:>8.2f} "
+            f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['max_ms']:>8.2f}"
+        )
+
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if baseline is not None:
+        with open(baseline) as f:
+            expected = json.load(f)
+        regressions = [
+            method
+            for method, row in report.items()
+            if method in expected
+            and row["p95_ms"] > expected[method]["p95_ms"] * (1 + tolerance)
+        ]
+        for method in regressions:
+            typer.echo(
+                f"Regression in {method}: p95 {report[method]['p95_ms']:.2f} ms, "
+                f"baseline {expected[method]['p95_ms']:.2f} ms",
+                err=True,
+            )
+        if regressions:
+            raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    cli()
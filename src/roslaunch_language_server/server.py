@@ -1,16 +1,27 @@
 import logging
+import os
+from typing import Any, Callable, List, Optional, Tuple
 
 from pygls.server import LanguageServer
 
 from roslaunch_language_server.logger import LSPLogHandler
+from roslaunch_language_server.stats import stats
 
-server = LanguageServer("roslaunch-language-server", version="0.1.0")
+SERVER_NAME = "roslaunch-language-server"
+SERVER_VERSION = "0.1.0"
+
+server = LanguageServer(SERVER_NAME, version=SERVER_VERSION)
+
+# The features and commands registered with server_feature and server_command,
+# as (kind, name, options, handler), to be registered again on the servers of
+# the sessions of a shared backend.
+_registrations: List[Tuple[str, str, Optional[Any], Callable]] = []
 
 # logging.basicConfig(handlers=[logging.StreamHandler()], level=logging.DEBUG)
 
 # Set up logging
 logger = logging.getLogger("ls-logger")
-logger.setLevel(logging.DEBUG)
+logger.setLevel(logging.INFO)
 lsp_handler = LSPLogHandler(server)
 formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 lsp_handler.setFormatter(formatter)
@@ -23,3 +34,73 @@ logger.addHandler(lsp_handler)
 # )
 
 # logger = logging.getLogger("ls-logger")
+
+
+def set_log_level(level: str) -> bool:
+    """
+    Change the level of the server logger at runtime.
+
+    :param level: The name of the level, e.g. "DEBUG" or "info".
+    :return: True if the level was valid and has been applied.
+    """
+    levelno = logging.getLevelName(level.upper())
+    if not isinstance(levelno, int):
+        return False
+    logger.setLevel(levelno)
+    return True
+
+
+_env_log_level = os.environ.get("ROSLAUNCH_LS_LOG_LEVEL")
+if _env_log_level and not set_log_level(_env_log_level):
+    logger.warning(
+        "Ignoring unknown log level %r in ROSLAUNCH_LS_LOG_LEVEL", _env_log_level
+    )
+
+
+def server_feature(feature_name: str, options: Optional[Any] = None) -> Callable:
+    """
+    Decorator registering a feature handler on the server with its latency,
+    error and cancellation statistics recorded.
+
+    :param feature_name: The name of the LSP method or custom request.
+    :param options: The options of the feature, as for server.feature.
+    :return: The decorator.
+    """
+
+    def decorator(f: Callable) -> Callable:
+        handler = stats.instrument(feature_name)(f)
+        _registrations.append(("feature", feature_name, options, handler))
+        return server.feature(feature_name, options)(handler)
+
+    return decorator
+
+
+def server_command(command_name: str) -> Callable:
+    """
+    Decorator registering a command on the server with its statistics
+    recorded.
+
+    :param command_name: The name of the command.
+    :return: The decorator.
+    """
+
+    def decorator(f: Callable) -> Callable:
+        handler = stats.instrument(command_name)(f)
+        _registrations.append(("command", command_name, None, handler))
+        return server.command(command_name)(handler)
+
+    return decorator
+
+
+def register_features(ls: LanguageServer):
+    """
+    Register the features and commands of the server on another server, e.g.
+    the server of a session of a shared backend.
+
+    :param ls: The server to register the features on.
+    """
+    for kind, name, options, handler in _registrations:
+        if kind == "feature":
+            ls.feature(name, options)(handler)
+        else:
+            ls.command(name)(handler)
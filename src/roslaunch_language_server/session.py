@@ -0,0 +1,185 @@
+import asyncio
+from typing import Dict, Iterator
+
+from lsprotocol.types import EXIT
+from pygls.protocol import LanguageServerProtocol
+from pygls.protocol.language_server import lsp_method
+from pygls.server import LanguageServer
+
+from roslaunch_analyzer.include_graph import canonical_path
+from roslaunch_language_server import recorder
+from roslaunch_language_server.analysis import AnalysisScheduler
+from roslaunch_language_server.backend import build_scheduler
+from roslaunch_language_server.features import (
+    DocumentLinkProvider,
+    HoverProvider,
+    SemanticTokensProvider,
+)
+from roslaunch_language_server.helper.document_model import DocumentModelStore
+from roslaunch_language_server.helper.workspace_index import include_graph
+from roslaunch_language_server.server import (
+    SERVER_NAME,
+    SERVER_VERSION,
+    logger,
+    lsp_handler,
+    register_features,
+    server,
+)
+
+
+class Session:
+    """
+    State of one client connection.
+
+    The package index, the workspace index, the parse caches and the built
+    launch trees are shared by all sessions of a backend. The state keyed by
+    document URI and version (document models, analysis results, semantic
+    tokens, hover and document link caches) is kept per session, as two
+    clients may have different contents under the same URI.
+
+    :param ls: The server of the connection.
+    """
+
+    def __init__(self, ls: LanguageServer):
+        self.ls = ls
+        self.analysis = AnalysisScheduler(ls, session=self)
+        self.document_models = DocumentModelStore()
+        self.document_links = DocumentLinkProvider(self.document_models)
+        self.hover = HoverProvider(self.document_models)
+        self.semantic_tokens = SemanticTokensProvider(self.document_models)
+
+    def close_document(self, uri: str):
+        """
+        Drop the state of a closed document.
+
+        :param uri: The URI of the document.
+        """
+        self.analysis.close(uri)
+        self.document_models.close(uri)
+        self.document_links.close(uri)
+        self.semantic_tokens.close(uri)
+        self.hover.close(uri)
+
+    def close(self):
+        """
+        Drop the state of all documents after the connection was lost.
+        """
+        self.analysis.shutdown()
+        build_scheduler.close_session(self)
+        # Release the cache entries of the documents left open by the client.
+        for uri in list(self.ls.workspace.text_documents):
+            self.document_models.close(uri)
+            self.document_links.close(uri)
+            self.semantic_tokens.close(uri)
+            self.hover.close(uri)
+
+
+class SessionRegistry:
+    """
+    The sessions of the backend, keyed by their server.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[LanguageServer, Session] = {}
+
+    def get(self, ls: LanguageServer) -> Session:
+        """
+        Return the session of a server, creating it on first use.
+
+        :param ls: The server passed to a feature handler.
+        """
+        session = self._sessions.get(ls)
+        if session is None:
+            session = self._sessions[ls] = Session(ls)
+        return session
+
+    def close(self, ls: LanguageServer):
+        """
+        Close the session of a server.
+
+        :param ls: The server of the lost connection.
+        """
+        session = self._sessions.pop(ls, None)
+        if session is not None:
+            session.close()
+
+    def __iter__(self) -> Iterator[Session]:
+        return iter(list(self._sessions.values()))
+
+    def invalidate_dependents(self, path: str):
+        """
+        Drop the builds including a changed file and rebuild the open
+        documents including it in all sessions.
+
+        :param path: The path of the changed launch file.
+        """
+        build_scheduler.invalidate(
+            {canonical_path(path), *include_graph.dependents(path)}
+        )
+        for session in self:
+            session.analysis.invalidate_dependents(path)
+
+
+sessions = SessionRegistry()
+
+
+class SessionProtocol(LanguageServerProtocol):
+    """
+    Protocol of a connection to a shared backend.
+
+    Losing the connection or an exit notification ends the session instead
+    of the process.
+    """
+
+    def connection_lost(self, exc):
+        logger.info("Session closed")
+        lsp_handler.detach(self._server)
+        sessions.close(self._server)
+
+    @lsp_method(EXIT)
+    def lsp_exit(self, *args) -> None:
+        if self.transport is not None:
+            self.transport.close()
+
+
+def create_session_server(loop: asyncio.AbstractEventLoop) -> LanguageServer:
+    """
+    Create the server of a new connection to the shared backend.
+
+    :param loop: The event loop of the backend.
+    :return: A server with all features registered.
+    """
+    ls = LanguageServer(
+        SERVER_NAME, SERVER_VERSION, loop=loop, protocol_cls=SessionProtocol
+    )
+    register_features(ls)
+    lsp_handler.attach(ls)
+    if recorder.session_recorder is not None:
+        recorder.session_recorder.attach(ls)
+    logger.info("Session opened")
+    return ls
+
+
+def start_backend(host: str, port: int):
+    """
+    Serve any number of concurrent clients from one shared backend.
+
+    Every TCP connection gets its own server, workspace and session; the
+    caches, indexes and builds are shared.
+
+    :param host: The host to listen on.
+    :param port: The port to listen on.
+    """
+    loop = server.loop
+    # The template server has no client of its own.
+    lsp_handler.detach(server)
+    tcp_server = loop.run_until_complete(
+        loop.create_server(lambda: create_session_server(loop).lsp, host, port)
+    )
+    try:
+        loop.run_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        tcp_server.close()
+        loop.run_until_complete(tcp_server.wait_closed())
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from roslaunch_analyzer.cache import cache_manager
+from roslaunch_analyzer.encoding import dumps_interned, loads_interned
+from roslaunch_language_server.helper.completion_index import CompletionIndex
+
+SNAPSHOT_FORMAT_VERSION = 2
+
+
+def default_snapshot_path() -> str:
+    """
+    Return the path of the snapshot for the current AMENT_PREFIX_PATH.
+
+    :return: A path below $XDG_CACHE_HOME (or ~/.cache).
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    key = hashlib.sha1(
+        os.environ.get("AMENT_PREFIX_PATH", "").encode(), usedforsecurity=False
+    ).hexdigest()[:16]
+    return os.path.join(cache_home, "roslaunch-language-server", f"snapshot-{key}.json")
+
+
+class StartupSnapshot:
+    """
+    Package index and launch file summaries persisted between server runs.
+
+    On startup the snapshot of the last run is loaded from disk, which takes
+    milliseconds, instead of enumerating the packages of the ament prefixes.
+    It is revalidated in the background by the workspace index and saved
+    again, in the interned JSON encoding that stores the repeated paths and
+    names once.
+    Environment variables are always read from the live environment, which
+    costs nothing. The completion indexes are kept in the "completion_index"
+    cache region and rebuilt if the cache manager evicted them.
+
+    :param path: The path of the snapshot file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.launch_files: Dict[str, Dict[str, Any]] = {}
+        self._package_prefixes: Optional[Dict[str, str]] = None
+        self._indexes = cache_manager.region("completion_index")
+        self._lock = threading.Lock()
+
+    def load(self) -> bool:
+        """
+        Load the snapshot file.
+
+        :return: Whether a valid snapshot was loaded.
+        """
+        try:
+            with open(self.path) as f:
+                data = loads_interned(f.read())
+        except (OSError, ValueError, LookupError, TypeError):
+            return False
+        if data.get("version") != SNAPSHOT_FORMAT_VERSION:
+            return False
+        with self._lock:
+            if self._package_prefixes is None:
+                self._package_prefixes = data["package_prefixes"]
+            self.launch_files = data["launch_files"]
+        return True
+
+    def save(self):
+        """
+        Write the snapshot file atomically.
+        """
+        data = {
+            "version": SNAPSHOT_FORMAT_VERSION,
+            "package_prefixes": self.package_prefixes,
+            "launch_files": self.launch_files,
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as f:
+            f.write(dumps_interned(data))
+        os.replace(temporary_path, self.path)
+
+    def refresh_packages(self) -> bool:
+        """
+        Enumerate the packages of the ament prefixes again.
+
+        :return: Whether the packages changed since the snapshot was saved.
+        """
+        from ament_index_python.packages import get_packages_with_prefixes
+
+        if self._package_prefixes is None:
+            self.load()
+        package_prefixes = get_packages_with_prefixes()
+        with self._lock:
+            if package_prefixes == self._package_prefixes:
+                return False
+            self._package_prefixes = package_prefixes
+            self._indexes.pop("package")
+        return True
+
+    @property
+    def package_prefixes(self) -> Dict[str, str]:
+        """
+        The install prefixes of all packages, keyed by package name.
+        """
+        if self._package_prefixes is None and not self.load():
+            self.refresh_packages()
+        return self._package_prefixes
+
+    def _index(self, name: str, words: Callable[[], List[str]]) -> CompletionIndex:
+        index = self._indexes.get(name)
+        if index is not None:
+            self._indexes.stats.hit()
+        else:
+            self._indexes.stats.miss()
+            index = CompletionIndex(words())
+            # Two lists of words and tuples, about 150 bytes per word.
+            self._indexes.put(name, index, 200 + 150 * len(index.words))
+        return index
+
+    @property
+    def package_index(self) -> CompletionIndex:
+        """
+        The completion index of the package names.
+        """
+        return self._index("package", lambda: list(self.package_prefixes))
+
+    @property
+    def env_var_index(self) -> CompletionIndex:
+        """
+        The completion index of the environment variable names.
+        """
+        return self._index("env_var", lambda: list(os.environ))
+
+
+startup_snapshot = StartupSnapshot(default_snapshot_path())
@@ -0,0 +1,200 @@
+import asyncio
+import functools
+import json
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from pygls.exceptions import JsonRpcRequestCancelled
+
+from roslaunch_analyzer.cache import cache_manager, get_cache_stats
+
+
+class LatencyHistogram:
+    """
+    Histogram of latencies in logarithmic buckets.
+
+    Bucket bounds grow by a factor of 2 ** (1 / 4) from 1 microsecond, so
+    percentiles are exact to within about 19% at a fixed memory cost.
+    """
+
+    MIN_LATENCY = 1e-6
+    GROWTH = 2 ** (1 / 4)
+    NUM_BUCKETS = 110
+
+    def __init__(self):
+        self.buckets: List[int] = [0] * self.NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        if seconds <= self.MIN_LATENCY:
+            index = 0
+        else:
+            index = min(
+                self.NUM_BUCKETS - 1,
+                math.ceil(math.log(seconds / self.MIN_LATENCY, self.GROWTH)),
+            )
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Return the upper bound of the bucket holding the given percentile.
+
+        :param fraction: The percentile as a fraction, e.g. 0.95.
+        :return: The latency in seconds, or 0.0 if nothing was recorded.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = fraction * self.count
+        accumulated = 0
+        for index, bucket in enumerate(self.buckets):
+            accumulated += bucket
+            if accumulated >= rank:
+                return min(self.max, self.MIN_LATENCY * self.GROWTH**index)
+        return self.max
+
+    def as_dict(self) -> Dict[str, float]:
+        """
+        Return the percentiles in milliseconds.
+        """
+        return {
+            "p50_ms": self.percentile(0.50) * 1e3,
+            "p95_ms": self.percentile(0.95) * 1e3,
+            "p99_ms": self.percentile(0.99) * 1e3,
+            "max_ms": self.max * 1e3,
+            "mean_ms": self.total / self.count * 1e3 if self.count else 0.0,
+        }
+
+
+class HandlerStats:
+    """
+    Request, error and cancellation counts and latencies of a handler.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.cancellations = 0
+        self.latency = LatencyHistogram()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "cancellations": self.cancellations,
+            "latency": self.latency.as_dict(),
+        }
+
+
+class StatsRegistry:
+    """
+    Statistics of the feature handlers of the server.
+    """
+
+    def __init__(self):
+        self.handlers: Dict[str, HandlerStats] = {}
+        self._lock = threading.Lock()
+        self._dump_timer: Optional[threading.Timer] = None
+
+    def _finish(
+        self, name: str, started: float, error: bool = False, cancelled: bool = False
+    ):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            handler = self.handlers.setdefault(name, HandlerStats())
+            handler.requests += 1
+            handler.errors += error
+            handler.cancellations += cancelled
+            handler.latency.record(elapsed)
+
+    def instrument(self, name: str) -> Callable[[Callable], Callable]:
+        """
+        Decorator recording the statistics of a (sync or async) handler.
+
+        :param name: The name under which the statistics are recorded.
+        :return: The decorator.
+        """
+
+        def decorator(f: Callable) -> Callable:
+            if asyncio.iscoroutinefunction(f):
+
+                @functools.wraps(f)
+                async def async_wrapper(*args, **kwargs):
+                    started = time.perf_counter()
+                    try:
+                        result = await f(*args, **kwargs)
+                    except (asyncio.CancelledError, JsonRpcRequestCancelled):
+                        self._finish(name, started, cancelled=True)
+                        raise
+                    except Exception:
+                        self._finish(name, started, error=True)
+                        raise
+                    self._finish(name, started)
+                    return result
+
+                return async_wrapper
+
+            @functools.wraps(f)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = f(*args, **kwargs)
+                except JsonRpcRequestCancelled:
+                    self._finish(name, started, cancelled=True)
+                    raise
+                except Exception:
+                    self._finish(name, started, error=True)
+                    raise
+                self._finish(name, started)
+                return result
+
+            return wrapper
+
+        return decorator
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return the statistics of all handlers, registered caches and the
+        memory budget of the cache manager.
+        """
+        with self._lock:
+            handlers = {name: stats.as_dict() for name, stats in self.handlers.items()}
+        return {
+            "handlers": handlers,
+            "caches": get_cache_stats(),
+            "memory": cache_manager.snapshot(),
+        }
+
+    def dump(self, path: str):
+        """
+        Write a snapshot of the statistics to a JSON file.
+
+        :param path: The path of the file.
+        """
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def start_periodic_dump(self, path: str, interval: float):
+        """
+        Dump the statistics to a file every interval seconds.
+
+        :param path: The path of the file.
+        :param interval: The interval in seconds.
+        """
+
+        def dump_and_reschedule():
+            self.dump(path)
+            self.start_periodic_dump(path, interval)
+
+        self._dump_timer = threading.Timer(interval, dump_and_reschedule)
+        self._dump_timer.daemon = True
+        self._dump_timer.start()
+
+
+stats = StatsRegistry()
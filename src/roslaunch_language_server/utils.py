@@ -1,7 +1,42 @@
 import os
+from typing import Dict, Optional
 
-from ament_index_python.packages import get_packages_with_prefixes
+from roslaunch_language_server.helper.completion_index import CompletionIndex
+from roslaunch_language_server.snapshot import startup_snapshot
 
-all_ros_packages = list(get_packages_with_prefixes().keys())
 
-all_env_vars = list(os.environ.keys())
+def ros_package_prefixes() -> Dict[str, str]:
+    """
+    Return the install prefixes of all packages, keyed by package name.
+    """
+    return startup_snapshot.package_prefixes
+
+
+def ros_package_index() -> CompletionIndex:
+    """
+    Return the completion index of the package names.
+    """
+    return startup_snapshot.package_index
+
+
+def env_var_index() -> CompletionIndex:
+    """
+    Return the completion index of the environment variable names.
+    """
+    return startup_snapshot.env_var_index
+
+
+def find_package_share_directory(package_name: str) -> Optional[str]:
+    """
+    Return the share directory of a package from the package index.
+
+    Unlike ament's get_package_share_directory, this does not walk the
+    AMENT_PREFIX_PATH on every call.
+
+    :param package_name: The name of the package.
+    :return: The share directory, or None if the package is unknown.
+    """
+    prefix = ros_package_prefixes().get(package_name)
+    if prefix is None:
+        return None
+    return os.path.join(prefix, "share", package_name)
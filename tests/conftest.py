@@ -0,0 +1,33 @@
+import pytest
+
+
+@pytest.fixture
+def build_launch_file(tmp_path):
+    """
+    Build a launch file written to a temporary directory. Skips the test if
+    launch_ros is not installed.
+    """
+    pytest.importorskip("launch_ros")
+    from roslaunch_analyzer import LaunchCommand, command_to_tree
+
+    def build(source, name="test.launch.xml", arguments=()):
+        path = tmp_path / name
+        path.write_text(source)
+        tree = command_to_tree(LaunchCommand(path=str(path), arguments=list(arguments)))
+        tree.build()
+        return tree
+
+    return build
+
+
+@pytest.fixture
+def fresh_subtrees():
+    """
+    Empty the cache of built subtrees before and after the test.
+    """
+    pytest.importorskip("launch_ros")
+    from roslaunch_analyzer.tree import _subtree_cache
+
+    _subtree_cache.remove_if(lambda key: True)
+    yield _subtree_cache
+    _subtree_cache.remove_if(lambda key: True)
@@ -0,0 +1,54 @@
+import pytest
+from lsprotocol.types import DiagnosticSeverity
+
+from roslaunch_language_server.analysis import build_document, check_document
+from roslaunch_language_server.helper.syntax import SyntaxTree
+
+SOURCE = """<launch>
+  <arg name="name" default="talker"/>
+  <include file="$(dirname)/missing.launch.xml"/>
+  <group>
+    <node pkg="demo" exec="talker" name="$(var undefined)"/>
+  </group>
+</launch>
+"""
+
+
+def test_element_by_indices():
+    syntax = SyntaxTree(SOURCE)
+    assert syntax.element_by_indices(()).tag == "launch"
+    assert syntax.element_by_indices((2, 0)).tag == "node"
+    assert syntax.element_by_indices((2, 1)) is None
+    assert SyntaxTree("").element_by_indices(()) is None
+
+
+def test_build_errors_are_reported_on_their_element(tmp_path):
+    pytest.importorskip("launch_ros")
+    path = tmp_path / "test.launch.xml"
+    path.write_text(SOURCE)
+
+    tree, diagnostics = build_document(str(path))
+    assert tree is not None
+    include, node = sorted(diagnostics, key=lambda d: d.range.start.line)
+    assert include.message.startswith("Failed to build IncludeLaunchDescription")
+    assert (include.range.start.line, include.range.start.character) == (2, 17)
+    assert node.message.startswith("Failed to build Node")
+    assert (node.range.start.line, node.range.start.character) == (4, 5)
+    assert node.range.end.character == 9
+
+
+def test_undeclared_launch_arguments_are_reported():
+    source = """<launch>
+  <arg name="declared" default="1"/>
+  <group>
+    <let name="grouped" value="$(var declared)"/>
+  </group>
+  <let name="value" value="$(var grouped)"/>
+</launch>
+"""
+    (diagnostic,) = check_document(source)
+    assert diagnostic.message == (
+        "Launch argument 'grouped' is not declared in this scope"
+    )
+    assert diagnostic.severity == DiagnosticSeverity.Warning
+    assert (diagnostic.range.start.line, diagnostic.range.start.character) == (5, 33)
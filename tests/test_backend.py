@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+import pytest
+
+from roslaunch_language_server.backend import BuildScheduler, build_key
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = BuildScheduler(max_workers=1)
+    scheduler._results.remove_if(lambda key: True)
+    yield scheduler
+    scheduler._results.remove_if(lambda key: True)
+    scheduler._executor.shutdown()
+
+
+def test_build_key_includes_the_arguments():
+    key = build_key("/ws/a.launch.xml", "<launch/>")
+    assert key == build_key("/ws/a.launch.xml", "<launch/>", ())
+    assert key != build_key("/ws/a.launch.xml", "<launch/>", [("x", "1")])
+    assert build_key("/ws/a.launch.xml", "<launch/>", [("x", "1"), ("y", "")]) != (
+        build_key("/ws/a.launch.xml", "<launch/>", [("x", "1y=")])
+    )
+
+
+def test_concurrent_requests_share_one_build(scheduler):
+    calls = []
+
+    def build(path):
+        calls.append(path)
+        return None, []
+
+    async def main():
+        key = ("/ws/a.launch.xml", "digest")
+        results = await asyncio.gather(
+            scheduler.build("first", key, build, "a"),
+            scheduler.build("second", key, build, "a"),
+        )
+        assert await scheduler.build("first", key, build, "a") == (None, [])
+        return results
+
+    assert asyncio.run(main()) == [(None, []), (None, [])]
+    assert calls == ["a"]
+
+
+def test_sessions_are_served_round_robin(scheduler):
+    order = []
+    release = threading.Event()
+
+    def build(name):
+        release.wait(5)
+        order.append(name)
+        return None, []
+
+    async def main():
+        # The first build runs while the others are queued.
+        requests = [scheduler.build("other", ("/ws/first", "digest"), build, "first")]
+        requests += [
+            scheduler.build("busy", (f"/ws/{name}", "digest"), build, name)
+            for name in ("busy1", "busy2", "busy3")
+        ]
+        requests.append(
+            scheduler.build("other", ("/ws/other", "digest"), build, "other")
+        )
+        tasks = [asyncio.ensure_future(request) for request in requests]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["first", "busy1", "other", "busy2", "busy3"]
+
+
+def test_invalidate_drops_the_finished_builds(scheduler):
+    calls = []
+
+    def build(path):
+        calls.append(path)
+        return None, []
+
+    async def main():
+        key = ("/ws/a.launch.xml", "digest")
+        await scheduler.build("session", key, build, "a")
+        scheduler.invalidate(["/ws/other.launch.xml"])
+        await scheduler.build("session", key, build, "a")
+        scheduler.invalidate(["/ws/a.launch.xml"])
+        await scheduler.build("session", key, build, "a")
+
+    asyncio.run(main())
+    assert calls == ["a", "a"]
@@ -0,0 +1,74 @@
+import pytest
+
+from roslaunch_analyzer.cache import (
+    LFU,
+    CacheManager,
+    approximate_size,
+    get_cache_stats,
+    parse_size,
+)
+
+
+def test_sizes_are_parsed():
+    assert parse_size("512M") == 512 * 2**20
+    assert parse_size(" 2 GiB ") == 2 * 2**30
+    assert parse_size("1048576") == 2**20
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_shared_objects_are_counted_once():
+    shared = "x" * 1000
+    assert approximate_size([shared, shared]) < 2 * approximate_size(shared)
+    assert approximate_size({"key": [shared]}) > approximate_size(shared)
+
+
+def test_lru_regions_evict_the_least_recently_used():
+    manager = CacheManager(budget=2**20)
+    region = manager.region("test_lru", max_entries=2)
+    assert manager.region("test_lru") is region
+    region.put("a", 1, size=10)
+    region.put("b", 2, size=10)
+    assert region.get("a") == 1
+    region.put("c", 3, size=10)
+    assert list(region.keys()) == ["a", "c"]
+    assert region.get("b", "missing") == "missing"
+    assert region.stats.evictions == 1
+    assert region.bytes == manager.bytes == 20
+
+
+def test_lfu_regions_evict_the_least_frequently_used():
+    manager = CacheManager(budget=2**20)
+    region = manager.region("test_lfu", policy=LFU, max_entries=2)
+    region.put("a", 1, size=10)
+    region.put("b", 2, size=10)
+    region.get("a")
+    region.get("a")
+    region.get("b")
+    region.put("c", 3, size=10)
+    assert sorted(region.keys()) == ["a", "c"]
+    # "c" was used least, even though "a" was used less recently.
+    region.get("c")
+    region.get("c")
+    region.get("c")
+    region.put("d", 4, size=10)
+    assert sorted(region.keys()) == ["c", "d"]
+
+
+def test_the_largest_region_evicts_when_over_budget():
+    manager = CacheManager(budget=100)
+    small = manager.region("test_small")
+    large = manager.region("test_large")
+    small.put("a", 1, size=30)
+    large.put("a", 1, size=40)
+    large.put("b", 2, size=40)
+    assert list(large.keys()) == ["b"]
+    assert list(small.keys()) == ["a"]
+    assert manager.bytes == 70
+
+    manager.set_budget(50)
+    assert len(large) == 0 and len(small) == 1
+    small.remove_if(lambda key: key == "a")
+    assert manager.bytes == 0
+    assert manager.snapshot()["regions"]["test_large"]["evictions"] == 2
+    assert "test_small" in get_cache_stats()
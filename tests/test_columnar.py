@@ -0,0 +1,103 @@
+import csv
+import os
+
+import pytest
+
+from roslaunch_analyzer.columnar import COMPOSABLE_NODE, NodeTable, export_trees
+
+
+def _node(name, namespace, parameters=()):
+    return {
+        "type": "Node",
+        "package": "demo",
+        "executable": f"{name}_exe",
+        "name": name,
+        "namespace": namespace,
+        "parameters": list(parameters),
+        "global_parameters": [{"__parameter_file__": "/ws/global.yaml"}],
+        "children": [],
+    }
+
+
+def _tree(robot):
+    load = {
+        "type": "LoadComposableNodes",
+        "target_container": f"/{robot}/container",
+        "loaded_nodes": [
+            {
+                "package": "demo",
+                "plugin": "demo::Filter",
+                "namespace": robot,
+                "name": "filter",
+                "parameters": [],
+            }
+        ],
+        "children": [],
+    }
+    include = {
+        "type": "IncludeLaunchDescription",
+        "path": "/ws/launch/child.launch.xml",
+        "package": "demo",
+        "children": [_node("listener", f"{robot}/")],
+    }
+    return {
+        "type": "IncludeLaunchDescription",
+        "path": "/ws/launch/main.launch.xml",
+        "package": None,
+        "children": [
+            _node("talker", robot, [{"__parameter_file__": "/ws/talker.yaml"}]),
+            include,
+            load,
+        ],
+    }
+
+
+def test_rows_decode_the_trees():
+    table = NodeTable()
+    assert table.append_tree(_tree("a")) == 0
+    assert table.append_tree(_tree("b")) == 1
+    assert len(table) == 12
+    # The strings are encoded once across trees.
+    assert table.dictionaries["name"].values == ["talker", "listener", "filter"]
+
+    rows = list(table.rows())
+    root, talker, include, listener, load, loaded = rows[:6]
+    assert (root["parent"], talker["parent"], listener["parent"]) == (-1, 0, 2)
+    assert root["name"] is None
+    assert talker["fully_qualified_name"] == "/a/talker"
+    assert talker["parameter_files"] == ["/ws/global.yaml", "/ws/talker.yaml"]
+    assert listener["namespace"] == "/a"
+    assert listener["include_path"] == "/ws/launch/child.launch.xml"
+    assert include["package"] == "demo"
+    assert (loaded["type"], loaded["parent"], loaded["depth"]) == (
+        COMPOSABLE_NODE,
+        4,
+        2,
+    )
+    assert loaded["executable"] == "demo::Filter"
+    assert loaded["parameter_files"] == []
+    assert rows[6]["tree"] == 1 and rows[6]["parent"] == -1
+
+
+def test_csv_export(tmp_path):
+    path = str(tmp_path / "nodes.csv")
+    table = export_trees([_tree("a"), _tree("b")], path)
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == len(table)
+    assert rows[1]["fully_qualified_name"] == "/a/talker"
+    assert rows[1]["parameter_files"].split(os.pathsep) == [
+        "/ws/global.yaml",
+        "/ws/talker.yaml",
+    ]
+    assert rows[0]["name"] == ""
+
+
+def test_numpy_arrays():
+    numpy = pytest.importorskip("numpy")
+    table = NodeTable()
+    table.append_tree(_tree("a"))
+    arrays = table.to_numpy()
+    names = arrays["name_dictionary"][arrays["name"][arrays["name"] >= 0]]
+    assert list(names) == ["talker", "listener", "filter"]
+    assert arrays["parent"].dtype == numpy.int32
@@ -0,0 +1,48 @@
+from roslaunch_language_server.helper.completion_context import (
+    MAX_TAG_LOOKBACK_LINES,
+    CompletionContext,
+    CompletionContextKind,
+    get_completion_context,
+)
+
+
+def _context(source):
+    lines = source.split("\n")
+    return get_completion_context(lines, len(lines) - 1, len(lines[-1]))
+
+
+def test_substitutions_are_classified():
+    assert _context('<let name="a" value="$(fi') == CompletionContext(
+        CompletionContextKind.SUBSTITUTION, "fi"
+    )
+    assert _context('<let name="a" value="x $(var na') == CompletionContext(
+        CompletionContextKind.VAR_ARG, "na"
+    )
+    assert _context('<let name="a" value="$(env HO') == CompletionContext(
+        CompletionContextKind.ENV_ARG, "HO"
+    )
+    assert _context(
+        '<include file="$(find-pkg-share demo)/launch/ma'
+    ) == CompletionContext(
+        CompletionContextKind.FIND_PKG_SHARE_PATH, "/launch/ma", package_name="demo"
+    )
+    assert _context('<let name="a" value="$(env HOME)/.ro') == CompletionContext(
+        CompletionContextKind.ENV_HOME_PATH, "/.ro"
+    )
+    assert _context('<let name="a" value="$(env USER)/') is None
+    assert _context("<launch>") is None
+
+
+def test_node_pkg_needs_a_node_start_tag():
+    assert _context('<node\n    exec="talker"\n    pkg="de') == CompletionContext(
+        CompletionContextKind.NODE_PKG, "de"
+    )
+    assert _context('<include pkg="de') is None
+    assert _context('<node exec="talker"/>\n<arg pkg="de') is None
+
+
+def test_start_tags_are_looked_back_a_bounded_number_of_lines():
+    # The cursor line and the lines above it, up to the limit.
+    attributes = '\n  a="b"' * (MAX_TAG_LOOKBACK_LINES - 2)
+    assert _context(f'<node{attributes}\n  pkg="') is not None
+    assert _context(f'<node\n  a="b"{attributes}\n  pkg="') is None
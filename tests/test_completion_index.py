@@ -0,0 +1,38 @@
+from roslaunch_language_server.helper.completion_index import CompletionIndex
+
+WORDS = ["demo_nodes", "demo", "nav2_demo", "rviz", "demo_nodes_cpp", "Demo_Tools"]
+
+
+class _Document:
+    pass
+
+
+def test_prefix_matches_rank_before_infix_matches():
+    index = CompletionIndex(WORDS)
+    assert index.query("demo") == (
+        ["demo", "demo_nodes", "demo_nodes_cpp", "nav2_demo", "Demo_Tools"],
+        False,
+    )
+    assert CompletionIndex(WORDS, infix=False).query("demo") == (
+        ["demo", "demo_nodes", "demo_nodes_cpp"],
+        False,
+    )
+
+
+def test_results_are_bounded():
+    index = CompletionIndex([f"pkg_{number}" for number in range(10)], limit=3)
+    assert index.query("pkg") == (["pkg_0", "pkg_1", "pkg_2"], True)
+    assert index.query("") == (["pkg_0", "pkg_1", "pkg_2"], True)
+    assert index.query("_9") == (["pkg_9"], False)
+
+
+def test_extended_queries_narrow_the_previous_candidates():
+    index = CompletionIndex(WORDS)
+    document = _Document()
+    hits = index._stats.hits
+    assert "Demo_Tools" in index.query("o", document)[0]
+    assert index.query("od", document)[0] == ["demo_nodes", "demo_nodes_cpp"]
+    assert index._stats.hits == hits + 1
+    # Another query starts over.
+    assert index.query("rv", document)[0] == ["rviz"]
+    assert index._stats.hits == hits + 1
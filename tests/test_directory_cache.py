@@ -0,0 +1,33 @@
+import os
+
+from roslaunch_language_server.helper.directory_cache import (
+    DirectoryEntry,
+    DirectoryListingCache,
+)
+
+
+def test_listings_are_sorted_and_typed(tmp_path):
+    (tmp_path / "launch").mkdir()
+    (tmp_path / "b.yaml").write_text("")
+    (tmp_path / "a.xml").write_text("")
+    cache = DirectoryListingCache()
+    assert cache.list(str(tmp_path)) == [
+        DirectoryEntry("a.xml", False),
+        DirectoryEntry("b.yaml", False),
+        DirectoryEntry("launch", True),
+    ]
+    assert cache.list(str(tmp_path / "a.xml")) is None
+    assert cache.list(str(tmp_path / "missing")) is None
+
+
+def test_listings_are_trusted_then_revalidated(tmp_path):
+    cache = DirectoryListingCache(revalidate_interval=60.0)
+    assert cache.list(str(tmp_path)) == []
+    (tmp_path / "new.xml").write_text("")
+    assert cache.list(str(tmp_path)) == []
+
+    cache.revalidate_interval = 0.0
+    # Make sure the directory mtime differs on coarse-grained file systems.
+    stat = os.stat(tmp_path)
+    os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cache.list(str(tmp_path)) == [DirectoryEntry("new.xml", False)]
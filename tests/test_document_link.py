@@ -0,0 +1,48 @@
+from pygls.uris import from_fs_path
+from pygls.workspace import TextDocument
+
+from roslaunch_language_server.features.document_link import DocumentLinkProvider
+from roslaunch_language_server.helper.document_model import DocumentModelStore
+from roslaunch_language_server.helper.package_paths import package_paths
+from roslaunch_language_server.snapshot import startup_snapshot
+
+SOURCE = """<launch>
+  <include file="$(find-pkg-share demo)/launch/main.launch.xml"/>
+  <include file="$(find-pkg-share demo)/launch/main.launch.xml"/>
+  <include file="$(find-pkg-share demo)/launch/missing.launch.xml"/>
+  <include file="$(find-pkg-share other)/launch/main.launch.xml"/>
+  <include file="$(find-pkg-share demo)/$(var file)"/>
+</launch>
+"""
+
+
+def test_links_resolve_each_path_once(tmp_path, monkeypatch):
+    share = tmp_path / "share" / "demo" / "launch"
+    share.mkdir(parents=True)
+    (share / "main.launch.xml").write_text("<launch/>")
+    monkeypatch.setattr(startup_snapshot, "_package_prefixes", {"demo": str(tmp_path)})
+    monkeypatch.setattr(package_paths, "revalidate_interval", 0.0)
+
+    resolved = []
+    resolve = package_paths.resolve
+
+    def counting_resolve(package_name, relative_path):
+        resolved.append((package_name, relative_path))
+        return resolve(package_name, relative_path)
+
+    monkeypatch.setattr(package_paths, "resolve", counting_resolve)
+
+    provider = DocumentLinkProvider(DocumentModelStore())
+    doc = TextDocument("file:///test.launch.xml", SOURCE, version=1)
+    links = provider.links(doc)
+    target = from_fs_path(str(share / "main.launch.xml"))
+    assert [(link.range.start.line, link.target) for link in links] == [
+        (1, target),
+        (2, target),
+    ]
+    assert links[0].range.start.character == SOURCE.split("\n")[1].index("$(")
+    assert links[0].range.end.character == SOURCE.split("\n")[1].rindex('"')
+    assert len(resolved) == 3
+
+    assert provider.links(doc) is links
+    assert len(resolved) == 3
@@ -0,0 +1,90 @@
+import json
+import timeit
+
+from roslaunch_analyzer.encoding import (
+    decode_interned,
+    dumps_interned,
+    encode_interned,
+    loads_interned,
+)
+
+PACKAGES = [
+    f"autoware_{area}_component"
+    for area in "perception planning control sensing localization map".split()
+]
+
+
+def _node(index):
+    package = PACKAGES[index % len(PACKAGES)]
+    return {
+        "type": "Node",
+        "package": package,
+        "executable": f"{package}_node",
+        "name": f"node_{index}",
+        "namespace": f"/{package.split('_')[1]}/sub{index % 5}",
+        "parameters": [
+            {"__parameter_file__": f"/opt/ros/share/{package}/config/node.yaml"},
+            {"use_sim_time": False, "rate": 10.0, "frame_id": "base_link"},
+            {"max_count": index},
+        ],
+        "global_parameters": [{"use_sim_time": False}],
+        "children": [],
+    }
+
+
+def _tree(depth, number):
+    package = PACKAGES[depth % len(PACKAGES)]
+    path = f"/opt/ros/share/{package}/launch/l{depth}_{number}.launch.xml"
+    if depth == 0:
+        children = [_node(number * 10 + k) for k in range(10)]
+    else:
+        children = [
+            {
+                "type": "GroupAction",
+                "children": [_tree(depth - 1, number * 4 + k) for k in range(4)],
+            }
+        ]
+    return {
+        "type": "IncludeLaunchDescription",
+        "path": path,
+        "package": package,
+        "children": children,
+    }
+
+
+def _speedup(baseline, function, rounds=9):
+    # The median of back-to-back ratios is robust against a noisy machine.
+    ratios = sorted(
+        timeit.timeit(baseline, number=2) / timeit.timeit(function, number=2)
+        for _ in range(rounds)
+    )
+    return ratios[rounds // 2]
+
+
+def test_round_trip():
+    data = {
+        "numbers": [0, 1, -3, 2.5, 1.0, 1e-05, 10**20],
+        "constants": [True, False, None],
+        "strings": ["", "1", 'a"b:c', "é", "0"],
+        "tuple": (1, "1"),
+        "nested": {"1": {"2": []}},
+    }
+    expected = json.loads(json.dumps(data))
+    assert loads_interned(dumps_interned(data)) == expected
+    assert decode_interned(json.loads(json.dumps(encode_interned(data)))) == expected
+
+
+def test_faster_than_indented_json():
+    tree = _tree(4, 0)
+    indented = json.dumps(tree, indent=2)
+    interned = dumps_interned(tree)
+    assert loads_interned(interned) == tree
+    assert len(interned) * 4 < len(indented)
+
+    assert (
+        _speedup(lambda: json.dumps(tree, indent=2), lambda: dumps_interned(tree)) > 5
+    )
+    # Decoding runs in the C parser, like json.loads; it is about as fast.
+    assert (
+        _speedup(lambda: json.loads(indented), lambda: loads_interned(interned)) > 0.7
+    )
@@ -0,0 +1,54 @@
+from roslaunch_language_server.features.hover import (
+    _element_positions,
+    build_hover_index,
+)
+from roslaunch_language_server.helper.syntax import SyntaxTree
+
+SOURCE = """<launch>
+  <arg name="x" default="default"/>
+  <node pkg="demo" exec="skipped" name="skipped" if="false"/>
+  <group>
+    <let name="x" value="grouped"/>
+    <node pkg="demo" exec="talker" name="talker">
+      <param name="value" value="$(var x)"/>
+    </node>
+  </group>
+  <node pkg="demo" exec="listener" name="listener" args="$(var x)"/>
+  <let name="x" value="last"/>
+</launch>
+"""
+
+
+def _hover(index, needle, occurrence=0):
+    offset = -1
+    for _ in range(occurrence + 1):
+        offset = SOURCE.index(needle, offset + 1)
+    found = index.find(offset)
+    return found[2] if found is not None else None
+
+
+def test_element_positions_follow_the_document():
+    syntax = SyntaxTree(SOURCE)
+    positions = {
+        element.get("name", element.tag): position
+        for element, position in _element_positions(syntax).items()
+    }
+    assert positions["launch"] == ()
+    assert positions["group"] == (2,)
+    assert positions["skipped"] == (1,)
+    assert positions["talker"] == (2, 1)
+    assert positions["value"] == (2, 1, 0)
+    assert positions["listener"] == (3,)
+
+
+def test_hover_uses_the_configurations_of_the_element(build_launch_file):
+    tree = build_launch_file(SOURCE, arguments=[("x", "override")])
+    index = build_hover_index(SyntaxTree(SOURCE), tree)
+
+    # The node skipped by its condition does not shift the others.
+    assert _hover(index, "<node", 0) is None
+    assert _hover(index, "<node", 1).startswith("**/talker**")
+    assert _hover(index, "<node", 2).startswith("**/listener**")
+
+    assert _hover(index, "$(var x)", 0) == "`x` = `grouped`"
+    assert _hover(index, "$(var x)", 1) == "`x` = `override`"
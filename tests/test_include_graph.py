@@ -0,0 +1,80 @@
+from typer.testing import CliRunner
+
+from roslaunch_analyzer.cli import cli
+from roslaunch_analyzer.include_graph import (
+    BUILD,
+    STATIC,
+    IncludeGraph,
+    resolve_include_file,
+    scan_directories,
+)
+
+
+def _workspace(tmp_path):
+    launch = tmp_path / "demo" / "launch"
+    launch.mkdir(parents=True)
+    (launch / "main.launch.xml").write_text(
+        '<launch><include file="$(dirname)/sensing.launch.xml"/></launch>'
+    )
+    (launch / "sensing.launch.xml").write_text(
+        '<launch><include file="lidar.launch.xml"/></launch>'
+    )
+    (launch / "lidar.launch.xml").write_text("<launch/>")
+    return launch
+
+
+def test_resolve_include_file():
+    def find_package(package, path):
+        return f"/opt/{package}/share{path}"
+
+    assert resolve_include_file("/ws/a/main.xml", "b.xml") == "/ws/a/b.xml"
+    assert resolve_include_file("/ws/a/main.xml", "$(dirname)/b.xml") == "/ws/a/b.xml"
+    assert (
+        resolve_include_file(
+            "/ws/main.xml", "$(find-pkg-share demo)/b.xml", find_package
+        )
+        == "/opt/demo/share/b.xml"
+    )
+    assert resolve_include_file("/ws/main.xml", "$(var file)") is None
+
+
+def test_origins_are_recorded_separately():
+    graph = IncludeGraph()
+    graph.set_includes("/ws/main.xml", ["/ws/a.xml"], STATIC)
+    graph.set_includes("/ws/main.xml", ["/ws/a.xml", "/ws/b.xml"], BUILD)
+    graph.set_includes("/ws/a.xml", ["/ws/c.xml"], STATIC)
+    assert graph.dependents("/ws/c.xml") == {"/ws/a.xml", "/ws/main.xml"}
+    assert graph.roots("/ws/c.xml") == {"/ws/main.xml"}
+
+    graph.remove("/ws/main.xml", BUILD)
+    assert graph.includes("/ws/main.xml") == {"/ws/a.xml"}
+    assert graph.includers("/ws/b.xml") == set()
+    assert graph.roots("/ws/main.xml") == {"/ws/main.xml"}
+
+
+def test_scanned_graph_is_saved_and_loaded(tmp_path):
+    launch = _workspace(tmp_path)
+    graph = scan_directories([str(tmp_path)])
+    lidar = str(launch / "lidar.launch.xml")
+    assert graph.roots(lidar) == {str(launch / "main.launch.xml")}
+
+    graph.save(str(tmp_path / "graph.json"))
+    loaded = IncludeGraph.load(str(tmp_path / "graph.json"))
+    assert loaded.dependents(lidar) == graph.dependents(lidar)
+
+
+def test_rdeps_reads_the_graph_written_by_the_graph_command(tmp_path):
+    launch = _workspace(tmp_path)
+    output = str(tmp_path / "graph.json")
+    runner = CliRunner()
+    result = runner.invoke(
+        cli, ["graph", "--output", output, "--search-path", str(tmp_path)]
+    )
+    assert result.exit_code == 0, result.output
+
+    (launch / "main.launch.xml").unlink()
+    result = runner.invoke(
+        cli, ["rdeps", str(launch / "lidar.launch.xml"), "--graph", output, "--roots"]
+    )
+    assert result.exit_code == 0, result.output
+    assert result.output.split() == [str(launch / "main.launch.xml")]
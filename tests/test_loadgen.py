@@ -0,0 +1,101 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+import typer
+
+from roslaunch_language_server.loadgen import generate_document, parse_mix
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+
+
+def test_positions_point_into_the_generated_text(tmp_path):
+    document = generate_document(str(tmp_path), 0, 12, ["demo"])
+    with open(document.path) as f:
+        assert f.read() == document.text
+    assert (tmp_path / "synthetic_0_10.xml").exists()
+
+    lines = document.text.split("\n")
+    before = [
+        lines[line][:character] for line, character in document.definition_positions
+    ]
+    assert {text[-10:] for text in before} == {"$(var arg_", "(dirname)/"}
+    before = [
+        lines[line][:character] for line, character in document.completion_positions
+    ]
+    assert {text[-6:] for text in before} == {' pkg="', "share ", "$(var "}
+
+
+def test_mixes_are_validated():
+    assert parse_mix("completion=6, edit=0.5") == {"completion": 6.0, "edit": 0.5}
+    with pytest.raises(typer.BadParameter):
+        parse_mix("hover=1")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+def test_load_is_reported_per_interval(tmp_path):
+    port = _free_port()
+    env = dict(os.environ, PYTHONPATH=SRC, XDG_CACHE_HOME=str(tmp_path / "cache"))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "roslaunch_language_server.cli", "--port", str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection(("localhost", port)).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        output = tmp_path / "reports.json"
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "roslaunch_language_server.loadgen",
+                "--port",
+                str(port),
+                "--clients",
+                "2",
+                "--documents",
+                "1",
+                "--size",
+                "20",
+                "--rate",
+                "50",
+                # Parse requests need ROS.
+                "--mix",
+                "completion=1,definition=1,edit=1",
+                "--duration",
+                "1",
+                "--interval",
+                "0.4",
+                "--output",
+                str(output),
+            ],
+            env=env,
+            capture_output=True,
+            check=True,
+            timeout=60,
+        )
+    finally:
+        server.terminate()
+        server.wait()
+
+    with open(output) as f:
+        reports = json.load(f)
+    assert len(reports) == 2
+    assert all(report["rss"] for report in reports)
+    requests = {kind for report in reports for kind in report["requests"]}
+    assert requests == {"completion", "definition"}
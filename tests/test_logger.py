@@ -0,0 +1,51 @@
+import asyncio
+import logging
+
+from lsprotocol.types import MessageType
+
+from roslaunch_language_server.logger import LSPLogHandler
+
+
+class _Client:
+    def __init__(self, loop):
+        self.loop = loop
+        self.messages = []
+
+    def show_message_log(self, message, message_type):
+        self.messages.append((message, message_type))
+
+
+def _record(level, message):
+    return logging.LogRecord("test", level, __file__, 1, message, None, None)
+
+
+def test_records_are_sent_in_one_batch():
+    loop = asyncio.new_event_loop()
+    client = _Client(loop)
+    handler = LSPLogHandler(client, flush_interval=0.01)
+    try:
+        handler.handle(_record(logging.INFO, "first"))
+        handler.handle(_record(logging.WARNING, "second"))
+        assert client.messages == []
+        loop.run_until_complete(asyncio.sleep(0.1))
+    finally:
+        loop.close()
+    assert client.messages == [("first\nsecond", MessageType.Warning)]
+
+
+def test_low_level_records_are_dropped_when_the_queue_is_full():
+    loop = asyncio.new_event_loop()
+    client = _Client(loop)
+    other = _Client(loop)
+    handler = LSPLogHandler(client, max_pending=2, ring_size=3)
+    handler.attach(other)
+    for index in range(3):
+        handler.handle(_record(logging.DEBUG, f"debug {index}"))
+    handler.handle(_record(logging.ERROR, "error"))
+    loop.close()
+
+    handler.flush()
+    expected = ("debug 1\nerror\n(2 log records dropped)", MessageType.Error)
+    assert client.messages == [expected]
+    assert other.messages == [expected]
+    assert handler.dump() == ["debug 1", "debug 2", "error"]
@@ -0,0 +1,82 @@
+import os
+
+from roslaunch_analyzer.parameter_engine import (
+    INLINE_SOURCE,
+    PARAMETER_FILE_KEY,
+    SET_PARAMETER_SOURCE,
+    ParameterValue,
+    effective_parameters,
+    load_parameter_file,
+    parameter_files,
+)
+
+PARAMETERS = """/sensing:
+  lidar:
+    ros__parameters:
+      rate: 10
+      filter:
+        enabled: true
+"/**":
+  ros__parameters:
+    use_sim_time: false
+    rate: 1
+/sensing/*:
+  ros__parameters:
+    frame: base
+"""
+
+
+def _write(tmp_path, source=PARAMETERS):
+    path = str(tmp_path / "params.yaml")
+    with open(path, "w") as f:
+        f.write(source)
+    return path
+
+
+def test_sections_match_nested_and_wildcard_names(tmp_path):
+    path = _write(tmp_path)
+    parameter_file = load_parameter_file(path)
+    assert parameter_file.parameters_for("/sensing/lidar") == {
+        # The wildcard section comes later and overrides the rate.
+        "rate": ParameterValue(1, path, 10),
+        "filter.enabled": ParameterValue(True, path, 6),
+        "use_sim_time": ParameterValue(False, path, 9),
+        "frame": ParameterValue("base", path, 13),
+    }
+    assert parameter_file.parameters_for("/sensing/lidar/points") == {
+        "use_sim_time": ParameterValue(False, path, 9),
+        "rate": ParameterValue(1, path, 10),
+    }
+    assert load_parameter_file(_write(tmp_path, "")).parameters_for("/a") == {}
+
+
+def test_later_parameters_override_earlier_ones(tmp_path):
+    path = _write(tmp_path)
+    parameters, errors = effective_parameters(
+        "/sensing/lidar",
+        [
+            {"rate": 20, "extra": "x"},
+            {PARAMETER_FILE_KEY: path},
+            {PARAMETER_FILE_KEY: str(tmp_path / "missing.yaml")},
+        ],
+        [{"frame": "map", "global": 1}],
+    )
+    assert list(parameters) == sorted(parameters)
+    assert parameters["global"] == ParameterValue(1, SET_PARAMETER_SOURCE)
+    assert parameters["extra"] == ParameterValue("x", INLINE_SOURCE)
+    assert parameters["rate"] == ParameterValue(1, path, 10)
+    assert parameters["frame"] == ParameterValue("base", path, 13)
+    assert len(errors) == 1 and "missing.yaml" in errors[0]
+
+
+def test_files_are_parsed_again_when_modified(tmp_path):
+    path = _write(tmp_path)
+    first = parameter_files.load(path)
+    assert parameter_files.load(path) is first
+
+    _write(tmp_path, PARAMETERS.replace("rate: 1\n", "rate: 2\n"))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    second = parameter_files.load(path)
+    assert second is not first
+    assert second.parameters_for("/other")["rate"].value == 2
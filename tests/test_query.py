@@ -0,0 +1,98 @@
+from roslaunch_analyzer.query import (
+    COMPOSABLE_NODE,
+    LaunchTreeIndex,
+    fully_qualified_name,
+    normalize_namespace,
+)
+
+
+def _node(name, namespace, parameters=(), kind="Node"):
+    return {
+        "type": kind,
+        "package": "demo",
+        "executable": f"{name}_exe",
+        "name": name,
+        "namespace": namespace,
+        "parameters": list(parameters),
+        "global_parameters": [],
+        "children": [],
+    }
+
+
+def _tree():
+    container = _node("container", "/sensing", kind="ComposableNodeContainer")
+    load = {
+        "type": "LoadComposableNodes",
+        "target_container": "/sensing/container",
+        "loaded_nodes": [
+            {
+                "package": "demo",
+                "plugin": "demo::Filter",
+                "namespace": "/sensing/lidar",
+                "name": "filter",
+                # A composable node without parameters.
+                "parameters": [],
+                "global_parameters": [],
+            }
+        ],
+        "children": [],
+    }
+    return {
+        "type": "IncludeLaunchDescription",
+        "path": "/ws/launch/main.launch.xml",
+        "package": None,
+        "children": [
+            _node("talker", "sensing", [{"__parameter_file__": "/ws/talker.yaml"}]),
+            _node("listener", "/sensing/lidar/"),
+            container,
+            load,
+        ],
+    }
+
+
+def test_names_are_normalized():
+    assert normalize_namespace("sensing/") == "/sensing"
+    assert normalize_namespace("") == "/"
+    assert fully_qualified_name("/", "talker") == "/talker"
+    assert fully_qualified_name("/a", "/b/c") == "/b/c"
+
+
+def test_query_by_criteria():
+    index = LaunchTreeIndex(_tree())
+    assert [node.name for node in index.by_name("/sensing/talker")] == ["talker"]
+    assert [node.name for node in index.query(namespace="/sensing")] == [
+        "talker",
+        "container",
+    ]
+    assert [
+        node.name for node in index.query(namespace="/sensing", recursive=True)
+    ] == ["talker", "listener", "container", "filter"]
+    assert [node.name for node in index.query(parameter_file="/ws/talker.yaml")] == [
+        "talker"
+    ]
+    assert index.query(name="/sensing/talker", package="other") == []
+
+
+def test_composable_node_without_parameters_joins_its_container():
+    (node,) = LaunchTreeIndex(_tree()).query(container="/sensing/container")
+    assert node.kind == COMPOSABLE_NODE
+    assert node.executable == "demo::Filter"
+    assert node.parameter_files == []
+    assert node.container.fully_qualified_name == "/sensing/container"
+    assert node.as_dict()["container"] == "/sensing/container"
+
+
+def test_built_composable_node_without_parameters(build_launch_file):
+    from roslaunch_analyzer.query import index_tree
+
+    tree = build_launch_file("""<launch>
+  <node_container pkg="rclcpp_components" exec="component_container"
+      name="container" namespace="sensing"/>
+  <load_composable_node target="/sensing/container">
+    <composable_node pkg="demo" plugin="demo::Filter" name="filter"/>
+  </load_composable_node>
+</launch>
+""")
+    (node,) = index_tree(tree).query(executable="demo::Filter")
+    assert node.parameters == []
+    assert node.container is not None
@@ -0,0 +1,121 @@
+import json
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+from roslaunch_language_server.recorder import (
+    MessageBuffer,
+    RecordedMessage,
+    SessionRecorder,
+    encode_message,
+    read_recording,
+)
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+
+URI = "file:///test.launch.xml"
+
+SOURCE = """<launch>
+  <arg name="rate" default="1"/>
+  <let name="x" value="$(var r"/>
+</launch>
+"""
+
+MESSAGES = [
+    {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "initialize",
+        "params": {"processId": None, "rootUri": None, "capabilities": {}},
+    },
+    {"jsonrpc": "2.0", "method": "initialized", "params": {}},
+    {
+        "jsonrpc": "2.0",
+        "method": "textDocument/didOpen",
+        "params": {
+            "textDocument": {
+                "uri": URI,
+                "languageId": "xml",
+                "version": 1,
+                "text": SOURCE,
+            }
+        },
+    },
+    {
+        "jsonrpc": "2.0",
+        "id": 2,
+        "method": "textDocument/completion",
+        "params": {
+            "textDocument": {"uri": URI},
+            "position": {"line": 2, "character": 30},
+        },
+    },
+    {"jsonrpc": "2.0", "id": 3, "method": "shutdown"},
+]
+
+
+def test_messages_are_split_across_chunks():
+    data = b"Invalid: header\r\n\r\n" + b"".join(
+        encode_message(message) for message in MESSAGES
+    )
+    buffer = MessageBuffer()
+    bodies = []
+    for start in range(0, len(data), 7):
+        bodies.extend(buffer.feed(data[start : start + 7]))
+    assert [json.loads(body) for body in bodies] == MESSAGES
+
+
+def test_recordings_keep_the_received_messages(tmp_path):
+    path = str(tmp_path / "recording.jsonl")
+    recorder = SessionRecorder(path)
+    first_received, second_received = [], []
+    first = SimpleNamespace(lsp=SimpleNamespace(data_received=first_received.append))
+    second = SimpleNamespace(lsp=SimpleNamespace(data_received=second_received.append))
+    recorder.attach(first)
+    recorder.attach(second)
+
+    data = b"".join(encode_message(message) for message in MESSAGES)
+    first.lsp.data_received(data[:10])
+    second.lsp.data_received(data)
+    first.lsp.data_received(data[10:])
+    recorder.close()
+
+    assert first_received == [data[:10], data[10:]]
+    assert second_received == [data]
+    recording = read_recording(path)
+    assert [(message.session, message.message) for message in recording] == [
+        (2, message) for message in MESSAGES
+    ] + [(1, message) for message in MESSAGES]
+
+
+def test_recordings_replay_against_a_fresh_server(tmp_path):
+    path = tmp_path / "recording.jsonl"
+    with open(path, "w") as f:
+        for index, message in enumerate(MESSAGES):
+            recorded = RecordedMessage(session=1, time=index * 0.01, message=message)
+            f.write(json.dumps(recorded.__dict__) + "\n")
+
+    output = tmp_path / "report.json"
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "roslaunch_language_server.replay",
+            str(path),
+            "--repeat",
+            "2",
+            "--output",
+            str(output),
+        ],
+        env=dict(os.environ, PYTHONPATH=SRC, XDG_CACHE_HOME=str(tmp_path / "cache")),
+        capture_output=True,
+        check=True,
+    )
+    with open(output) as f:
+        report = json.load(f)
+    assert {method: stats["requests"] for method, stats in report.items()} == {
+        "initialize": 2,
+        "textDocument/completion": 2,
+        "shutdown": 2,
+    }
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from roslaunch_analyzer import sandbox
+from roslaunch_analyzer.sandbox import (
+    Sandbox,
+    SandboxLimitError,
+    dumps_message,
+    loads_message,
+)
+
+CHILD = """
+from launch import LaunchDescription
+from launch_ros.actions import Node, SetParameter
+
+
+def generate_launch_description():
+    return LaunchDescription(
+        [
+            SetParameter(name="rate", value=10),
+            Node(package="demo", executable="inside", name="inside"),
+        ]
+    )
+"""
+
+ROOT = """<launch>
+  <set_parameter name="use_sim_time" value="true"/>
+  <include file="$(dirname)/child.launch.py"/>
+  <node pkg="demo" exec="after" name="after"/>
+</launch>
+"""
+
+
+def test_messages_keep_tuples():
+    message = {
+        "launch_configurations": {
+            "global_params": [("use_sim_time", True), "/ws/params.yaml"],
+            "ros_remaps": [("/in", "/out")],
+        },
+        "environment": {"HOME": "/root"},
+    }
+    assert loads_message(dumps_message(message)) == message
+    assert "\n" not in dumps_message({"text": "a\nb"})
+
+
+def test_sandboxed_include_serializes_like_in_process(
+    tmp_path, build_launch_file, fresh_subtrees
+):
+    (tmp_path / "child.launch.py").write_text(CHILD)
+    in_process = build_launch_file(ROOT).serialize()
+
+    sandbox.enable_sandbox(timeout=60.0, memory=None)
+    try:
+        sandboxed = build_launch_file(ROOT).serialize()
+    finally:
+        sandbox.sandbox.close()
+        sandbox.sandbox = None
+
+    # Tuples and lists dump alike.
+    assert json.dumps(sandboxed, sort_keys=True) == json.dumps(
+        in_process, sort_keys=True
+    )
+    global_parameters = in_process["children"][-1]["global_parameters"]
+    assert [list(parameter) for parameter in global_parameters] == [
+        ["use_sim_time"],
+        ["rate"],
+    ]
+
+
+def test_timeout_kills_the_worker(tmp_path):
+    pytest.importorskip("launch_ros")
+    path = tmp_path / "slow.launch.py"
+    path.write_text(
+        "import time\n\n\ndef generate_launch_description():\n    time.sleep(60)\n"
+    )
+    limited = Sandbox(timeout=1.0, memory=None)
+    try:
+        with pytest.raises(SandboxLimitError):
+            limited.evaluate(str(path), {}, {}, {})
+        assert limited._idle == []
+    finally:
+        limited.close()
@@ -0,0 +1,98 @@
+import random
+
+from lsprotocol.types import (
+    Position,
+    Range,
+    SemanticTokensDelta,
+    TextDocumentContentChangeEvent_Type1,
+)
+from pygls.workspace import TextDocument
+
+from roslaunch_language_server.features.semantic_tokens import (
+    SemanticTokensProvider,
+    tokenize_line,
+)
+from roslaunch_language_server.helper.document_model import DocumentModelStore
+
+SOURCE = """<launch>
+  <arg name="a" default="1"/>
+  <!-- <arg name="commented"/>
+  -->
+  <group>
+    <let name="b" value="$(var a)"/>
+    <node pkg="demo" exec="talker"
+          namespace="$(env HOME)/$(find-pkg-share demo)/x">
+    </node>
+  </group>
+</launch>
+"""
+
+SNIPPETS = ["<", ">", '"', "$(", "var ", ")", "\n", "<!--", "-->", "x", 'name="q"']
+
+
+def _open(source, version=0):
+    store = DocumentModelStore()
+    provider = SemanticTokensProvider(store)
+    doc = TextDocument("file:///test.launch.xml", source, version=version)
+    store.open(doc)
+    return store, provider, doc
+
+
+def _apply(data, result):
+    if not isinstance(result, SemanticTokensDelta):
+        return list(result.data)
+    for edit in sorted(result.edits, key=lambda edit: -edit.start):
+        data[edit.start : edit.start + edit.delete_count] = edit.data
+    return data
+
+
+def test_line_tokens_keep_the_state_across_lines():
+    data, state = tokenize_line('  <let name="b" value="$(var a)"', None)
+    # The declaration, "$(", "var", "a" and ")".
+    assert [data[index + 3] for index in range(0, len(data), 5)] == [2, 0, 1, 2, 0]
+    assert state == "let"
+    data, state = tokenize_line('  name="c"/>', state)
+    assert data == [0, 8, 1, 2, 1]
+    assert state is None
+    assert tokenize_line('  <!-- name="c"', None) == ([], "!--")
+
+
+def test_deltas_match_a_full_tokenization():
+    random.seed(0)
+    store, provider, doc = _open(SOURCE)
+    result = provider.full(doc)
+    data = list(result.data)
+    for _ in range(200):
+        changes = []
+        for _ in range(random.randint(1, 2)):
+            lines = doc.lines
+            start = random.randint(0, len(lines) - 1)
+            end = random.randint(start, min(len(lines) - 1, start + 2))
+            start_character = random.randint(0, len(lines[start].rstrip("\n")))
+            end_character = random.randint(0, len(lines[end].rstrip("\n")))
+            if start == end and end_character < start_character:
+                start_character, end_character = end_character, start_character
+            change = TextDocumentContentChangeEvent_Type1(
+                range=Range(
+                    start=Position(start, start_character),
+                    end=Position(end, end_character),
+                ),
+                text="".join(random.choices(SNIPPETS, k=random.randint(0, 2))),
+            )
+            doc.apply_change(change)
+            changes.append(change)
+        doc.version += 1
+        store.change(doc, changes)
+        provider.change(doc, changes)
+
+        result = provider.delta(doc, result.result_id)
+        data = _apply(data, result)
+        _, reference, reference_doc = _open(doc.source, doc.version)
+        assert data == list(reference.full(reference_doc).data)
+
+
+def test_unknown_result_ids_get_all_tokens():
+    _, provider, doc = _open(SOURCE)
+    full = provider.full(doc)
+    assert provider.delta(doc, "unknown").data == full.data
+    assert provider.delta(doc, full.result_id).edits == []
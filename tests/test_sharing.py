@@ -0,0 +1,86 @@
+import copy
+import json
+
+import pytest
+
+from roslaunch_analyzer.sharing import (
+    REFERENCE_KEY,
+    content_id,
+    expand_definitions,
+    share,
+    share_definitions,
+)
+
+
+def _driver(index):
+    parameters = [
+        {"__parameter_file__": "/ws/install/driver/share/driver/config/driver.yaml"},
+        {"rate": 10.0},
+    ]
+    return {
+        "type": "GroupAction",
+        "children": [
+            {
+                "type": "Node",
+                "package": "driver",
+                "name": "driver",
+                "namespace": "/sensors/front",
+                "parameters": parameters,
+                "global_parameters": [],
+                "children": [],
+            },
+            {
+                "type": "Node",
+                "package": "filter",
+                "name": "filter",
+                "namespace": "/sensors/front",
+                "parameters": copy.deepcopy(parameters),
+                "global_parameters": [],
+                "children": [],
+            },
+        ],
+    }
+
+
+def _tree():
+    return {
+        "type": "IncludeLaunchDescription",
+        "path": "/ws/launch/main.launch.xml",
+        "children": [_driver(index) for index in range(3)]
+        + [{"type": "Node", "parameters": [{"a": 1}], "children": []}],
+    }
+
+
+def test_content_ids_ignore_key_order():
+    assert content_id({"a": 1, "b": [2]}) == content_id({"b": [2], "a": 1})
+    assert content_id({"a": 1}) != content_id({"a": 2})
+
+
+def test_equal_payloads_are_shared():
+    first = [{"rate": 10.0, "frame_id": "base_link"}]
+    second = copy.deepcopy(first)
+    assert share(first) is first
+    assert share(second) is first
+    assert share([]) == []
+
+
+def test_repeated_parts_are_defined_once():
+    tree = _tree()
+    document = share_definitions(tree)
+    definitions = document["definitions"]
+    # The repeated group, with the repeated parameter list inside it; the
+    # nodes themselves only occur in the group.
+    assert len(definitions) == 2
+    assert (
+        document["data"]["children"][:3]
+        == [{REFERENCE_KEY: document["data"]["children"][0][REFERENCE_KEY]}] * 3
+    )
+    # Short payloads are not worth a reference.
+    assert document["data"]["children"][3]["parameters"] == [{"a": 1}]
+
+    document = json.loads(json.dumps(document))
+    expanded = expand_definitions(document)
+    assert expanded == tree
+    assert expanded["children"][0] is expanded["children"][1]
+    with pytest.raises(ValueError):
+        expand_definitions({"format": "other"})
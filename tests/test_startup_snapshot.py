@@ -0,0 +1,85 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+
+# Runs one warm-up of the workspace index, as a server start does, and
+# prints how many launch files were summarized.
+WARM_UP = textwrap.dedent("""
+    import json
+    import sys
+
+    from roslaunch_language_server.helper import workspace_index as module
+
+    summarized = []
+    summarize = module.summarize_launch_file
+
+    def counting_summarize(path, source):
+        summarized.append(path)
+        return summarize(path, source)
+
+    module.summarize_launch_file = counting_summarize
+
+    class Progress:
+        def begin(self):
+            pass
+
+        def report(self, message, done, total):
+            pass
+
+        def end(self, message=None):
+            pass
+
+    index = module.WorkspaceIndex()
+    index._warm_up([sys.argv[1]], Progress())
+    print(json.dumps({"summarized": len(summarized), "files": len(index.files)}))
+    """)
+
+
+def _write_fake_ament_index(directory):
+    package = os.path.join(directory, "ament_index_python")
+    os.makedirs(package)
+    open(os.path.join(package, "__init__.py"), "w").close()
+    with open(os.path.join(package, "packages.py"), "w") as f:
+        f.write("def get_packages_with_prefixes():\n    return {}\n")
+
+
+def _warm_up(tmp_path, workspace):
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join([str(tmp_path / "site"), SRC]),
+        XDG_CACHE_HOME=str(tmp_path / "cache"),
+        AMENT_PREFIX_PATH="",
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", WARM_UP, str(workspace)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_second_start_uses_the_snapshot(tmp_path):
+    _write_fake_ament_index(str(tmp_path / "site"))
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    for name in ("a", "b", "c"):
+        (workspace / f"{name}.launch.xml").write_text(
+            f'<launch><arg name="{name}" default="1"/></launch>\n'
+        )
+
+    first = _warm_up(tmp_path, workspace)
+    assert first == {"summarized": 3, "files": 3}
+
+    second = _warm_up(tmp_path, workspace)
+    assert second == {"summarized": 0, "files": 3}
+
+    (workspace / "b.launch.xml").write_text('<launch><arg name="x"/></launch>\n')
+    os.utime(workspace / "b.launch.xml", (0, 0))
+    third = _warm_up(tmp_path, workspace)
+    assert third == {"summarized": 1, "files": 3}
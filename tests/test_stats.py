@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+import pytest
+from pygls.exceptions import JsonRpcRequestCancelled
+
+from roslaunch_language_server.stats import LatencyHistogram, StatsRegistry
+
+
+def test_percentiles_are_bucket_bounds():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(0.5) == 0.0
+    for _ in range(99):
+        histogram.record(0.001)
+    histogram.record(1.0)
+    assert 0.001 <= histogram.percentile(0.5) < 0.0012
+    assert histogram.percentile(0.99) < 0.0012
+    assert histogram.percentile(1.0) == 1.0
+    assert histogram.as_dict()["max_ms"] == 1000.0
+
+
+def test_handlers_are_instrumented(tmp_path):
+    registry = StatsRegistry()
+
+    @registry.instrument("sync")
+    def handler(fail=False, cancel=False):
+        if cancel:
+            raise JsonRpcRequestCancelled()
+        if fail:
+            raise ValueError("failed")
+        return "result"
+
+    @registry.instrument("async")
+    async def async_handler():
+        raise asyncio.CancelledError()
+
+    assert handler() == "result"
+    with pytest.raises(ValueError):
+        handler(fail=True)
+    with pytest.raises(JsonRpcRequestCancelled):
+        handler(cancel=True)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(async_handler())
+    assert handler.__name__ == "handler"
+
+    registry.dump(str(tmp_path / "stats.json"))
+    with open(tmp_path / "stats.json") as f:
+        snapshot = json.load(f)
+    assert {
+        name: (stats["requests"], stats["errors"], stats["cancellations"])
+        for name, stats in snapshot["handlers"].items()
+    } == {"sync": (3, 1, 1), "async": (1, 0, 1)}
+    assert "caches" in snapshot and "memory" in snapshot
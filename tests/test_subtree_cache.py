@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+MAIN = """<launch>
+  <include file="$(dirname)/child.launch.xml"/>
+  <node pkg="demo" exec="after" name="after" namespace="$(var ns)"/>
+</launch>
+"""
+
+CHILD = """<launch>
+  <let name="ns" value="sensing"/>
+  <set_env name="SUBTREE_CACHE_TEST" value="1"/>
+  <node pkg="demo" exec="talker" name="talker">
+    <param from="$(dirname)/params.yaml"/>
+  </node>
+</launch>
+"""
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    (tmp_path / "child.launch.xml").write_text(CHILD)
+    (tmp_path / "params.yaml").write_text("talker:\n  ros__parameters:\n    rate: 1\n")
+    yield tmp_path
+    os.environ.pop("SUBTREE_CACHE_TEST", None)
+
+
+def _touch(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_changes_are_applied_without_touching_other_keys():
+    pytest.importorskip("launch_ros")
+    from roslaunch_analyzer.tree import _apply, _changes
+
+    changes = _changes({"OLD": "x", "GONE": "y"}, {"OLD": "z", "NEW": "n"})
+    environment = {"OTHER": "1", "OLD": "x", "GONE": "y"}
+    _apply(environment, changes)
+    assert environment == {"OTHER": "1", "OLD": "z", "NEW": "n"}
+
+
+def test_reused_subtree_applies_its_changes(
+    workspace, build_launch_file, fresh_subtrees
+):
+    first = build_launch_file(MAIN).serialize()
+    hits = fresh_subtrees.stats.hits
+    os.environ.pop("SUBTREE_CACHE_TEST")
+
+    second = build_launch_file(MAIN).serialize()
+    assert fresh_subtrees.stats.hits > hits
+    assert second == first
+    assert second["children"][-1]["namespace"] == "/sensing"
+    assert os.environ["SUBTREE_CACHE_TEST"] == "1"
+
+
+def test_parameter_file_edit_invalidates_the_subtree(
+    workspace, build_launch_file, fresh_subtrees
+):
+    build_launch_file(MAIN)
+    _touch(workspace / "params.yaml")
+    misses = fresh_subtrees.stats.misses
+    hits = fresh_subtrees.stats.hits
+
+    build_launch_file(MAIN)
+    assert fresh_subtrees.stats.misses > misses
+    assert fresh_subtrees.stats.hits == hits
+
+
+def test_python_subtrees_are_not_cached(tmp_path, build_launch_file, fresh_subtrees):
+    (tmp_path / "child.launch.py").write_text(
+        "from launch import LaunchDescription\n\n\n"
+        "def generate_launch_description():\n"
+        "    return LaunchDescription([])\n"
+    )
+    build_launch_file('<launch><include file="$(dirname)/child.launch.py"/></launch>')
+    assert len(fresh_subtrees) == 0
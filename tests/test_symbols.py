@@ -0,0 +1,57 @@
+from pygls.workspace import TextDocument
+
+from roslaunch_language_server.features.definition import FindVarDefinition
+from roslaunch_language_server.helper.document_model import DocumentModel
+from roslaunch_language_server.helper.symbols import SymbolTable
+from roslaunch_language_server.helper.syntax import SyntaxTree
+
+SOURCE = """<launch>
+  <arg name="before" default="1"/>
+  <group>
+    <arg name="grouped" default="2"/>
+  </group>
+  <node pkg="demo" exec="talker" name="$(var CURSOR)">
+    <param name="value" value="$(var CURSOR)"/>
+  </node>
+  <arg name="self" default="$(var CURSOR)"/>
+  <let name="after" value="3"/>
+</launch>
+"""
+
+
+def _visible(occurrence):
+    offset = -1
+    for _ in range(occurrence + 1):
+        offset = SOURCE.index("CURSOR", offset + 1)
+    symbols = SymbolTable(SyntaxTree(SOURCE))
+    return [declaration.name for declaration in symbols.visible_at(offset)]
+
+
+def test_only_declarations_before_the_element_at_the_cursor_are_visible():
+    assert _visible(0) == ["before"]
+    assert _visible(1) == ["before"]
+
+
+def test_a_declaration_is_not_visible_in_its_own_element():
+    assert _visible(2) == ["before"]
+
+
+def test_var_definition_resolves_the_visible_declarations_of_the_name():
+    source = SOURCE.replace("$(var CURSOR)", "$(var before)", 1)
+    model = DocumentModel(source, 1)
+    doc = TextDocument("file:///test.launch.xml", source, version=1)
+    offset = source.index("$(var before)") + len("$(var ")
+    position = model.line_index.position_at_offset(offset)
+    definition = FindVarDefinition()
+    match = definition.pattern.search("before")
+
+    (location,) = definition.definition(doc, model, position, match)
+    assert location.range.start == model.line_index.position_at_offset(
+        source.index('"before"') + 1
+    )
+    assert (
+        definition.definition(
+            doc, model, position, definition.pattern.search("grouped")
+        )
+        == []
+    )
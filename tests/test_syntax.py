@@ -0,0 +1,90 @@
+import random
+
+from lsprotocol.types import Position, Range, TextDocumentContentChangeEvent_Type1
+
+from roslaunch_language_server.helper.document_model import DocumentModel
+from roslaunch_language_server.helper.line_index import LineIndex
+from roslaunch_language_server.helper.syntax import SyntaxTree
+
+SOURCE = """<launch>
+  <!-- <node pkg="commented"/> -->
+  <arg name="rate" default="10"/>
+  <group>
+    <node pkg="demo" exec="talker" name="talker">
+      <param name="rate" value="$(var rate)"/>
+    </node>
+  </group>
+</launch>
+"""
+
+
+def _shape(tree):
+    return [
+        (
+            element.tag,
+            element.start,
+            element.start_tag_end,
+            element.end,
+            depth,
+            [
+                (attribute.name, attribute.value, attribute.value_start)
+                for attribute in element.attributes.values()
+            ],
+        )
+        for element, depth in _walk(tree.root, 0)
+    ]
+
+
+def _walk(element, depth):
+    for child in element.children:
+        yield child, depth
+        yield from _walk(child, depth + 1)
+
+
+def test_tolerant_parse():
+    tree = SyntaxTree('<launch>\n  <node pkg="demo"\n  <arg name="x"/>\n</group>')
+    assert [element.tag for element, _ in _walk(tree.root, 0)] == [
+        "launch",
+        "node",
+        "arg",
+    ]
+    node = tree.elements_by_tag["node"][0]
+    assert node.get("pkg") == "demo"
+    assert tree.element_at(tree.text.index("name")).tag == "arg"
+    assert tree.element_at(0).tag == "launch"
+
+
+def test_edits_match_a_full_parse():
+    random.seed(0)
+    tree = SyntaxTree(SOURCE)
+    text = SOURCE
+    snippets = ["<", ">", "/>", '"', "</node>", "<node pkg='x'>", "a", "\n", ""]
+    for _ in range(300):
+        start = random.randint(0, len(text))
+        end = min(len(text), start + random.randint(0, 8))
+        new_text = random.choice(snippets)
+        tree.apply_edit(start, end, new_text)
+        text = text[:start] + new_text + text[end:]
+        assert tree.text == text
+        assert _shape(tree) == _shape(SyntaxTree(text))
+
+
+def test_document_model_applies_incremental_changes():
+    model = DocumentModel(SOURCE, 1)
+    line = SOURCE.split("\n").index('  <arg name="rate" default="10"/>')
+    model.apply_change(
+        TextDocumentContentChangeEvent_Type1(
+            range=Range(start=Position(line, 28), end=Position(line, 30)),
+            text="20",
+        )
+    )
+    assert model.syntax.elements_by_tag["arg"][0].get("default") == "20"
+    assert model.line_index.line_text(line) == '  <arg name="rate" default="20"/>'
+
+
+def test_line_index_counts_utf16_code_units():
+    index = LineIndex('a\n<arg default="\U0001f600x"/>\n')
+    offset = index.text.index("x")
+    assert index.position_at_offset(offset) == Position(1, 16)
+    assert index.offset_at_position(Position(1, 16)) == offset
+    assert index.offset_at_position(Position(5, 0)) == len(index.text)
@@ -0,0 +1,71 @@
+import os
+
+from pygls.uris import from_fs_path
+
+from roslaunch_language_server.helper.workspace_index import (
+    WorkspaceIndex,
+    summarize_launch_file,
+    summary_from_json,
+    summary_to_json,
+)
+
+MAIN = """<launch>
+  <include file="$(dirname)/child.launch.xml">
+    <arg name="rate" value="10"/>
+  </include>
+</launch>
+"""
+
+CHILD = """<launch>
+  <arg name="rate" default="1"/>
+  <node pkg="demo" exec="talker" args="$(var rate) $(var other)"/>
+</launch>
+"""
+
+
+def _workspace(tmp_path):
+    directory = os.path.realpath(tmp_path)
+    main = os.path.join(directory, "main.launch.xml")
+    child = os.path.join(directory, "child.launch.xml")
+    for path, source in ((main, MAIN), (child, CHILD)):
+        with open(path, "w") as f:
+            f.write(source)
+    return main, child
+
+
+def _lines(locations):
+    return [(location.uri, location.range.start.line) for location in locations]
+
+
+def test_summaries_round_trip_through_json(tmp_path):
+    main, child = _workspace(tmp_path)
+    summary = summarize_launch_file(main, MAIN)
+    (edge,) = summary.includes
+    assert edge.target == child
+    assert [argument.name for argument in edge.arguments] == ["rate"]
+    assert summary_from_json(main, summary_to_json(summary)) == summary
+
+
+def test_cross_file_lookups(tmp_path):
+    main, child = _workspace(tmp_path)
+    index = WorkspaceIndex()
+    index.update(main)
+    index.update(child)
+    try:
+        assert _lines(index.declarations(child, "rate")) == [(from_fs_path(child), 1)]
+        assert _lines(index.references(child, "rate")) == [(from_fs_path(child), 2)]
+        assert _lines(index.include_arguments(child, "rate")) == [
+            (from_fs_path(main), 2)
+        ]
+        assert [name for name, _, _ in index.symbols("RA")] == ["rate"]
+
+        with open(main, "w") as f:
+            f.write("<launch/>")
+        index.update(main)
+        assert index.include_arguments(child, "rate") == []
+        index.remove(child)
+        assert index.declarations(child, "rate") == []
+        assert index.symbols("rate") == []
+    finally:
+        index.remove(main)
+        index.remove(child)